@@ -0,0 +1,41 @@
+from sqlalchemy import text
+from models import Base, engine
+
+def add_indexes(bind=engine):
+    """Create any index declared on the models that is missing from the database.
+
+    Existing rows are left in place; SQLite builds each index from the table
+    it already has, so there is no need to reload data.
+    """
+    created = []
+    with bind.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not bind.dialect.has_table(conn, table.name):
+                continue
+            existing = {index["name"] for index in bind.dialect.get_indexes(conn, table.name)}
+            for index in table.indexes:
+                if index.name not in existing:
+                    index.create(conn)
+                    created.append(index.name)
+        # Refresh planner statistics so the new indexes are picked up
+        conn.execute(text("ANALYZE"))
+    return created
+
+def add_columns(bind, *columns):
+    """Add model columns missing from existing tables (ALTER TABLE ... ADD COLUMN); returns their names."""
+    added = []
+    with bind.begin() as conn:
+        for column in columns:
+            table = column.table
+            if not bind.dialect.has_table(conn, table.name):
+                continue
+            if column.name not in {c["name"] for c in bind.dialect.get_columns(conn, table.name)}:
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(bind.dialect)}"))
+                added.append(f"{table.name}.{column.name}")
+    return added
+
+if __name__ == "__main__":
+    created = add_indexes()
+    for name in created:
+        print(f"✓ Created {name}")
+    print(f"✓ {len(created)} indexes added")
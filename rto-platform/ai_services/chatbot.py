@@ -1,4 +1,10 @@
+import hashlib
 import os
+import threading
+import time
+from collections import OrderedDict
+
+from ai_services.retrieval import tokenize
 
 # RTO-specific system prompt
 RTO_SYSTEM_PROMPT = """You are an AI assistant for the Regional Transport Office (RTO) platform in India. Your role is to help citizens, brokers, and administrators with vehicle registration and licensing services.
@@ -34,25 +40,246 @@ RTO_SYSTEM_PROMPT = """You are an AI assistant for the Regional Transport Office
 
 Answer user questions professionally and helpfully."""
 
-def get_chatbot_response(message: str) -> str:
+CHAT_PROVIDER = os.getenv("CHAT_PROVIDER", "gemini")  # gemini | stub
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.0-flash-exp")
+CHAT_CACHE_MAX_ENTRIES = int(os.getenv("CHAT_CACHE_MAX_ENTRIES", "1000"))
+CHAT_CACHE_TTL_SECONDS = float(os.getenv("CHAT_CACHE_TTL_SECONDS", "3600"))  # generated answers expire after this
+FAQ_MIN_COVERAGE = float(os.getenv("FAQ_MIN_COVERAGE", "0.5"))  # share of the question's words an FAQ entry must cover
+
+
+class ChatProvider:
+    """Backend that answers a single user message."""
+
+    name = "base"
+
+    def generate(self, message: str) -> str:
+        raise NotImplementedError
+
+    def stream(self, message: str):
+        """Yield the answer in pieces; providers without streaming send it whole."""
+        yield self.generate(message)
+
+
+class GeminiProvider(ChatProvider):
+    """Gemini model configured once and shared across requests."""
+
+    name = "gemini"
+
+    def __init__(self, api_key: str, model_name: str = GEMINI_MODEL):
+        import google.generativeai as genai
+        genai.configure(api_key=api_key)
+        self.model = genai.GenerativeModel(model_name, system_instruction=RTO_SYSTEM_PROMPT)
+
+    def generate(self, message: str) -> str:
+        return self.model.generate_content(message).text
+
+    def stream(self, message: str):
+        for chunk in self.model.generate_content(message, stream=True):
+            if chunk.text:
+                yield chunk.text
+
+
+class StubProvider(ChatProvider):
+    """Offline provider with canned answers, for local development and tests."""
+
+    name = "stub"
+
+    def __init__(self):
+        self.calls = 0
+
+    def generate(self, message: str) -> str:
+        self.calls += 1
+        return f"This is an offline answer about: {message.strip()}. Please visit your nearest RTO for details."
+
+    def stream(self, message: str):
+        words = self.generate(message).split(" ")
+        for i, word in enumerate(words):
+            yield word if i == 0 else " " + word
+
+
+class UnavailableProvider(ChatProvider):
+    """Stands in when the configured provider cannot be built; answers with the reason."""
+
+    name = "unavailable"
+
+    def __init__(self, reason: str):
+        self.reason = reason
+
+    def generate(self, message: str) -> str:
+        return self.reason
+
+
+def make_provider(name: str = CHAT_PROVIDER) -> ChatProvider:
+    if name == "stub":
+        return StubProvider()
+    api_key = os.getenv('GEMINI_API_KEY')
+    if not api_key:
+        return UnavailableProvider("Gemini API key not configured. Please set GEMINI_API_KEY environment variable.")
+    try:
+        return GeminiProvider(api_key)
+    except ImportError:
+        return UnavailableProvider("Gemini API not available. Please install google-generativeai.")
+
+
+_provider = None
+_provider_lock = threading.Lock()
+
+
+def get_provider() -> ChatProvider:
+    """Shared provider, built on first use."""
+    global _provider
+    if _provider is None:
+        with _provider_lock:
+            if _provider is None:
+                _provider = make_provider()
+    return _provider
+
+
+def set_provider(provider: ChatProvider):
+    """Swap the provider (e.g. StubProvider in tests); clears learned answers."""
+    global _provider
+    _provider = provider
+    answer_cache.clear()
+
+
+# ==================== FAQ / answer cache ====================
+
+def normalize_question(message: str) -> str:
+    """Content words, sorted and de-duplicated, as a cache key."""
+    return " ".join(sorted(set(tokenize(message))))
+
+
+# High-volume questions answered locally. A question matches when it contains
+# every keyword of an entry (after normalize_question) and those keywords make
+# up at least FAQ_MIN_COVERAGE of its words, so a longer question that merely
+# mentions them ("I sent the transfer documents last week, why is it still
+# pending?") is not answered with the canned text.
+FAQ = [
+    ({"document", "transfer"},
+     "For transfer of ownership you need: Form 29 and Form 30 signed by buyer and seller, the original RC, "
+     "valid insurance, PUC certificate, address proof and ID (Aadhaar/PAN) of the buyer, NOC from the "
+     "financier if the vehicle was hypothecated, and Form 28 (NOC) if moving to another state."),
+    ({"renewal", "fee"},
+     "Typical renewal fees: driving license renewal is Rs. 200 (plus Rs. 1000 late fee if more than a year "
+     "overdue, and smart card charges where applicable); registration renewal for a private vehicle after "
+     "15 years is Rs. 300-600 for two-wheelers and Rs. 600-1000 for cars, plus green tax. Exact fees vary by state."),
+    ({"document", "renewal"},
+     "For driving license renewal: Form 9, the existing DL, address proof, passport-size photos, and a "
+     "medical certificate (Form 1A) if you are above 40. For RC renewal: Form 25, original RC, valid "
+     "insurance, PUC certificate, fitness certificate and road tax receipts."),
+    ({"document", "registration"},
+     "For new vehicle registration: Form 20, Form 21 (sale certificate), Form 22 (roadworthiness), valid "
+     "insurance, address proof, PAN or Form 60, and the invoice from the dealer."),
+]
+
+
+class AnswerCache:
+    """LRU of answers keyed by answer_key(), each kept for at most `ttl` seconds."""
+
+    def __init__(self, max_entries: int = CHAT_CACHE_MAX_ENTRIES, ttl: float = CHAT_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (answer, expires_at)
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            answer, expires_at = entry
+            if time.monotonic() >= expires_at:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return answer
+
+    def set(self, key: str, answer: str):
+        with self._lock:
+            self._entries[key] = (answer, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+answer_cache = AnswerCache()
+
+
+def answer_key(message: str, context=None) -> str:
+    """Cache key: the normalized question plus a digest of the grounding passages it was answered with."""
+    digest = hashlib.sha256("\n".join(context or ()).encode()).hexdigest()[:16]
+    return f"{normalize_question(message)}|{digest}"
+
+
+def faq_answer(message: str):
+    words = set(tokenize(message))
+    for keywords, answer in FAQ:
+        if keywords <= words and len(keywords) >= FAQ_MIN_COVERAGE * len(words):
+            return answer
+    return None
+
+
+def cached_answer(message: str, context=None):
+    """FAQ or previously generated answer for this question and context, or None."""
+    answer = faq_answer(message)
+    if answer is not None:
+        return answer
+    return answer_cache.get(answer_key(message, context))
+
+
+def _cacheable(message: str, answer: str) -> bool:
+    return bool(normalize_question(message)) and bool(answer) and not answer.startswith("Error:") \
+        and get_provider().name != "unavailable"
+
+
+def grounded_prompt(message: str, context=None) -> str:
+    """Prefix the question with retrieved platform passages, if any."""
+    if not context:
+        return message
+    passages = "\n".join(f"- {passage}" for passage in context)
+    return f"Relevant RTO platform information:\n{passages}\n\nUsing the information above where it applies, answer: {message}"
+
+
+def get_chatbot_response(message: str, context=None) -> str:
     """
-    Get response from Gemini chatbot for RTO-related queries.
+    Get response from the chat provider for RTO-related queries.
+    FAQ and repeated questions (with the same grounding) are answered from
+    cache without a remote call; context passages, when given, are sent along
+    to ground the answer.
     """
+    cached = cached_answer(message, context)
+    if cached is not None:
+        return cached
     try:
-        import google.generativeai as genai
-        api_key = os.getenv('GEMINI_API_KEY')
-        if not api_key:
-            return "Gemini API key not configured. Please set GEMINI_API_KEY environment variable."
+        answer = get_provider().generate(grounded_prompt(message, context))
+    except Exception as e:
+        return f"Error: {str(e)}"
+    if _cacheable(message, answer):
+        answer_cache.set(answer_key(message, context), answer)
+    return answer
 
-        genai.configure(api_key=api_key)
-        model = genai.GenerativeModel(
-            'gemini-2.0-flash-exp',
-            system_instruction=RTO_SYSTEM_PROMPT
-        )
 
-        response = model.generate_content(message)
-        return response.text
-    except ImportError:
-        return "Gemini API not available. Please install google-generativeai."
+def stream_chatbot_response(message: str, context=None):
+    """
+    Yield the answer in pieces as the provider produces them.
+    Cached answers come back as a single piece.
+    """
+    cached = cached_answer(message, context)
+    if cached is not None:
+        yield cached
+        return
+    parts = []
+    try:
+        for part in get_provider().stream(grounded_prompt(message, context)):
+            parts.append(part)
+            yield part
     except Exception as e:
-        return f"Error: {str(e)}"
\ No newline at end of file
+        yield f"Error: {str(e)}"
+        return
+    answer = "".join(parts)
+    if _cacheable(message, answer):
+        answer_cache.set(answer_key(message, context), answer)
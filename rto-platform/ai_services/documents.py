@@ -0,0 +1,52 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from ai_services import forgery
+from ai_services.ocr import extract_text_from_array
+
+DOCUMENT_WORKERS = int(os.getenv("DOCUMENT_WORKERS", str(os.cpu_count() or 1)))
+
+# Per-process forgery interpreter, created by the pool initializer
+_runner = None
+
+
+def _init_worker():
+    global _runner
+    _runner = forgery._load_runner()
+
+
+def verify_document(image_bytes: bytes) -> dict:
+    """
+    Decode an image once and run both OCR and forgery analysis on the array.
+    """
+    if not forgery.CV2_AVAILABLE:
+        return {"status": "unavailable", "error": f"OpenCV not installed: {forgery.CV2_IMPORT_ERROR}"}
+    image = forgery.decode_image(image_bytes)
+    if image is None:
+        return {"status": "error", "error": "Unable to decode image"}
+    try:
+        forgery_result = forgery.analyze_array(image, _runner)
+    except Exception as exc:
+        forgery_result = {"status": "error", "error": str(exc)}
+    return {
+        "status": "ok",
+        "extracted_text": extract_text_from_array(image),
+        "forgery": forgery_result,
+    }
+
+
+_pool = None
+
+
+def document_pool() -> ProcessPoolExecutor:
+    """Shared process pool for document verification, started on first use."""
+    global _pool
+    if _pool is None:
+        # spawn: the API process has live threads, which fork does not copy safely
+        _pool = ProcessPoolExecutor(
+            max_workers=max(DOCUMENT_WORKERS, 1),
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+        )
+    return _pool
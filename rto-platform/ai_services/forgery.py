@@ -1,4 +1,8 @@
+import asyncio
 import os
+import queue
+import threading
+from concurrent.futures import Future
 
 # Optional heavy imports
 CV2_IMPORT_ERROR = ""
@@ -25,26 +29,74 @@ except ImportError:
         Interpreter = None
 
 MODEL_PATH = os.getenv("FORGERY_MODEL_PATH", "forgery_model.tflite")
-INTERPRETER = None
-INPUT_DETAILS = None
-OUTPUT_DETAILS = None
-if Interpreter and os.path.exists(MODEL_PATH):
+
+# Worker pool settings
+FORGERY_WORKERS = int(os.getenv("FORGERY_WORKERS", str(os.cpu_count() or 1)))
+FORGERY_NUM_THREADS = int(os.getenv("FORGERY_NUM_THREADS", "1"))  # TFLite threads per interpreter
+FORGERY_MAX_BATCH = int(os.getenv("FORGERY_MAX_BATCH", "8"))
+FORGERY_BATCH_WAIT_MS = float(os.getenv("FORGERY_BATCH_WAIT_MS", "2"))
+FORGERY_QUEUE_SIZE = int(os.getenv("FORGERY_QUEUE_SIZE", "256"))
+
+
+class ForgeryQueueFull(Exception):
+    """Raised when the analysis queue is at capacity; callers should retry later."""
+
+
+class _ModelRunner:
+    """One TFLite interpreter with its own tensors; owned by a single worker thread."""
+
+    def __init__(self, model_path: str, num_threads: int):
+        try:
+            self.interpreter = Interpreter(model_path=model_path, num_threads=num_threads)
+        except TypeError:
+            self.interpreter = Interpreter(model_path=model_path)
+        self.interpreter.allocate_tensors()
+        self.input_spec = self.interpreter.get_input_details()[0]
+        self.output_spec = self.interpreter.get_output_details()[0]
+        signature = self.input_spec.get("shape_signature")
+        self.dynamic_batch = signature is not None and len(signature) > 0 and int(signature[0]) == -1
+        self.fixed_batch = int(self.input_spec["shape"][0])
+        self.batch_size = self.fixed_batch
+
+    @property
+    def max_batch(self) -> int:
+        return FORGERY_MAX_BATCH if self.dynamic_batch else max(self.fixed_batch, 1)
+
+    def predict(self, tensors):
+        """Confidence for each preprocessed (1, H, W, C) tensor, in one invoke."""
+        batch = np.concatenate(tensors, axis=0)
+        n = batch.shape[0]
+        if self.dynamic_batch and n != self.batch_size:
+            self.interpreter.resize_tensor_input(self.input_spec["index"], [n] + list(batch.shape[1:]))
+            self.interpreter.allocate_tensors()
+            self.batch_size = n
+        elif not self.dynamic_batch and n < self.fixed_batch:
+            padding = np.zeros((self.fixed_batch - n,) + batch.shape[1:], dtype=batch.dtype)
+            batch = np.concatenate([batch, padding], axis=0)
+        self.interpreter.set_tensor(self.input_spec["index"], batch)
+        self.interpreter.invoke()
+        output = self.interpreter.get_tensor(self.output_spec["index"])
+        return [float(output[i].flat[0]) for i in range(n)]
+
+
+def _load_runner(model_path: str = MODEL_PATH, num_threads: int = FORGERY_NUM_THREADS):
+    if not (Interpreter and os.path.exists(model_path)):
+        return None
     try:
-        INTERPRETER = Interpreter(model_path=MODEL_PATH)
-        INTERPRETER.allocate_tensors()
-        INPUT_DETAILS = INTERPRETER.get_input_details()
-        OUTPUT_DETAILS = INTERPRETER.get_output_details()
+        return _ModelRunner(model_path, num_threads)
     except Exception:
-        INTERPRETER = None
-        INPUT_DETAILS = None
-        OUTPUT_DETAILS = None
+        return None
 
 
-def _preprocess_for_model(image):
-    if not INTERPRETER or not INPUT_DETAILS:
-        return None
+def model_version(model_path: str = MODEL_PATH) -> str:
+    """Identifies which analysis produced a result, for cache keys."""
+    if Interpreter and os.path.exists(model_path):
+        stat = os.stat(model_path)
+        return f"{os.path.basename(model_path)}-{stat.st_size}-{int(stat.st_mtime)}"
+    return "heuristic-v1"
+
 
-    input_spec = INPUT_DETAILS[0]
+def _preprocess_for_model(image, input_spec):
     shape = input_spec.get("shape")
     if shape is None:
         return None
@@ -89,47 +141,156 @@ def _heuristic_analysis(gray_image, metrics):
     return min(max(score, 0.0), 1.0)
 
 
+def decode_image(image_bytes: bytes):
+    """Decode encoded image bytes to a BGR array, or None if undecodable."""
+    np_buffer = np.frombuffer(image_bytes, dtype=np.uint8)
+    return cv2.imdecode(np_buffer, cv2.IMREAD_COLOR)
+
+
+def _heuristic_result(image) -> dict:
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    metrics = {}
+    score = _heuristic_analysis(gray, metrics)
+    confidence = round(score, 4)
+    is_forged = confidence >= 0.6
+    return {
+        "status": "ok",
+        "is_forged": bool(is_forged),
+        "confidence": confidence,
+        "model_used": "heuristic",
+        "metrics": metrics,
+    }
+
+
+def _model_result(confidence: float) -> dict:
+    is_forged = confidence >= 0.5
+    return {
+        "status": "ok",
+        "is_forged": bool(is_forged),
+        "confidence": round(confidence, 4),
+        "model_used": INTERPRETER_SOURCE,
+        "metrics": {},
+    }
+
+
+def analyze_array(image, runner=None) -> dict:
+    """Analyze a decoded BGR image in the calling thread, using the given runner if any."""
+    tensor = _preprocess_for_model(image, runner.input_spec) if runner else None
+    if tensor is None:
+        return _heuristic_result(image)
+    return _model_result(runner.predict([tensor])[0])
+
+
+class ForgeryService:
+    """
+    Pool of worker threads, each owning its own TFLite interpreter.
+
+    Requests go through a bounded queue; a full queue raises ForgeryQueueFull
+    instead of piling up work. When the model accepts a batch dimension a
+    worker drains up to FORGERY_MAX_BATCH queued images (waiting at most
+    FORGERY_BATCH_WAIT_MS for more) and runs them in a single invoke.
+    Decoding and the OpenCV heuristic also run on the workers.
+    """
+
+    def __init__(self, workers: int = FORGERY_WORKERS, queue_size: int = FORGERY_QUEUE_SIZE, model_path: str = MODEL_PATH):
+        self.model_path = model_path
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._workers = [
+            threading.Thread(target=self._run, name=f"forgery-worker-{i}", daemon=True)
+            for i in range(max(workers, 1))
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, image) -> Future:
+        """Queue encoded bytes or a decoded BGR array; the Future resolves to the result dict."""
+        future = Future()
+        try:
+            self._queue.put_nowait((image, future))
+        except queue.Full:
+            raise ForgeryQueueFull("Forgery analysis queue is full")
+        return future
+
+    def _take_batch(self, max_batch: int):
+        batch = [self._queue.get()]
+        wait = FORGERY_BATCH_WAIT_MS / 1000
+        while len(batch) < max_batch:
+            try:
+                batch.append(self._queue.get(timeout=wait))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        runner = _load_runner(self.model_path)
+        while True:
+            batch = self._take_batch(runner.max_batch if runner else 1)
+            pending = []
+            for image, future in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    if isinstance(image, (bytes, bytearray)):
+                        image = decode_image(image)
+                    if image is None:
+                        future.set_result({"status": "error", "error": "Unable to decode image"})
+                        continue
+                    tensor = _preprocess_for_model(image, runner.input_spec) if runner else None
+                    if tensor is None:
+                        future.set_result(_heuristic_result(image))
+                    else:
+                        pending.append((tensor, future))
+                except Exception as exc:
+                    future.set_result({"status": "error", "error": str(exc)})
+
+            for start in range(0, len(pending), runner.max_batch if pending else 1):
+                chunk = pending[start:start + runner.max_batch]
+                try:
+                    confidences = runner.predict([tensor for tensor, _ in chunk])
+                    for (_, future), confidence in zip(chunk, confidences):
+                        future.set_result(_model_result(confidence))
+                except Exception as exc:
+                    for _, future in chunk:
+                        future.set_result({"status": "error", "error": str(exc)})
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def forgery_service() -> ForgeryService:
+    """Shared worker pool, started on first use."""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = ForgeryService()
+    return _service
+
+
+def _unavailable() -> dict:
+    return {
+        "status": "unavailable",
+        "error": f"OpenCV not installed: {CV2_IMPORT_ERROR}",
+    }
+
+
+def analyze_image(image) -> dict:
+    """Analyze an already-decoded BGR image on the worker pool (blocking)."""
+    if not CV2_AVAILABLE:
+        return _unavailable()
+    return forgery_service().submit(image).result()
+
+
 def analyze_document(image_bytes: bytes) -> dict:
+    """Decode and analyze encoded image bytes on the worker pool (blocking)."""
     if not CV2_AVAILABLE:
-        return {
-            "status": "unavailable",
-            "error": f"OpenCV not installed: {CV2_IMPORT_ERROR}",
-        }
+        return _unavailable()
+    return forgery_service().submit(image_bytes).result()
 
-    try:
-        np_buffer = np.frombuffer(image_bytes, dtype=np.uint8)
-        image = cv2.imdecode(np_buffer, cv2.IMREAD_COLOR)
-        if image is None:
-            return {"status": "error", "error": "Unable to decode image"}
-
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        metrics = {}
-
-        if INTERPRETER and INPUT_DETAILS and OUTPUT_DETAILS:
-            tensor = _preprocess_for_model(image)
-            if tensor is not None:
-                INTERPRETER.set_tensor(INPUT_DETAILS[0]["index"], tensor)
-                INTERPRETER.invoke()
-                output = INTERPRETER.get_tensor(OUTPUT_DETAILS[0]["index"])
-                confidence = float(output.flat[0])
-                is_forged = confidence >= 0.5
-                return {
-                    "status": "ok",
-                    "is_forged": bool(is_forged),
-                    "confidence": round(confidence, 4),
-                    "model_used": INTERPRETER_SOURCE,
-                    "metrics": metrics,
-                }
-
-        score = _heuristic_analysis(gray, metrics)
-        confidence = round(score, 4)
-        is_forged = confidence >= 0.6
-        return {
-            "status": "ok",
-            "is_forged": bool(is_forged),
-            "confidence": confidence,
-            "model_used": "heuristic",
-            "metrics": metrics,
-        }
-    except Exception as exc:
-        return {"status": "error", "error": str(exc)}
+
+async def analyze_document_async(image_bytes: bytes) -> dict:
+    """Non-blocking variant for async endpoints."""
+    if not CV2_AVAILABLE:
+        return _unavailable()
+    return await asyncio.wrap_future(forgery_service().submit(image_bytes))
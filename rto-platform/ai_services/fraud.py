@@ -0,0 +1,69 @@
+import warnings
+from datetime import datetime
+
+import numpy as np
+
+# Column order used when the estimator does not record its own feature names
+DEFAULT_FEATURE_COLUMNS = [
+    'citizen_id', 'broker_id', 'submission_day', 'avg_rating',
+    'application_type_New Registration', 'application_type_Renewal',
+    'application_type_Transfer', 'status_Approved', 'status_Pending',
+    'status_Rejected',
+]
+
+# New applications have no rating history yet
+DEFAULT_AVG_RATING = 3
+
+
+class FraudScorer:
+    """
+    Encodes applications straight into a NumPy feature matrix and scores them
+    with one predict call. Column positions are resolved once from the model's
+    feature names, so no per-request DataFrame or one-hot encoding is needed.
+    """
+
+    def __init__(self, model, feature_columns=None):
+        self.model = model
+        if feature_columns is None:
+            feature_columns = getattr(model, 'feature_names_in_', None)
+        self.feature_columns = list(feature_columns if feature_columns is not None else DEFAULT_FEATURE_COLUMNS)
+        self._positions = {name: i for i, name in enumerate(self.feature_columns)}
+
+    def encode(self, applications, status: str = 'Pending', submission_day: int = None) -> np.ndarray:
+        """Build the (n_applications, n_features) matrix for the given applications."""
+        if submission_day is None:
+            submission_day = datetime.now().timetuple().tm_yday
+
+        n = len(applications)
+        features = np.zeros((n, len(self.feature_columns)), dtype=np.float64)
+        positions = self._positions
+
+        if 'citizen_id' in positions:
+            features[:, positions['citizen_id']] = np.fromiter((a.citizen_id for a in applications), np.float64, n)
+        if 'broker_id' in positions:
+            features[:, positions['broker_id']] = np.fromiter((a.broker_id for a in applications), np.float64, n)
+        if 'submission_day' in positions:
+            features[:, positions['submission_day']] = submission_day
+        if 'avg_rating' in positions:
+            features[:, positions['avg_rating']] = DEFAULT_AVG_RATING
+        if f'status_{status}' in positions:
+            features[:, positions[f'status_{status}']] = 1
+
+        # One-hot application_type; unknown types leave every indicator at 0
+        type_columns = np.fromiter(
+            (positions.get(f'application_type_{a.application_type}', -1) for a in applications), np.intp, n
+        )
+        known = type_columns >= 0
+        features[np.nonzero(known)[0], type_columns[known]] = 1
+        return features
+
+    def score_batch(self, applications) -> list:
+        """Return an is_fraud flag for each application, in order."""
+        if not applications:
+            return []
+        features = self.encode(applications)
+        with warnings.catch_warnings():
+            # Fitted on a DataFrame; the array already follows that column order
+            warnings.filterwarnings('ignore', message='X does not have valid feature names')
+            predictions = self.model.predict(features)
+        return [bool(p) for p in predictions]
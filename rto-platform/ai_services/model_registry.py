@@ -0,0 +1,154 @@
+import hashlib
+import json
+import os
+import pickle
+import threading
+from datetime import datetime
+
+from ai_services.fraud import FraudScorer
+
+REGISTRY_DIR = os.getenv("FRAUD_MODEL_REGISTRY", "model_registry")
+LEGACY_MODEL_PATH = "fraud_model.pkl"
+ACTIVE_FILE = "ACTIVE"
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 16), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _write_atomic(path: str, content: str):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+def list_versions(registry_dir: str = REGISTRY_DIR) -> list:
+    """Versions present in the registry, oldest first."""
+    if not os.path.isdir(registry_dir):
+        return []
+    versions = [name[:-5] for name in os.listdir(registry_dir) if name.startswith("v") and name.endswith(".json")]
+    return sorted(versions, key=lambda v: int(v[1:]))
+
+
+def active_version(registry_dir: str = REGISTRY_DIR):
+    path = os.path.join(registry_dir, ACTIVE_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return f.read().strip() or None
+
+
+def set_active_version(version: str, registry_dir: str = REGISTRY_DIR):
+    if version not in list_versions(registry_dir):
+        raise ValueError(f"Unknown model version: {version}")
+    _write_atomic(os.path.join(registry_dir, ACTIVE_FILE), version)
+
+
+def save_artifact(estimator, feature_columns, metrics: dict = None, registry_dir: str = REGISTRY_DIR, activate: bool = True) -> str:
+    """
+    Store a trained estimator as the next version in the registry.
+
+    Each version is a pickle (vN.pkl) plus a JSON manifest (vN.json) holding
+    the feature schema, training metrics and the pickle's SHA-256.
+    """
+    os.makedirs(registry_dir, exist_ok=True)
+    versions = list_versions(registry_dir)
+    version = f"v{int(versions[-1][1:]) + 1 if versions else 1}"
+
+    model_path = os.path.join(registry_dir, f"{version}.pkl")
+    with open(f"{model_path}.tmp", "wb") as f:
+        pickle.dump(estimator, f)
+    os.replace(f"{model_path}.tmp", model_path)
+
+    manifest = {
+        "version": version,
+        "feature_columns": list(feature_columns),
+        "metrics": metrics or {},
+        "sha256": _sha256(model_path),
+        "created_at": datetime.utcnow().isoformat(),
+    }
+    _write_atomic(os.path.join(registry_dir, f"{version}.json"), json.dumps(manifest, indent=2))
+
+    if activate:
+        set_active_version(version, registry_dir)
+    return version
+
+
+def load_artifact(version: str, registry_dir: str = REGISTRY_DIR):
+    """Return (estimator, manifest) for a version, verifying the pickle hash."""
+    with open(os.path.join(registry_dir, f"{version}.json")) as f:
+        manifest = json.load(f)
+    model_path = os.path.join(registry_dir, f"{version}.pkl")
+    if _sha256(model_path) != manifest["sha256"]:
+        raise ValueError(f"Model artifact {version} does not match its recorded hash")
+    with open(model_path, "rb") as f:
+        estimator = pickle.load(f)
+    return estimator, manifest
+
+
+class ModelRegistry:
+    """
+    Lazily loads the active fraud model and lets it be swapped at runtime.
+
+    Nothing is unpickled until the first score. reload() builds the new
+    scorer completely before replacing the reference, so in-flight requests
+    keep using the old model and never see a half-loaded one.
+    """
+
+    def __init__(self, registry_dir: str = REGISTRY_DIR, legacy_path: str = LEGACY_MODEL_PATH):
+        self.registry_dir = registry_dir
+        self.legacy_path = legacy_path
+        self._scorer = None
+        self._info = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def _load(self, version: str = None):
+        version = version or active_version(self.registry_dir)
+        if version:
+            estimator, manifest = load_artifact(version, self.registry_dir)
+            return FraudScorer(estimator, manifest["feature_columns"]), {
+                "version": version,
+                "metrics": manifest["metrics"],
+                "sha256": manifest["sha256"],
+                "created_at": manifest["created_at"],
+            }
+        if os.path.exists(self.legacy_path):
+            with open(self.legacy_path, "rb") as f:
+                estimator = pickle.load(f)
+            return FraudScorer(estimator), {"version": "legacy", "sha256": _sha256(self.legacy_path)}
+        return None, None
+
+    def scorer(self):
+        """Active FraudScorer, or None when no model is available."""
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self._scorer, self._info = self._load()
+                    self._loaded = True
+        return self._scorer
+
+    def reload(self, version: str = None) -> dict:
+        """Load and verify a version, then (optionally) activate it and swap it in."""
+        with self._lock:
+            if version and version not in list_versions(self.registry_dir):
+                raise ValueError(f"Unknown model version: {version}")
+            # A corrupt or unreadable artifact raises here, before ACTIVE is touched
+            scorer, info = self._load(version)
+            if version:
+                set_active_version(version, self.registry_dir)
+            self._scorer, self._info, self._loaded = scorer, info, True
+        return self.info()
+
+    def info(self) -> dict:
+        self.scorer()
+        return {
+            "available": self._scorer is not None,
+            "active": self._info,
+            "versions": list_versions(self.registry_dir),
+        }
@@ -1,14 +1,228 @@
 import pytesseract
 from PIL import Image
+import asyncio
 import io
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
 
-def extract_text_from_image(image_bytes: bytes) -> str:
+# Optional heavy imports
+try:
+    import cv2  # type: ignore
+    import numpy as np
+    CV2_AVAILABLE = True
+except ImportError:
+    cv2 = None  # type: ignore
+    np = None  # type: ignore
+    CV2_AVAILABLE = False
+
+# Preprocessing / pool settings
+OCR_MAX_SIDE = int(os.getenv("OCR_MAX_SIDE", "1800"))  # longest side after downscaling, px
+OCR_MAX_REGIONS = int(os.getenv("OCR_MAX_REGIONS", "8"))  # above this, keep the union box instead of masking
+OCR_MIN_REGION_AREA = float(os.getenv("OCR_MIN_REGION_AREA", "0.0005"))  # fraction of page area
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", str(os.cpu_count() or 1)))
+OCR_CONFIG = os.getenv("OCR_CONFIG", "--oem 1 --psm 6")
+
+# Settings that change OCR output; part of result cache keys (bump the prefix when the pipeline changes)
+ENGINE_VERSION = f"masked-{OCR_MAX_SIDE}-{OCR_MAX_REGIONS}-{OCR_CONFIG.replace(' ', '')}"
+
+
+def _deskew(gray):
+    """Rotate so text lines are horizontal; small angles only."""
+    ink = np.column_stack(np.where(gray < 128))
+    if len(ink) < 50:
+        return gray
+    angle = cv2.minAreaRect(ink[:, ::-1].astype(np.float32))[-1]
+    # minAreaRect reports in [0, 90); map to the nearest rotation around 0
+    if angle > 45:
+        angle -= 90
+    if abs(angle) < 0.5 or abs(angle) > 15:
+        return gray
+    h, w = gray.shape
+    matrix = cv2.getRotationMatrix2D((w / 2, h / 2), angle, 1.0)
+    return cv2.warpAffine(gray, matrix, (w, h), flags=cv2.INTER_CUBIC, borderMode=cv2.BORDER_REPLICATE)
+
+
+def preprocess(image):
+    """
+    Downscale, grayscale, deskew and binarize a BGR image.
+    Returns (binary, scale) where scale maps binary coordinates back to the input.
+    """
+    h, w = image.shape[:2]
+    scale = min(1.0, OCR_MAX_SIDE / max(h, w))
+    if scale < 1.0:
+        image = cv2.resize(image, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    gray = _deskew(gray)
+    gray = cv2.GaussianBlur(gray, (3, 3), 0)
+    _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    return binary, 1.0 / scale
+
+
+def text_regions(binary):
+    """Bounding boxes (x, y, w, h) of text blocks, in reading order."""
+    h, w = binary.shape
+    ink = cv2.bitwise_not(binary)
+    # Join characters into words and lines
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (max(w // 60, 3), max(h // 200, 3)))
+    blocks = cv2.dilate(ink, kernel, iterations=2)
+    contours, _ = cv2.findContours(blocks, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    min_area = OCR_MIN_REGION_AREA * h * w
+    boxes = [cv2.boundingRect(c) for c in contours]
+    boxes = [b for b in boxes if b[2] * b[3] >= min_area and b[3] >= 8]
+    if len(boxes) > OCR_MAX_REGIONS:
+        # Too many blocks for masking to help; use their union instead
+        x0 = min(b[0] for b in boxes)
+        y0 = min(b[1] for b in boxes)
+        x1 = max(b[0] + b[2] for b in boxes)
+        y1 = max(b[1] + b[3] for b in boxes)
+        boxes = [(x0, y0, x1 - x0, y1 - y0)]
+    return sorted(boxes, key=lambda b: (b[1], b[0]))
+
+
+def masked_page(binary):
+    """
+    The binarized page with everything outside the text regions blanked to
+    white, cropped to the regions' union, so one recognizer call reads every
+    region without the noise between them. Returns (page, x0, y0, boxes) with
+    the crop's offset and the padded region boxes as (x0, y0, x1, y1) in
+    binary coordinates.
+    """
+    h, w = binary.shape
+    pad = 4
+    boxes = [
+        (max(x - pad, 0), max(y - pad, 0), min(x + bw + pad, w), min(y + bh + pad, h))
+        for x, y, bw, bh in text_regions(binary) or [(0, 0, w, h)]
+    ]
+    x0, y0 = min(b[0] for b in boxes), min(b[1] for b in boxes)
+    x1, y1 = max(b[2] for b in boxes), max(b[3] for b in boxes)
+    page = np.full((y1 - y0, x1 - x0), 255, dtype=binary.dtype)
+    for bx0, by0, bx1, by1 in boxes:
+        page[by0 - y0:by1 - y0, bx0 - x0:bx1 - x0] = binary[by0:by1, bx0:bx1]
+    return page, x0, y0, boxes
+
+
+def _region_of(boxes, x, y) -> int:
+    for region, (bx0, by0, bx1, by1) in enumerate(boxes):
+        if bx0 <= x < bx1 and by0 <= y < by1:
+            return region
+    return 0
+
+
+def recognize(image, structured: bool = False):
+    """
+    OCR a decoded BGR image in this process: preprocess, blank everything but
+    the text regions, then make one recognizer call for the whole document.
+    Plain mode returns the text; structured mode returns word boxes and
+    confidences in the input image's coordinates.
+    """
+    binary, scale = preprocess(image)
+    page, x0, y0, boxes = masked_page(binary)
+    if not structured:
+        return pytesseract.image_to_string(page, config=OCR_CONFIG).strip()
+
+    data = pytesseract.image_to_data(page, config=OCR_CONFIG, output_type=pytesseract.Output.DICT)
+    words, lines = [], {}
+    for i, text in enumerate(data["text"]):
+        confidence = float(data["conf"][i])
+        if not text.strip() or confidence < 0:
+            continue
+        left, top = data["left"][i] + x0, data["top"][i] + y0
+        width, height = data["width"][i], data["height"][i]
+        line = lines.setdefault((data["block_num"][i], data["par_num"][i], data["line_num"][i]), len(lines) + 1)
+        words.append({
+            "text": text,
+            "confidence": round(confidence, 2),
+            "left": int(left * scale),
+            "top": int(top * scale),
+            "width": int(width * scale),
+            "height": int(height * scale),
+            "region": _region_of(boxes, left + width / 2, top + height / 2),
+            "line": line,
+        })
+    return {"text": " ".join(word["text"] for word in words), "words": words}
+
+
+def _decode(image_bytes: bytes):
+    """BGR array from encoded bytes; formats OpenCV cannot read (GIF, ...) go through PIL."""
+    image = cv2.imdecode(np.frombuffer(image_bytes, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if image is not None:
+        return image
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as pil_image:
+            return cv2.cvtColor(np.array(pil_image.convert("RGB")), cv2.COLOR_RGB2BGR)
+    except Exception:
+        return None
+
+
+def _recognize_bytes(image_bytes: bytes, structured: bool = False):
+    image = _decode(image_bytes)
+    if image is None:
+        raise ValueError("Unable to decode image")
+    try:
+        return recognize(image, structured)
+    except Exception as e:
+        # Some pytesseract errors cannot be unpickled in the parent and would break the pool
+        raise RuntimeError(str(e)) from None
+
+
+def _warm_worker():
+    # Run the whole pipeline once on a blank page so OpenCV's kernels and tesseract's
+    # language data are loaded before the first real request reaches this worker
+    try:
+        recognize(np.full((64, 256, 3), 255, dtype=np.uint8))
+    except Exception:
+        pass
+
+
+_pool = None
+
+
+def ocr_pool() -> ProcessPoolExecutor:
+    """Warm process pool for OCR, started on first use."""
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(
+            max_workers=max(OCR_WORKERS, 1),
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_warm_worker,
+        )
+    return _pool
+
+
+def _error(e, structured):
+    return {"error": str(e)} if structured else f"Error: {str(e)}"
+
+
+def extract_text_from_image(image_bytes: bytes, structured: bool = False):
     """
     Extract text from image using Tesseract OCR.
     """
     try:
-        image = Image.open(io.BytesIO(image_bytes))
-        text = pytesseract.image_to_string(image)
-        return text
+        if not CV2_AVAILABLE:
+            if structured:
+                return {"error": "Structured OCR requires OpenCV"}
+            return pytesseract.image_to_string(Image.open(io.BytesIO(image_bytes)))
+        return ocr_pool().submit(_recognize_bytes, image_bytes, structured).result()
+    except Exception as e:
+        return _error(e, structured)
+
+
+async def extract_text_from_image_async(image_bytes: bytes, structured: bool = False):
+    """Non-blocking variant for async endpoints."""
+    if not CV2_AVAILABLE:
+        return await asyncio.to_thread(extract_text_from_image, image_bytes, structured)
+    try:
+        return await asyncio.wrap_future(ocr_pool().submit(_recognize_bytes, image_bytes, structured))
+    except Exception as e:
+        return _error(e, structured)
+
+
+def extract_text_from_array(image, structured: bool = False):
+    """
+    Extract text from an already-decoded BGR (OpenCV) image array, in this process.
+    """
+    try:
+        return recognize(image, structured)
     except Exception as e:
-        return f"Error: {str(e)}"
\ No newline at end of file
+        return _error(e, structured)
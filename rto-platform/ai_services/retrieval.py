@@ -0,0 +1,82 @@
+import re
+
+import numpy as np
+from scipy import sparse
+
+STOPWORDS = {
+    "a", "an", "the", "is", "are", "am", "do", "does", "i", "my", "me", "we", "you", "for", "of", "to",
+    "in", "on", "and", "or", "what", "which", "how", "much", "many", "need", "needed", "required",
+    "require", "get", "can", "please", "tell", "about", "it", "be", "should", "with", "there", "any",
+}
+
+
+def tokenize(text: str) -> list:
+    """Lowercased content words with stopwords dropped and plurals crudely singularized."""
+    tokens = []
+    for token in re.findall(r"[a-z0-9]+", text.lower()):
+        if token in STOPWORDS or len(token) < 2:
+            continue
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+class BM25Index:
+    """
+    Okapi BM25 over a fixed list of passages.
+
+    Term weights are precomputed into a sparse (terms x passages) matrix, so a
+    query is a sum of a few matrix rows.
+    """
+
+    def __init__(self, passages: list, k1: float = 1.5, b: float = 0.75):
+        self.passages = passages
+        self.vocabulary = {}
+        rows, cols, counts = [], [], []
+        lengths = np.zeros(len(passages), dtype=np.float64)
+        for doc, passage in enumerate(passages):
+            tokens = tokenize(passage["title"] + " " + passage["text"])
+            lengths[doc] = len(tokens)
+            for term, count in zip(*np.unique(tokens, return_counts=True)) if tokens else ():
+                rows.append(self.vocabulary.setdefault(term, len(self.vocabulary)))
+                cols.append(doc)
+                counts.append(count)
+
+        n_docs = max(len(passages), 1)
+        tf = sparse.csr_matrix((counts, (rows, cols)), shape=(len(self.vocabulary), len(passages)), dtype=np.float64)
+        df = np.diff(tf.indptr)
+        self.idf = np.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+        self.max_idf = float(np.log(1 + (n_docs + 0.5) / 0.5))
+
+        # BM25 saturation applied to every nonzero tf entry once, up front
+        norm = k1 * (1 - b + b * lengths / max(lengths.mean(), 1.0)) if len(passages) else lengths
+        coo = tf.tocoo()
+        data = coo.data * (k1 + 1) / (coo.data + norm[coo.col]) * self.idf[coo.row]
+        self.weights = sparse.csr_matrix((data, (coo.row, coo.col)), shape=tf.shape)
+
+    def search(self, query: str, k: int = 3) -> list:
+        """
+        Top-k passages as (passage, score, coverage). Coverage is the idf-weighted
+        share of the query's terms that appear in the passage (unknown terms count
+        against it).
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or not self.passages:
+            return []
+        ids = [self.vocabulary[t] for t in terms if t in self.vocabulary]
+        if not ids:
+            return []
+        rows = self.weights[ids]
+        scores = np.asarray(rows.sum(axis=0)).ravel()
+        total_idf = self.idf[ids].sum() + self.max_idf * (len(terms) - len(ids))
+
+        top = np.argsort(-scores)[:k]
+        results = []
+        for doc in top:
+            if scores[doc] <= 0:
+                break
+            present = rows[:, doc].toarray().ravel() > 0
+            coverage = float(self.idf[ids][present].sum() / total_idf)
+            results.append((self.passages[doc], float(scores[doc]), coverage))
+        return results
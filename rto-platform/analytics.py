@@ -0,0 +1,186 @@
+import threading
+import time
+from collections import Counter
+from sqlalchemy import bindparam, func, insert, select, case, update
+from sqlalchemy.orm import Session
+from models import Citizen, Broker, Application, ApplicationDailyRollup
+from broker_stats import increment
+
+# Rollup key columns cannot be NULL
+UNKNOWN = "Unknown"
+
+ROLLUP_DIMENSIONS = ["application_type", "status", "registering_authority"]
+
+
+def _rollup_key(app, status: str = None) -> dict:
+    return {
+        "day": app.submission_date,
+        "application_type": getattr(app, "application_type", None) or UNKNOWN,
+        "status": (status if status is not None else app.status) or UNKNOWN,
+        "registering_authority": getattr(app, "registering_authority", None) or UNKNOWN,
+    }
+
+
+def record_applications(db: Session, applications):
+    """Add new applications to the daily rollup. Call before committing the insert."""
+    buckets = Counter()
+    fraud = Counter()
+    for app in applications:
+        key = tuple(_rollup_key(app).items())
+        buckets[key] += 1
+        fraud[key] += 1 if getattr(app, "is_fraud", False) else 0
+    for key, count in buckets.items():
+        increment(db, ApplicationDailyRollup, dict(key), applications=count, fraud=fraud[key])
+
+
+def record_status_change(db: Session, app, new_status: str):
+    """Move an application to another status bucket. Call before changing app.status."""
+    if app.status == new_status or app.submission_date is None:
+        return
+    flagged = 1 if app.is_fraud else 0
+    increment(db, ApplicationDailyRollup, _rollup_key(app), applications=-1, fraud=-flagged)
+    increment(db, ApplicationDailyRollup, _rollup_key(app, new_status), applications=1, fraud=flagged)
+
+
+def record_status_changes(db: Session, applications, new_status: str):
+    """
+    Bulk form of record_status_change. Counter deltas are applied per rollup
+    bucket with executemany, so the cost follows the number of buckets touched,
+    not one UPDATE pair per application.
+    """
+    moved = Counter()
+    flagged = Counter()
+    for app in applications:
+        if app.status == new_status or app.submission_date is None:
+            continue
+        key = tuple(_rollup_key(app).items())
+        moved[key] += 1
+        flagged[key] += 1 if app.is_fraud else 0
+    if not moved:
+        return
+
+    table = ApplicationDailyRollup.__table__
+    key_columns = ["day"] + ROLLUP_DIMENSIONS
+    add = update(table).where(*[table.c[c] == bindparam(f"key_{c}") for c in key_columns]).values(
+        applications=table.c.applications + bindparam("delta_applications"),
+        fraud=table.c.fraud + bindparam("delta_fraud"),
+    )
+
+    def params(key: dict, sign: int, count: int, fraud: int) -> dict:
+        return dict({f"key_{c}": key[c] for c in key_columns},
+                    delta_applications=sign * count, delta_fraud=sign * fraud)
+
+    targets = {}
+    for key, count in moved.items():
+        target = dict(dict(key), status=new_status)
+        bucket = tuple(target[c] for c in key_columns)
+        applications_moved, fraud_moved = targets.get(bucket, (0, 0))
+        targets[bucket] = (applications_moved + count, fraud_moved + flagged[key])
+    existing = set(db.execute(
+        select(*[table.c[c] for c in key_columns])
+        .where(table.c.status == new_status, table.c.day.in_({bucket[0] for bucket in targets}))
+    ).tuples())
+
+    db.execute(add, [params(dict(key), -1, count, flagged[key]) for key, count in moved.items()])
+    updates = [params(dict(zip(key_columns, b)), 1, *targets[b]) for b in targets if b in existing]
+    if updates:
+        db.execute(add, updates)
+    inserts = [dict(zip(key_columns, b), applications=targets[b][0], fraud=targets[b][1])
+               for b in targets if b not in existing]
+    if inserts:
+        db.execute(insert(table), inserts)
+
+
+def record_fraud_flag(db: Session, app):
+    """Count an application flagged after it was created (background scoring). Call before committing."""
+    if app.submission_date is None:
+        return
+    increment(db, ApplicationDailyRollup, _rollup_key(app), fraud=1)
+
+
+def rebuild_daily_rollup(db: Session):
+    """Recompute the rollup from the applications table (backfill / repair)."""
+    dimensions = [func.coalesce(getattr(Application, d), UNKNOWN) for d in ROLLUP_DIMENSIONS]
+    db.execute(ApplicationDailyRollup.__table__.delete())
+    db.execute(insert(ApplicationDailyRollup).from_select(
+        ["day"] + ROLLUP_DIMENSIONS + ["applications", "fraud"],
+        select(
+            Application.submission_date,
+            *dimensions,
+            func.count(Application.id),
+            func.sum(case((Application.is_fraud, 1), else_=0))
+        ).where(Application.submission_date.isnot(None))
+         .group_by(Application.submission_date, *dimensions)
+    ))
+
+
+def timeseries_select(start, end, group_by: str = None):
+    """Per-day application and fraud counts from the rollup, optionally split by a dimension."""
+    columns = [ApplicationDailyRollup.day]
+    if group_by:
+        columns.append(getattr(ApplicationDailyRollup, group_by))
+    return select(
+        *columns,
+        func.sum(ApplicationDailyRollup.applications),
+        func.sum(ApplicationDailyRollup.fraud)
+    ).where(
+        ApplicationDailyRollup.day >= start,
+        ApplicationDailyRollup.day <= end
+    ).group_by(*columns).order_by(*columns)
+
+
+def totals_selects():
+    """Queries used to (re)load the dashboard counters."""
+    return {
+        "total_citizens": select(func.count(Citizen.id)),
+        "total_brokers": select(func.count(Broker.id)),
+        "total_applications": select(func.coalesce(func.sum(ApplicationDailyRollup.applications), 0)),
+        "approved_applications": select(func.coalesce(func.sum(ApplicationDailyRollup.applications), 0))
+            .where(ApplicationDailyRollup.status == "Approved"),
+    }
+
+
+class AnalyticsCounters:
+    """
+    In-memory dashboard totals.
+
+    Write endpoints adjust the counters after committing; the values are
+    reloaded from the database once they are older than `ttl` seconds so
+    changes made by other processes are picked up eventually. Thread-safe.
+    """
+
+    def __init__(self, ttl: float = 300):
+        self.ttl = ttl
+        self._values = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def fresh(self) -> bool:
+        with self._lock:
+            return self._values is not None and time.monotonic() - self._loaded_at < self.ttl
+
+    def get(self) -> dict:
+        with self._lock:
+            return dict(self._values) if self._values is not None else None
+
+    def load(self, values: dict):
+        with self._lock:
+            self._values = dict(values)
+            self._loaded_at = time.monotonic()
+
+    def invalidate(self):
+        with self._lock:
+            self._values = None
+
+    def add(self, key: str, delta: int = 1):
+        with self._lock:
+            if self._values is not None:
+                self._values[key] += delta
+
+    def record_status_change(self, old_status: str, new_status: str, count: int = 1):
+        if old_status == new_status:
+            return
+        if new_status == "Approved":
+            self.add("approved_applications", count)
+        elif old_status == "Approved":
+            self.add("approved_applications", -count)
@@ -1,16 +1,35 @@
-from fastapi import FastAPI, Depends, HTTPException
-from sqlalchemy.orm import Session
-from models import Citizen, Broker, Application, Rating, Complaint, Payment, engine
+from fastapi import FastAPI, Depends, HTTPException, Request, Response, UploadFile, File
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy import func, and_, or_, case, insert, select, update, DateTime
+from sqlalchemy.orm import Session, joinedload, selectinload
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from models import Citizen, Broker, Application, Rating, Complaint, Payment, BrokerStats, Vehicle, ApplicationVehicleDetails, ComplianceLead, engine, get_async_engine, normalize_registration, APPLICATION_RECENCY, LATEST_APPLICATION_FIRST
+import broker_stats
+import analytics
+import knowledge
+import vehicles
+import compliance
+import jobs
+import workflow
+from fees import fee_breakdown
+from cache import Generations, LRUCache, make_cache, make_entry, is_not_modified, make_analysis_cache, content_key
 from pydantic import BaseModel
-from datetime import datetime
+from typing import List, Optional
+from collections import Counter
+from types import SimpleNamespace
+from datetime import datetime, date, timedelta
 import random
-from ai_services.chatbot import get_chatbot_response
-from ai_services.ocr import extract_text_from_image
-from ai_services.forgery import analyze_document
+import asyncio
+import json
+import time
+from ai_services.chatbot import get_chatbot_response, stream_chatbot_response
+from ai_services.ocr import extract_text_from_image, extract_text_from_image_async, ENGINE_VERSION as OCR_ENGINE_VERSION
+from ai_services.forgery import analyze_document, analyze_document_async, ForgeryQueueFull, model_version as forgery_model_version
+from ai_services.documents import verify_document, document_pool
+from ai_services.model_registry import ModelRegistry
 import base64
-import pickle
 import os
-import pandas as pd
+from contextlib import asynccontextmanager
 
 # Load environment variables from .env file
 if os.path.exists('.env'):
@@ -21,17 +40,36 @@ if os.path.exists('.env'):
                 key, value = line.split('=', 1)
                 os.environ[key] = value
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app):
+    # Workers start with the app so jobs queued before a restart are picked up
+    background_jobs.start()
+    yield
+    background_jobs.stop()
 
-# Load fraud detection model
-MODEL_PATH = 'fraud_model.pkl'
-if os.path.exists(MODEL_PATH):
-    with open(MODEL_PATH, 'rb') as f:
-        fraud_model = pickle.load(f)
-    MODEL_AVAILABLE = True
-else:
-    fraud_model = None
-    MODEL_AVAILABLE = False
+app = FastAPI(lifespan=lifespan)
+
+# Durable queue for work that endpoints can hand off with ?background=true
+background_jobs = jobs.job_queue()
+
+def accepted(job_id: int, **extra):
+    """202 pointing at the job's status URL."""
+    url = f"/jobs/{job_id}"
+    return JSONResponse(status_code=202, content={"job_id": job_id, "status": "queued", "status_url": url, **extra},
+                        headers={"Location": url})
+
+# Fraud detection model, loaded lazily from the model registry on first use
+fraud_models = ModelRegistry()
+
+def score_batch(applications) -> list:
+    """is_fraud flag for each ApplicationCreate, scored in one vectorized predict."""
+    scorer = fraud_models.scorer()
+    if scorer is None:
+        return [False] * len(applications)
+    return scorer.score_batch(applications)
+
+# Dashboard totals kept in memory, adjusted by the write endpoints
+analytics_counters = analytics.AnalyticsCounters()
 
 # CORS
 from fastapi.middleware.cors import CORSMiddleware
@@ -41,6 +79,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "Last-Modified"],
 )
 
 # Dependency
@@ -51,6 +90,174 @@ def get_db():
     finally:
         db.close()
 
+_async_sessions = None
+
+async def get_async_db():
+    """AsyncSession for endpoints ported to `async def` (needs aiosqlite/asyncpg)."""
+    global _async_sessions
+    if _async_sessions is None:
+        _async_sessions = async_sessionmaker(bind=get_async_engine(), expire_on_commit=False)
+    async with _async_sessions() as db:
+        yield db
+
+# Broker rating aggregation
+def broker_rating_rows(db: Session, broker_id: int = None):
+    """Return (broker, stats) rows joined to the materialized broker_stats table.
+
+    broker_stats keeps running rating sums and application counts that are
+    maintained by the write endpoints (see broker_stats.py), so this is a
+    single lookup regardless of how much history a broker has.
+    """
+    return db.execute(broker_rating_select(broker_id)).all()
+
+def broker_rating_select(broker_id: int = None):
+    query = select(Broker, BrokerStats).outerjoin(BrokerStats, BrokerStats.broker_id == Broker.id)
+    if broker_id is not None:
+        query = query.where(Broker.id == broker_id)
+    return query.order_by(Broker.id)
+
+def broker_rating_averages(row):
+    """Map a row from broker_rating_rows to {'avg_punctuality': ..., 'total_ratings': ...}."""
+    stats = row[1]
+    count = stats.rating_count if stats and stats.rating_count else 0
+    averages = {
+        f"avg_{field}": getattr(stats, f"{field}_sum") / count if count else 0
+        for field in broker_stats.RATING_FIELDS
+    }
+    averages["total_ratings"] = count
+    return averages
+
+# Keyset pagination
+PAGE_LIMIT_MAX = 1000  # largest page any list endpoint returns
+
+def page_limit(limit: int) -> int:
+    """Clamp a requested page size to 1..PAGE_LIMIT_MAX."""
+    return max(1, min(limit, PAGE_LIMIT_MAX))
+
+def encode_cursor(sort_value, row_id):
+    """Opaque cursor pointing just past (sort_value, row_id)."""
+    payload = json.dumps([sort_value.isoformat() if sort_value else None, row_id])
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+def decode_cursor(cursor: str, sort_column):
+    try:
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if isinstance(sort_column.type, DateTime):
+            sort_value = datetime.fromisoformat(sort_value)
+        else:
+            sort_value = date.fromisoformat(sort_value)
+        return sort_value, int(row_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def keyset_page(query, sort_column, id_column, cursor: str = None, limit: int = 50, descending: bool = True):
+    """Return (rows, next_cursor) for one page ordered newest first by (sort_column, id).
+
+    Each page seeks directly past the previous one with a range predicate
+    instead of OFFSET, so deep pages cost the same as the first.
+    descending=False pages oldest (or soonest due) first instead.
+    """
+    rows = keyset_query(query, sort_column, id_column, cursor, limit, descending).all()
+    return keyset_trim(rows, sort_column, id_column, limit)
+
+def keyset_query(query, sort_column, id_column, cursor: str = None, limit: int = 50, descending: bool = True):
+    """Apply the keyset predicate, ordering and limit to a Query or select()."""
+    if cursor:
+        last_value, last_id = decode_cursor(cursor, sort_column)
+        if descending:
+            query = query.filter(or_(
+                sort_column < last_value,
+                and_(sort_column == last_value, id_column < last_id)
+            ))
+        else:
+            query = query.filter(or_(
+                sort_column > last_value,
+                and_(sort_column == last_value, id_column > last_id)
+            ))
+    if descending:
+        return query.order_by(sort_column.desc(), id_column.desc()).limit(limit + 1)
+    return query.order_by(sort_column, id_column).limit(limit + 1)
+
+def keyset_trim(rows, sort_column, id_column, limit: int):
+    """Drop the look-ahead row fetched by keyset_query and build the next cursor."""
+    next_cursor = None
+    if limit > 0 and len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, sort_column.key), getattr(last, id_column.key))
+    return rows, next_cursor
+
+# Cached totals per filter combination; refreshed after TOTAL_CACHE_TTL seconds
+# or dropped when an application is created. Least recently used filters are
+# evicted beyond TOTAL_CACHE_MAX_ENTRIES.
+TOTAL_CACHE_TTL = 30
+TOTAL_CACHE_MAX_ENTRIES = int(os.getenv("TOTAL_CACHE_MAX_ENTRIES", "1024"))
+_total_cache = LRUCache(max_entries=TOTAL_CACHE_MAX_ENTRIES, ttl=TOTAL_CACHE_TTL)
+
+def _cached_total_lookup(key):
+    return _total_cache.get(key)
+
+def _cached_total_store(key, total):
+    _total_cache.set(key, total)
+    return total
+
+def cached_total(query, key):
+    total = _cached_total_lookup(key)
+    return total if total is not None else _cached_total_store(key, query.count())
+
+async def cached_total_async(db: AsyncSession, query, key):
+    total = _cached_total_lookup(key)
+    if total is None:
+        total = _cached_total_store(key, await db.scalar(select(func.count()).select_from(query.subquery())))
+    return total
+
+# Read-through cache for broker profiles and application details.
+# Write endpoints drop the affected keys via invalidate_cached().
+response_cache = make_cache()
+response_generations = Generations()
+
+def store_response(key: str, generation: int, body, last_modified: datetime = None):
+    """
+    Wrap a response body with validators and cache it. Error bodies are not
+    cached, nor is a body read before an invalidation of `key` that happened
+    after `generation` was taken.
+    """
+    entry = make_entry(body, last_modified)
+    if not (isinstance(body, dict) and "error" in body) and response_generations.current(key) == generation:
+        response_cache.set(key, entry)
+    return entry
+
+def conditional_response(request: Request, entry: dict):
+    """200 with the cached body, or 304 when the client's ETag / date still matches."""
+    headers = {"ETag": entry["etag"], "Last-Modified": entry["last_modified"], "Cache-Control": "no-cache"}
+    if is_not_modified(entry, request.headers.get("if-none-match"), request.headers.get("if-modified-since")):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(entry["body"], headers=headers)
+
+def invalidate_cached(application_id: int = None, broker_id: int = None, ratings_changed: bool = False):
+    keys = []
+    if application_id is not None:
+        keys.append(f"application:{application_id}")
+    if broker_id is not None:
+        keys.append(f"broker_details:{broker_id}")
+        if ratings_changed:
+            keys.append(f"broker:{broker_id}")
+    response_generations.bump(*keys)
+    response_cache.delete(*keys)
+
+# Content-addressed OCR / forgery results: memory LRU in front of a size-bounded
+# SQLite file. Keys carry the OCR settings or forgery model version.
+analysis_cache = make_analysis_cache()
+
+def ocr_cache_key(image_bytes: bytes, structured: bool = False) -> str:
+    return content_key("ocr-structured" if structured else "ocr", image_bytes, OCR_ENGINE_VERSION)
+
+def forgery_cache_key(image_bytes: bytes) -> str:
+    return content_key("forgery", image_bytes, forgery_model_version())
+
+def ocr_succeeded(text) -> bool:
+    return not (isinstance(text, dict) and "error" in text) and not (isinstance(text, str) and text.startswith("Error:"))
+
 # Models for request/response
 class CitizenCreate(BaseModel):
     name: str
@@ -70,6 +277,7 @@ class ChatRequest(BaseModel):
 
 class OCRRequest(BaseModel):
     image: str  # base64 encoded image
+    structured: bool = False  # word boxes and confidences instead of plain text
 
 class ForgeryRequest(BaseModel):
     image: str
@@ -97,23 +305,16 @@ def create_citizen(citizen: CitizenCreate, db: Session = Depends(get_db)):
     db_citizen = Citizen(**citizen.dict())
     db.add(db_citizen)
     db.commit()
+    analytics_counters.add("total_citizens")
     db.refresh(db_citizen)
     return db_citizen
 
 @app.get("/brokers/")
-def list_brokers(db: Session = Depends(get_db)):
-    brokers = db.query(Broker).all()
+async def list_brokers(db: AsyncSession = Depends(get_async_db)):
     result = []
-    for broker in brokers:
-        ratings = db.query(Rating).join(Application).filter(Application.broker_id == broker.id).all()
-        if ratings:
-            avg_punctuality = sum([r.punctuality for r in ratings]) / len(ratings)
-            avg_quality = sum([r.quality for r in ratings]) / len(ratings)
-            avg_compliance = sum([r.compliance for r in ratings]) / len(ratings)
-            avg_communication = sum([r.communication for r in ratings]) / len(ratings)
-            avg_overall = sum([r.overall for r in ratings]) / len(ratings)
-        else:
-            avg_punctuality = avg_quality = avg_compliance = avg_communication = avg_overall = 0
+    for row in (await db.execute(broker_rating_select())).all():
+        broker = row[0]
+        averages = broker_rating_averages(row)
         result.append({
             'id': broker.id,
             'name': broker.name,
@@ -121,30 +322,30 @@ def list_brokers(db: Session = Depends(get_db)):
             'phone': broker.phone,
             'email': broker.email,
             'specialization': broker.specialization,
-            'avg_punctuality': avg_punctuality,
-            'avg_quality': avg_quality,
-            'avg_compliance': avg_compliance,
-            'avg_communication': avg_communication,
-            'avg_overall': avg_overall
+            'avg_punctuality': averages['avg_punctuality'],
+            'avg_quality': averages['avg_quality'],
+            'avg_compliance': averages['avg_compliance'],
+            'avg_communication': averages['avg_communication'],
+            'avg_overall': averages['avg_overall']
         })
     return result
 
 @app.get("/brokers/{broker_id}")
-def get_broker(broker_id: int, db: Session = Depends(get_db)):
-    broker = db.query(Broker).filter(Broker.id == broker_id).first()
-    if not broker:
+def get_broker(broker_id: int, request: Request, db: Session = Depends(get_db)):
+    key = f"broker:{broker_id}"
+    entry = response_cache.get(key)
+    if entry is None:
+        generation = response_generations.current(key)
+        entry = store_response(key, generation, *broker_profile(db, broker_id))
+    return conditional_response(request, entry)
+
+def broker_profile(db: Session, broker_id: int):
+    """(profile body, last change to the broker's stats)"""
+    rows = broker_rating_rows(db, broker_id)
+    if not rows:
         raise HTTPException(status_code=404, detail="Broker not found")
-
-    # Calculate average ratings (same logic as list_brokers)
-    ratings = db.query(Rating).join(Application).filter(Application.broker_id == broker.id).all()
-    if ratings:
-        avg_punctuality = sum([r.punctuality for r in ratings]) / len(ratings)
-        avg_quality = sum([r.quality for r in ratings]) / len(ratings)
-        avg_compliance = sum([r.compliance for r in ratings]) / len(ratings)
-        avg_communication = sum([r.communication for r in ratings]) / len(ratings)
-        avg_overall = sum([r.overall for r in ratings]) / len(ratings)
-    else:
-        avg_punctuality = avg_quality = avg_compliance = avg_communication = avg_overall = 0
+    broker, stats = rows[0]
+    averages = broker_rating_averages(rows[0])
 
     return {
         'id': broker.id,
@@ -153,70 +354,103 @@ def get_broker(broker_id: int, db: Session = Depends(get_db)):
         'phone': broker.phone,
         'email': broker.email,
         'specialization': broker.specialization,
-        'avg_punctuality': avg_punctuality,
-        'avg_quality': avg_quality,
-        'avg_compliance': avg_compliance,
-        'avg_communication': avg_communication,
-        'avg_overall': avg_overall
-    }
+        'avg_punctuality': averages['avg_punctuality'],
+        'avg_quality': averages['avg_quality'],
+        'avg_compliance': averages['avg_compliance'],
+        'avg_communication': averages['avg_communication'],
+        'avg_overall': averages['avg_overall']
+    }, stats.updated_at if stats else None
 
 @app.post("/applications/")
-def create_application(app: ApplicationCreate, db: Session = Depends(get_db)):
-    # Predict fraud
-    is_fraud = False
-    if MODEL_AVAILABLE:
-        # Create a dataframe for prediction
-        submission_day = datetime.now().timetuple().tm_yday
-        data = {
-            'citizen_id': [app.citizen_id],
-            'broker_id': [app.broker_id],
-            'application_type': [app.application_type],
-            'status': ['Pending'],
-            'submission_day': [submission_day],
-            'avg_rating': [3] # Default rating for new applications
-        }
-        df = pd.DataFrame(data)
-
-        # One-hot encode categorical variables
-        df = pd.get_dummies(df, columns=['application_type', 'status'])
-
-        # Align columns with the training data
-        # Get the columns from the training data
-        training_cols = ['citizen_id', 'broker_id', 'submission_day', 'avg_rating',
-       'application_type_New Registration', 'application_type_Renewal',
-       'application_type_Transfer', 'status_Approved', 'status_Pending',
-       'status_Rejected']
-        
-        df = df.reindex(columns=training_cols, fill_value=0)
-
-        # Predict
-        prediction = fraud_model.predict(df)[0]
-        is_fraud = bool(prediction)
+def create_application(app: ApplicationCreate, background: bool = False, db: Session = Depends(get_db)):
+    # Predict fraud now, or with background=true leave is_fraud unset and score it on the job queue
+    is_fraud = None if background else score_batch([app])[0]
 
     db_app = Application(**app.dict(), status="Pending", submission_date=datetime.now().date(), is_fraud=is_fraud)
     db.add(db_app)
+    broker_stats.record_application(db, db_app.broker_id, db_app.status)
+    analytics.record_applications(db, [db_app])
     db.commit()
+    _total_cache.clear()
+    analytics_counters.add("total_applications")
+    invalidate_cached(broker_id=db_app.broker_id)
     db.refresh(db_app)
+    if background:
+        return accepted(background_jobs.submit("fraud_score", {"application_id": db_app.id, **app.dict()}), id=db_app.id)
     return db_app
 
+@background_jobs.handler("fraud_score")
+def fraud_score_job(payload: dict):
+    application_id = payload.pop("application_id")
+    is_fraud = bool(score_batch([ApplicationCreate(**payload)])[0])
+    with Session(bind=engine) as db:
+        db_app = db.get(Application, application_id)
+        if db_app is None or db_app.is_fraud is not None:
+            return {"application_id": application_id, "is_fraud": db_app.is_fraud if db_app else None}
+        if is_fraud:
+            analytics.record_fraud_flag(db, db_app)
+        db_app.is_fraud = is_fraud
+        db.commit()
+        invalidate_cached(application_id=application_id, broker_id=db_app.broker_id)
+    return {"application_id": application_id, "is_fraud": is_fraud}
+
+@app.post("/applications/bulk")
+def create_applications_bulk(applications: List[ApplicationCreate], db: Session = Depends(get_db)):
+    """Create many applications with one fraud predict call and one transaction"""
+    flags = score_batch(applications)
+    today = datetime.now().date()
+    rows = [
+        dict(app.dict(), status="Pending", submission_date=today, is_fraud=is_fraud)
+        for app, is_fraud in zip(applications, flags)
+    ]
+    if not rows:
+        return {"created": 0, "fraud_flagged": 0, "applications": []}
+
+    # Ids in input order so they line up with flags (not guaranteed otherwise, e.g. on PostgreSQL)
+    ids = db.scalars(insert(Application).returning(Application.id, sort_by_parameter_order=True), rows).all()
+    for broker_id, count in Counter(app.broker_id for app in applications).items():
+        broker_stats.record_application(db, broker_id, "Pending", count)
+    analytics.record_applications(db, [SimpleNamespace(**row) for row in rows])
+    db.commit()
+    _total_cache.clear()
+    analytics_counters.add("total_applications", len(ids))
+    for broker_id in {app.broker_id for app in applications}:
+        invalidate_cached(broker_id=broker_id)
+
+    return {
+        "created": len(ids),
+        "fraud_flagged": sum(flags),
+        "applications": [{"id": app_id, "is_fraud": is_fraud} for app_id, is_fraud in zip(ids, flags)]
+    }
+
 @app.get("/applications/")
-def list_applications(citizen_id: int = None, broker_id: int = None, is_fraud: bool = None, page: int = 1, limit: int = 50, db: Session = Depends(get_db)):
-    query = db.query(Application)
+async def list_applications(citizen_id: int = None, broker_id: int = None, is_fraud: bool = None, cursor: str = None, page: int = 1, limit: int = 50, include_total: bool = True, db: AsyncSession = Depends(get_async_db)):
+    """List applications newest first.
+
+    Pass the returned next_cursor back as `cursor` to fetch the following
+    page. `page` is still honoured (via OFFSET) for older clients. `total`
+    is cached per filter combination for a few seconds and may lag slightly.
+    """
+    limit = page_limit(limit)
+    query = select(Application)
 
     # Apply filters
     if citizen_id:
-        query = query.filter(Application.citizen_id == citizen_id)
+        query = query.where(Application.citizen_id == citizen_id)
     if broker_id:
-        query = query.filter(Application.broker_id == broker_id)
+        query = query.where(Application.broker_id == broker_id)
     if is_fraud is not None:
-        query = query.filter(Application.is_fraud == is_fraud)
+        query = query.where(Application.is_fraud == is_fraud)
 
-    # Get total count
-    total = query.count()
+    total = await cached_total_async(db, query, (citizen_id, broker_id, is_fraud)) if include_total else None
 
     # Apply pagination
-    offset = (page - 1) * limit
-    applications = query.offset(offset).limit(limit).all()
+    if not cursor and page > 1:
+        query = query.order_by(Application.submission_date.desc(), Application.id.desc())
+        rows = (await db.scalars(query.offset((page - 1) * limit).limit(limit + 1))).all()
+    else:
+        rows = (await db.scalars(keyset_query(query, Application.submission_date, Application.id, cursor, limit))).all()
+    applications, next_cursor = keyset_trim(rows, Application.submission_date, Application.id, limit)
 
     result = []
     for app in applications:
@@ -230,58 +464,215 @@ def list_applications(citizen_id: int = None, broker_id: int = None, is_fraud: b
             "documents": app.documents,
             "is_fraud": app.is_fraud
         })
-    return {"total": total, "page": page, "limit": limit, "applications": result}
+    return {"total": total, "page": page, "limit": limit, "next_cursor": next_cursor, "applications": result}
 
 @app.get("/analytics/")
-def get_analytics(db: Session = Depends(get_db)):
-    total_citizens = db.query(Citizen).count()
-    total_brokers = db.query(Broker).count()
-    total_apps = db.query(Application).count()
-    approved_apps = db.query(Application).filter(Application.status == "Approved").count()
-    return {
-        "total_citizens": total_citizens,
-        "total_brokers": total_brokers,
-        "total_applications": total_apps,
-        "approved_applications": approved_apps
-    }
+async def get_analytics(db: AsyncSession = Depends(get_async_db)):
+    """Platform totals, served from memory and reloaded every few minutes"""
+    if not analytics_counters.fresh():
+        analytics_counters.load({
+            key: await db.scalar(query) for key, query in analytics.totals_selects().items()
+        })
+    return analytics_counters.get()
+
+@app.get("/analytics/timeseries")
+async def get_analytics_timeseries(days: int = 30, end: date = None, group_by: str = None, db: AsyncSession = Depends(get_async_db)):
+    """Applications per day up to `end` (default today), optionally split by application_type, status or registering_authority"""
+    if group_by and group_by not in analytics.ROLLUP_DIMENSIONS:
+        raise HTTPException(status_code=400, detail=f"group_by must be one of {analytics.ROLLUP_DIMENSIONS}")
+    days = max(1, min(days, 366))
+    end = end or datetime.now().date()
+    start = end - timedelta(days=days - 1)
+    dates = [(start + timedelta(days=i)).isoformat() for i in range(days)]
+    position = {d: i for i, d in enumerate(dates)}
+
+    series = {}
+    for row in (await db.execute(analytics.timeseries_select(start, end, group_by))).all():
+        key = row[1] if group_by else "total"
+        series.setdefault(key, [0] * days)[position[row[0].isoformat()]] = row[-2]
+
+    return {"dates": dates, "group_by": group_by, "series": series}
+
+@app.get("/analytics/fraud-rate")
+async def get_fraud_rate(days: int = 30, end: date = None, db: AsyncSession = Depends(get_async_db)):
+    """Daily fraud rate over the window ending at `end` (default today)"""
+    days = max(1, min(days, 366))
+    end = end or datetime.now().date()
+    start = end - timedelta(days=days - 1)
+    counts = {row[0]: (row[1], row[2]) for row in (await db.execute(analytics.timeseries_select(start, end))).all()}
+
+    result = []
+    for i in range(days):
+        day = start + timedelta(days=i)
+        applications, fraud = counts.get(day, (0, 0))
+        result.append({
+            "date": day.isoformat(),
+            "applications": applications,
+            "fraud": fraud,
+            "fraud_rate": round(fraud / applications * 100, 2) if applications else 0
+        })
+    return result
+
+# Curated RTO knowledge + live lookups; answers locally when confident
+knowledge_base = knowledge.KnowledgeBase()
 
 @app.post("/chat/")
-def chat(request: ChatRequest):
-    response = get_chatbot_response(request.message)
-    return {"response": response}
+def chat(request: ChatRequest, background: bool = False, db: Session = Depends(get_db)):
+    grounding = knowledge_base.lookup(db, request.message)
+    if grounding["answer"]:
+        return {"response": grounding["answer"], "source": grounding["source"]}
+    if background:
+        return accepted(background_jobs.submit("chat", {"message": request.message, "passages": grounding["passages"]}))
+    response = get_chatbot_response(request.message, grounding["passages"])
+    return {"response": response, "source": "llm"}
+
+@background_jobs.handler("chat")
+def chat_job(payload: dict):
+    response = get_chatbot_response(payload["message"], payload["passages"])
+    if response.startswith("Error:"):
+        raise RuntimeError(response)
+    return {"response": response, "source": "llm"}
+
+@app.post("/chat/stream")
+def chat_stream(request: ChatRequest, db: Session = Depends(get_db)):
+    """Server-sent events: one `data: {"token": ...}` event per chunk, then `event: done`."""
+    grounding = knowledge_base.lookup(db, request.message)
+    tokens = [grounding["answer"]] if grounding["answer"] else stream_chatbot_response(request.message, grounding["passages"])
+
+    def events():
+        for token in tokens:
+            yield f"data: {json.dumps({'token': token})}\n\n"
+        yield "event: done\ndata: {}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
 
 @app.post("/ocr/")
-def ocr(request: OCRRequest):
+async def ocr(request: OCRRequest, background: bool = False):
     try:
         image_bytes = base64.b64decode(request.image)
-        text = extract_text_from_image(image_bytes)
+        key = ocr_cache_key(image_bytes, request.structured)
+        cached = analysis_cache.get(key)
+        if cached is not None:
+            return {"extracted_text": cached}
+        if background:
+            return accepted(await asyncio.to_thread(background_jobs.submit, "ocr", request.dict()))
+        # Preprocessing and Tesseract run on the OCR process pool
+        text = await extract_text_from_image_async(image_bytes, request.structured)
+        if ocr_succeeded(text):
+            analysis_cache.set(key, text)
         return {"extracted_text": text}
     except Exception as e:
         return {"error": str(e)}
 
 @app.post("/forgery/")
-def detect_forgery(request: ForgeryRequest):
+async def detect_forgery(request: ForgeryRequest, background: bool = False):
     try:
         image_bytes = base64.b64decode(request.image)
     except Exception as exc:
         return {"status": "error", "error": f"Invalid image payload: {exc}"}
+    key = forgery_cache_key(image_bytes)
+    cached = analysis_cache.get(key)
+    if cached is not None:
+        return cached
+    if background:
+        return accepted(await asyncio.to_thread(background_jobs.submit, "forgery", {"image": request.image}))
+    try:
+        # Runs on the forgery worker pool; the event loop only awaits the result
+        result = await analyze_document_async(image_bytes)
+    except ForgeryQueueFull:
+        raise HTTPException(status_code=503, detail="Forgery analysis is busy, please retry", headers={"Retry-After": "1"})
+    if result.get("status") == "ok":
+        analysis_cache.set(key, result)
+    return result
+
+@background_jobs.handler("ocr")
+def ocr_job(payload: dict):
+    image_bytes = base64.b64decode(payload["image"])
+    structured = payload.get("structured", False)
+    text = extract_text_from_image(image_bytes, structured)
+    if not ocr_succeeded(text):
+        raise RuntimeError(text["error"] if isinstance(text, dict) else text)
+    analysis_cache.set(ocr_cache_key(image_bytes, structured), text)
+    return {"extracted_text": text}
+
+@background_jobs.handler("forgery")
+def forgery_job(payload: dict):
+    image_bytes = base64.b64decode(payload["image"])
+    # ForgeryQueueFull propagates, so a busy pool is retried with backoff
     result = analyze_document(image_bytes)
+    if result.get("status") == "ok":
+        analysis_cache.set(forgery_cache_key(image_bytes), result)
     return result
 
+@app.get("/jobs/{job_id}")
+def get_job(job_id: int):
+    """Status of a background job; result (or error) once it has finished."""
+    job = background_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.post("/documents/verify-batch")
+async def verify_documents(files: List[UploadFile] = File(...)):
+    """
+    OCR and forgery check for several uploaded documents. Each image is decoded
+    once per document on the process pool; results stream back as NDJSON lines
+    in completion order, tagged with the upload index and filename.
+    """
+    uploads = [(index, upload.filename, await upload.read()) for index, upload in enumerate(files)]
+    loop = asyncio.get_running_loop()
+    pool = document_pool()
+
+    async def verify(index, filename, image_bytes):
+        ocr_key, forgery_key = ocr_cache_key(image_bytes), forgery_cache_key(image_bytes)
+        text, forgery = analysis_cache.get(ocr_key), analysis_cache.get(forgery_key)
+        if text is not None and forgery is not None:
+            return {"index": index, "filename": filename, "status": "ok", "extracted_text": text, "forgery": forgery}
+        try:
+            result = await loop.run_in_executor(pool, verify_document, image_bytes)
+        except Exception as exc:
+            result = {"status": "error", "error": str(exc)}
+        if result.get("status") == "ok":
+            if ocr_succeeded(result["extracted_text"]):
+                analysis_cache.set(ocr_key, result["extracted_text"])
+            if result["forgery"].get("status") == "ok":
+                analysis_cache.set(forgery_key, result["forgery"])
+        return {"index": index, "filename": filename, **result}
+
+    async def results():
+        for task in asyncio.as_completed([verify(*upload) for upload in uploads]):
+            yield json.dumps(await task) + "\n"
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
 # New endpoints for complete functionality
 
 @app.get("/applications/{application_id}")
-def get_application(application_id: int, db: Session = Depends(get_db)):
-    app = db.query(Application).filter(Application.id == application_id).first()
+async def get_application(application_id: int, request: Request, db: AsyncSession = Depends(get_async_db)):
+    key = f"application:{application_id}"
+    entry = response_cache.get(key)
+    if entry is None:
+        generation = response_generations.current(key)
+        entry = store_response(key, generation, *await application_detail(db, application_id))
+    return conditional_response(request, entry)
+
+async def application_detail(db: AsyncSession, application_id: int):
+    """(detail body, the application's updated_at)"""
+    # Citizen, broker and vehicle particulars come back in the same row; ratings in one follow-up query
+    app = (await db.scalars(select(Application).options(
+        joinedload(Application.citizen),
+        joinedload(Application.broker),
+        joinedload(Application.vehicle_details),
+        selectinload(Application.ratings)
+    ).where(Application.id == application_id))).first()
     if not app:
-        return {"error": "Application not found"}
+        return {"error": "Application not found"}, None
 
-    # Get citizen and broker details
-    citizen = db.query(Citizen).filter(Citizen.id == app.citizen_id).first()
-    broker = db.query(Broker).filter(Broker.id == app.broker_id).first()
-
-    # Get rating if exists
-    rating = db.query(Rating).filter(Rating.application_id == app.id).first()
+    citizen = app.citizen
+    broker = app.broker
+    # As submitted with this application, not the vehicle's current record
+    vehicle = app.vehicle_details or ApplicationVehicleDetails()
+    rating = app.ratings[0] if app.ratings else None
 
     return {
         "id": app.id,
@@ -305,31 +696,31 @@ def get_application(application_id: int, db: Session = Depends(get_db)):
         "documents": app.documents,
         "is_fraud": app.is_fraud,
         "vehicle_details": {
-            "owner_name": app.owner_name,
-            "owner_so": app.owner_so,
-            "owner_address": app.owner_address,
-            "ownership": app.ownership,
-            "chassis_number": app.chassis_number,
-            "engine_number": app.engine_number,
-            "cubic_capacity": app.cubic_capacity,
-            "maker_name": app.maker_name,
-            "model_name": app.model_name,
-            "date_of_registration": app.date_of_registration.isoformat() if app.date_of_registration else None,
-            "registration_valid_upto": app.registration_valid_upto.isoformat() if app.registration_valid_upto else None,
-            "tax_valid_upto": app.tax_valid_upto.isoformat() if app.tax_valid_upto else None,
-            "fitness_status": app.fitness_status,
-            "vehicle_class": app.vehicle_class,
-            "vehicle_description": app.vehicle_description,
-            "fuel_type": app.fuel_type,
-            "emission_norm": app.emission_norm,
-            "seat_capacity": app.seat_capacity,
-            "vehicle_color": app.vehicle_color,
-            "insurance_details": app.insurance_details,
-            "insurance_valid_upto": app.insurance_valid_upto.isoformat() if app.insurance_valid_upto else None,
-            "pucc_no": app.pucc_no,
-            "pucc_valid_upto": app.pucc_valid_upto.isoformat() if app.pucc_valid_upto else None,
+            "owner_name": vehicle.owner_name,
+            "owner_so": vehicle.owner_so,
+            "owner_address": vehicle.owner_address,
+            "ownership": vehicle.ownership,
+            "chassis_number": vehicle.chassis_number,
+            "engine_number": vehicle.engine_number,
+            "cubic_capacity": vehicle.cubic_capacity,
+            "maker_name": vehicle.maker_name,
+            "model_name": vehicle.model_name,
+            "date_of_registration": vehicle.date_of_registration.isoformat() if vehicle.date_of_registration else None,
+            "registration_valid_upto": vehicle.registration_valid_upto.isoformat() if vehicle.registration_valid_upto else None,
+            "tax_valid_upto": vehicle.tax_valid_upto.isoformat() if vehicle.tax_valid_upto else None,
+            "fitness_status": vehicle.fitness_status,
+            "vehicle_class": vehicle.vehicle_class,
+            "vehicle_description": vehicle.vehicle_description,
+            "fuel_type": vehicle.fuel_type,
+            "emission_norm": vehicle.emission_norm,
+            "seat_capacity": vehicle.seat_capacity,
+            "vehicle_color": vehicle.vehicle_color,
+            "insurance_details": vehicle.insurance_details,
+            "insurance_valid_upto": vehicle.insurance_valid_upto.isoformat() if vehicle.insurance_valid_upto else None,
+            "pucc_no": vehicle.pucc_no,
+            "pucc_valid_upto": vehicle.pucc_valid_upto.isoformat() if vehicle.pucc_valid_upto else None,
             "registering_authority": app.registering_authority,
-            "registration_number": app.registration_number
+            "registration_number": vehicle.registration_number
         },
         "rating": {
             "punctuality": rating.punctuality,
@@ -338,33 +729,31 @@ def get_application(application_id: int, db: Session = Depends(get_db)):
             "communication": rating.communication,
             "overall": rating.overall
         } if rating else None
-    }
+    }, app.updated_at
 
 @app.get("/brokers/{broker_id}/details")
-def get_broker_details(broker_id: int, db: Session = Depends(get_db)):
-    broker = db.query(Broker).filter(Broker.id == broker_id).first()
-    if not broker:
-        return {"error": "Broker not found"}
-
-    # Get ratings
-    ratings = db.query(Rating).join(Application).filter(Application.broker_id == broker_id).all()
-
-    # Calculate average ratings
-    if ratings:
-        avg_punctuality = sum([r.punctuality for r in ratings]) / len(ratings)
-        avg_quality = sum([r.quality for r in ratings]) / len(ratings)
-        avg_compliance = sum([r.compliance for r in ratings]) / len(ratings)
-        avg_communication = sum([r.communication for r in ratings]) / len(ratings)
-        avg_overall = sum([r.overall for r in ratings]) / len(ratings)
-    else:
-        avg_punctuality = avg_quality = avg_compliance = avg_communication = avg_overall = 0
+def get_broker_details(broker_id: int, request: Request, db: Session = Depends(get_db)):
+    key = f"broker_details:{broker_id}"
+    entry = response_cache.get(key)
+    if entry is None:
+        generation = response_generations.current(key)
+        entry = store_response(key, generation, *broker_details(db, broker_id))
+    return conditional_response(request, entry)
+
+def broker_details(db: Session, broker_id: int):
+    """(details body, last change to the broker's stats)"""
+    rows = broker_rating_rows(db, broker_id)
+    if not rows:
+        return {"error": "Broker not found"}, None
+    broker, stats = rows[0]
+    averages = broker_rating_averages(rows[0])
 
     # Get recent applications
     recent_apps = db.query(Application).filter(Application.broker_id == broker_id).order_by(Application.submission_date.desc()).limit(10).all()
 
     # Calculate success rate
-    total_apps = db.query(Application).filter(Application.broker_id == broker_id).count()
-    approved_apps = db.query(Application).filter(Application.broker_id == broker_id, Application.status == "Approved").count()
+    total_apps = rows[0][1].total_applications if rows[0][1] else 0
+    approved_apps = broker_stats.status_count(db, broker_id, "Approved")
     success_rate = (approved_apps / total_apps * 100) if total_apps > 0 else 0
 
     return {
@@ -375,12 +764,12 @@ def get_broker_details(broker_id: int, db: Session = Depends(get_db)):
         "email": broker.email,
         "specialization": broker.specialization,
         "ratings": {
-            "punctuality": round(avg_punctuality, 2),
-            "quality": round(avg_quality, 2),
-            "compliance": round(avg_compliance, 2),
-            "communication": round(avg_communication, 2),
-            "overall": round(avg_overall, 2),
-            "total_ratings": len(ratings)
+            "punctuality": round(averages["avg_punctuality"], 2),
+            "quality": round(averages["avg_quality"], 2),
+            "compliance": round(averages["avg_compliance"], 2),
+            "communication": round(averages["avg_communication"], 2),
+            "overall": round(averages["avg_overall"], 2),
+            "total_ratings": averages["total_ratings"]
         },
         "statistics": {
             "total_applications": total_apps,
@@ -393,59 +782,75 @@ def get_broker_details(broker_id: int, db: Session = Depends(get_db)):
             "status": app.status,
             "submission_date": app.submission_date.isoformat() if app.submission_date else None
         } for app in recent_apps]
-    }
+    }, stats.updated_at if stats else None
 
 @app.get("/brokers/{broker_id}/assignments")
 def get_broker_assignments(broker_id: int, db: Session = Depends(get_db)):
-    applications = db.query(Application).filter(Application.broker_id == broker_id, Application.status.in_(["Pending", "In Progress"])).all()
+    # Only the columns shown in the list, with the citizen name joined in
+    applications = db.query(
+        Application.id,
+        Application.application_type,
+        Application.status,
+        Application.submission_date,
+        Application.is_fraud,
+        Citizen.name.label("citizen_name")
+    ).outerjoin(Citizen, Citizen.id == Application.citizen_id).filter(
+        Application.broker_id == broker_id,
+        Application.status.in_(["Pending", "In Progress"])
+    ).all()
 
     result = []
     for app in applications:
-        citizen = db.query(Citizen).filter(Citizen.id == app.citizen_id).first()
         result.append({
             "id": app.id,
             "application_type": app.application_type,
             "status": app.status,
             "submission_date": app.submission_date.isoformat() if app.submission_date else None,
-            "citizen_name": citizen.name if citizen else "Unknown",
+            "citizen_name": app.citizen_name if app.citizen_name else "Unknown",
             "is_fraud": app.is_fraud
         })
 
     return result
 
 @app.get("/brokers/{broker_id}/statistics")
-def get_broker_statistics(broker_id: int, db: Session = Depends(get_db)):
-    from sqlalchemy import func
-    from datetime import timedelta
+def get_broker_statistics(broker_id: int, days: int = 7, db: Session = Depends(get_db)):
+    """Daily assignment counts over the last `days` days plus overall totals.
 
-    # Daily stats for last 7 days
+    Served by two queries whatever the window size: one GROUP BY over the
+    window and one conditional aggregate for the totals.
+    """
+    days = max(1, min(days, 366))
+
+    # Daily stats for the window
     today = datetime.now().date()
-    daily_stats = []
+    start = today - timedelta(days=days - 1)
+    counts = dict(db.query(Application.submission_date, func.count(Application.id)).filter(
+        Application.broker_id == broker_id,
+        Application.submission_date >= start,
+        Application.submission_date <= today
+    ).group_by(Application.submission_date).all())
 
-    for i in range(6, -1, -1):
+    daily_stats = []
+    for i in range(days - 1, -1, -1):
         day = today - timedelta(days=i)
-        day_name = day.strftime("%A")[:3]  # Mon, Tue, etc.
-
-        count = db.query(Application).filter(
-            Application.broker_id == broker_id,
-            Application.submission_date == day
-        ).count()
-
         daily_stats.append({
-            "day": day_name,
-            "count": count
+            "day": day.strftime("%A")[:3],  # Mon, Tue, etc.
+            "date": day.isoformat(),
+            "count": counts.get(day, 0)
         })
 
     # Overall stats
-    total_assigned = db.query(Application).filter(Application.broker_id == broker_id).count()
-    pending = db.query(Application).filter(Application.broker_id == broker_id, Application.status == "Pending").count()
-    approved = db.query(Application).filter(Application.broker_id == broker_id, Application.status == "Approved").count()
+    total_assigned, pending, approved = db.query(
+        func.count(Application.id),
+        func.sum(case((Application.status == "Pending", 1), else_=0)),
+        func.sum(case((Application.status == "Approved", 1), else_=0))
+    ).filter(Application.broker_id == broker_id).one()
 
     return {
         "daily_assignments": daily_stats,
         "total_assigned": total_assigned,
-        "pending": pending,
-        "approved": approved
+        "pending": pending or 0,
+        "approved": approved or 0
     }
 
 # Broker workflow endpoints
@@ -453,16 +858,21 @@ def get_broker_statistics(broker_id: int, db: Session = Depends(get_db)):
 @app.post("/brokers/{broker_id}/start-job")
 def start_job(broker_id: int, request: StartJobRequest, db: Session = Depends(get_db)):
     """Start a new job by searching for vehicle"""
-    # Search for application by vehicle registration number
-    app = db.query(Application).filter(Application.registration_number == request.vehicle_number).first()
-
-    if app:
+    # Latest application for the vehicle, by normalized registration number ("tn 97 ch 2129" == "TN97CH2129")
+    key = normalize_registration(request.vehicle_number)
+    row = db.execute(
+        select(Application, Vehicle).join(Vehicle, Application.vehicle_id == Vehicle.id)
+        .where(Vehicle.registration_key == key).order_by(*LATEST_APPLICATION_FIRST).limit(1)
+    ).first() if key else None
+
+    if row:
+        app, vehicle = row
         return {
             "success": True,
             "application": {
                 "id": app.id,
-                "vehicle_number": app.registration_number,
-                "owner_name": app.owner_name,
+                "vehicle_number": vehicle.registration_number,
+                "owner_name": vehicle.owner_name,
                 "status": app.status
             }
         }
@@ -470,9 +880,116 @@ def start_job(broker_id: int, request: StartJobRequest, db: Session = Depends(ge
         # If not found in applications, search in any vehicle with this number
         return {
             "success": False,
-            "message": "Vehicle not found in system. Please create new application."
+            "message": "Vehicle not found in system. Please create new application.",
+            "suggestions": [match for match, _ in vehicles.vehicle_index(db).search(request.vehicle_number, 5)]
         }
 
+@app.get("/vehicles/search")
+def search_vehicles(q: str, limit: int = 10, db: Session = Depends(get_db)):
+    """
+    Registration-number search: exact, prefix and one-typo matches from the
+    in-memory index, plus exact chassis / engine number matches.
+    """
+    limit = max(1, min(limit, 50))
+    key = normalize_registration(q)
+    if not key:
+        return {"query": q, "results": []}
+
+    matches = dict(vehicles.vehicle_index(db).search(key, limit))
+    for field, match in ((Vehicle.chassis_number, "chassis"), (Vehicle.engine_number, "engine")):
+        for registration_key in db.scalars(select(Vehicle.registration_key).where(field == key).limit(limit)):
+            if registration_key:
+                matches.setdefault(registration_key, match)
+    matches = dict(list(matches.items())[:limit])
+
+    # Matched vehicles and their latest application, in two indexed IN queries
+    found = {vehicle.registration_key: vehicle for vehicle in db.scalars(
+        select(Vehicle).where(Vehicle.registration_key.in_(list(matches))))}
+    latest = {}
+    for application_id, vehicle_id, status in db.execute(
+            select(Application.id, Application.vehicle_id, Application.status)
+            .where(Application.vehicle_id.in_([vehicle.id for vehicle in found.values()]))
+            .order_by(*APPLICATION_RECENCY)):
+        latest[vehicle_id] = (application_id, status)
+
+    results = []
+    for registration_key, match in matches.items():
+        vehicle = found.get(registration_key)
+        if vehicle is None:
+            continue
+        application_id, status = latest.get(vehicle.id, (None, None))
+        results.append({
+            "registration_number": vehicle.registration_number,
+            "match": match,
+            "application_id": application_id,
+            "owner_name": vehicle.owner_name,
+            "maker_name": vehicle.maker_name,
+            "model_name": vehicle.model_name,
+            "status": status
+        })
+    return {"query": q, "results": results}
+
+@app.get("/compliance/expiring")
+def compliance_expiring(response: Response, kind: str, within_days: int = 30, include_lapsed: bool = False, as_of: date = None, cursor: str = None, limit: int = 100, db: Session = Depends(get_db)):
+    """Vehicles whose registration / tax / insurance / PUCC falls due within `within_days`, soonest first.
+
+    kind=fitness lists vehicles whose fitness has lapsed (there is no fitness
+    validity date), by registration validity; vehicles without one are not
+    listed. The next page cursor is sent in X-Next-Cursor.
+    """
+    if kind not in compliance.KINDS and kind != "fitness":
+        raise HTTPException(status_code=400, detail=f"kind must be one of {list(compliance.KINDS) + ['fitness']}")
+    if not 0 <= within_days <= compliance.COMPLIANCE_MAX_WINDOW_DAYS:
+        raise HTTPException(status_code=400, detail=f"within_days must be between 0 and {compliance.COMPLIANCE_MAX_WINDOW_DAYS}")
+    today = as_of or date.today()
+    query, column = compliance.expiring_query(db, kind, within_days, today, include_lapsed)
+    rows, next_cursor = keyset_page(query, column, Vehicle.id, cursor, page_limit(limit), descending=False)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+
+    brokers = compliance.latest_brokers(db, [v.id for v in rows])
+    result = []
+    for v in rows:
+        due = getattr(v, column.key)
+        result.append({
+            "vehicle_id": v.id,
+            "registration_number": v.registration_number,
+            "owner_name": v.owner_name,
+            "kind": kind,
+            "due_date": due.isoformat() if due else None,
+            "days_left": (due - today).days if due else None,
+            "broker_id": brokers.get(v.id)
+        })
+    return result
+
+@app.get("/brokers/{broker_id}/compliance-leads")
+def get_broker_compliance_leads(broker_id: int, response: Response, lead_type: str = None, cursor: str = None, limit: int = 100, db: Session = Depends(get_db)):
+    """Reminder / renewal leads from the nightly compliance scan, soonest due first."""
+    query = db.query(ComplianceLead).options(joinedload(ComplianceLead.vehicle)).filter(ComplianceLead.broker_id == broker_id)
+    if lead_type:
+        query = query.filter(ComplianceLead.lead_type == lead_type)
+    leads, next_cursor = keyset_page(query, ComplianceLead.due_date, ComplianceLead.id, cursor, page_limit(limit), descending=False)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+
+    return [{
+        "id": lead.id,
+        "vehicle_id": lead.vehicle_id,
+        "registration_number": lead.vehicle.registration_number if lead.vehicle else None,
+        "owner_name": lead.vehicle.owner_name if lead.vehicle else None,
+        "kind": lead.kind,
+        "due_date": lead.due_date.isoformat() if lead.due_date else None,
+        "lead_type": lead.lead_type,
+        "generated_on": lead.generated_on.isoformat() if lead.generated_on else None
+    } for lead in leads]
+
+@app.post("/admin/compliance/scan")
+def run_compliance_scan(day: date = None, db: Session = Depends(get_db)):
+    """Run the compliance scan now (normally run nightly with `python compliance.py`)"""
+    started = time.perf_counter()
+    created = compliance.scan(db, day)
+    return {"leads_created": created, "elapsed_seconds": round(time.perf_counter() - started, 3)}
+
 @app.post("/brokers/verify-otp")
 def verify_otp(request: VerifyOTPRequest):
     """Verify OTP (mock implementation)"""
@@ -492,36 +1009,8 @@ def verify_otp(request: VerifyOTPRequest):
 @app.post("/applications/{application_id}/calculate-fee")
 def calculate_fee(application_id: int, request: FeeEstimateRequest, db: Session = Depends(get_db)):
     """Calculate fee estimate for application"""
-    # Fee structure
-    base_fees = {
-        "New Registration": 1500,
-        "Renewal": 800,
-        "Transfer": 1000
-    }
-
-    vehicle_class_multiplier = {
-        "Two Wheeler": 1.0,
-        "Four Wheeler": 1.5,
-        "Commercial": 2.0,
-        "Heavy Vehicle": 3.0
-    }
-
-    base_fee = base_fees.get(request.application_type, 1000)
-    multiplier = vehicle_class_multiplier.get(request.vehicle_class, 1.0)
-
-    service_fee = base_fee * multiplier
-    broker_commission = service_fee * 0.15
-    tax = service_fee * 0.18  # GST
-    total = service_fee + broker_commission + tax
-
     return {
-        "breakdown": {
-            "base_fee": round(base_fee, 2),
-            "service_fee": round(service_fee, 2),
-            "broker_commission": round(broker_commission, 2),
-            "tax_gst": round(tax, 2),
-            "total": round(total, 2)
-        },
+        "breakdown": fee_breakdown(request.application_type, request.vehicle_class),
         "application_type": request.application_type,
         "vehicle_class": request.vehicle_class
     }
@@ -547,8 +1036,8 @@ def submit_complaint(complaint: ComplaintRequest, db: Session = Depends(get_db))
     }
 
 @app.get("/complaints")
-def list_complaints(broker_id: int = None, status: str = None, db: Session = Depends(get_db)):
-    """List complaints with filters"""
+def list_complaints(response: Response, broker_id: int = None, status: str = None, cursor: str = None, limit: int = 100, db: Session = Depends(get_db)):
+    """List complaints with filters, newest first. The next page cursor is sent in X-Next-Cursor."""
     query = db.query(Complaint)
 
     if broker_id:
@@ -556,7 +1045,9 @@ def list_complaints(broker_id: int = None, status: str = None, db: Session = Dep
     if status:
         query = query.filter(Complaint.status == status)
 
-    complaints = query.all()
+    complaints, next_cursor = keyset_page(query, Complaint.submitted_date, Complaint.id, cursor, page_limit(limit))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
 
     result = []
     for c in complaints:
@@ -580,8 +1071,13 @@ def update_application_status(application_id: int, status: str, db: Session = De
     if not app:
         return {"error": "Application not found"}
 
+    old_status = app.status
+    broker_stats.record_status_change(db, app.broker_id, old_status, status)
+    analytics.record_status_change(db, app, status)
     app.status = status
     db.commit()
+    analytics_counters.record_status_change(old_status, status)
+    invalidate_cached(application_id, app.broker_id)
 
     return {
         "success": True,
@@ -589,6 +1085,106 @@ def update_application_status(application_id: int, status: str, db: Session = De
         "new_status": status
     }
 
+# Largest batch accepted by /applications/bulk-status
+BULK_STATUS_MAX = int(os.getenv("BULK_STATUS_MAX", "10000"))
+
+class BulkStatusFilter(BaseModel):
+    status: Optional[str] = None
+    broker_id: Optional[int] = None
+    is_fraud: Optional[bool] = None
+
+class BulkStatusRequest(BaseModel):
+    status: str  # target status
+    ids: Optional[List[int]] = None
+    filter: Optional[BulkStatusFilter] = None  # used when ids is not given
+    limit: int = BULK_STATUS_MAX
+
+@app.post("/applications/bulk-status")
+def bulk_update_status(request: BulkStatusRequest, db: Session = Depends(get_db)):
+    """Move many applications to one status in a single transaction.
+
+    Targets are the given ids, or up to `limit` applications matching the
+    filter that are allowed to move to the target status. Each id is reported as updated, unchanged, not_found or
+    invalid_transition (see workflow.TRANSITIONS); only allowed moves are
+    applied, with one UPDATE, and the broker, rollup and dashboard counters
+    are adjusted per bucket rather than per application.
+    """
+    target = request.status
+    if target not in workflow.STATUSES:
+        raise HTTPException(status_code=400, detail=f"status must be one of {workflow.STATUSES}")
+    if request.ids is None and request.filter is None:
+        raise HTTPException(status_code=400, detail="Give ids or a filter")
+    limit = max(1, min(request.limit, BULK_STATUS_MAX))
+    if request.ids is not None and len(request.ids) > limit:
+        raise HTTPException(status_code=400, detail=f"At most {limit} ids per request")
+
+    # Current state of every target row, locked for the transaction where the database supports it
+    query = select(
+        Application.id, Application.broker_id, Application.status, Application.submission_date,
+        Application.application_type, Application.registering_authority, Application.is_fraud
+    ).with_for_update()
+    if request.ids is not None:
+        requested = list(dict.fromkeys(request.ids))
+        query = query.where(Application.id.in_(requested))
+    else:
+        f = request.filter
+        if f.status is not None:
+            query = query.where(Application.status == f.status)
+        if f.broker_id is not None:
+            query = query.where(Application.broker_id == f.broker_id)
+        if f.is_fraud is not None:
+            query = query.where(Application.is_fraud == f.is_fraud)
+        # Only rows that can actually move, so repeated calls drain the backlog instead of re-reading it
+        query = query.where(Application.status.in_(workflow.sources(target)))
+        query = query.order_by(Application.id).limit(limit)
+        requested = None
+    rows = {row.id: row for row in db.execute(query)}
+    if requested is None:
+        requested = list(rows)
+
+    results = []
+    moving = []
+    for application_id in requested:
+        row = rows.get(application_id)
+        if row is None:
+            results.append({"id": application_id, "outcome": "not_found"})
+            continue
+        outcome = workflow.transition_outcome(row.status, target)
+        results.append({"id": application_id, "outcome": outcome, "from_status": row.status})
+        if outcome == "updated":
+            moving.append(row)
+
+    if moving:
+        from_statuses = sorted({row.status for row in moving})
+        result = db.execute(
+            update(Application)
+            .where(Application.id.in_([row.id for row in moving]), Application.status.in_(from_statuses))
+            .values(status=target)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount != len(moving):
+            db.rollback()
+            raise HTTPException(status_code=409, detail="Applications changed during the update, please retry")
+        broker_stats.record_status_changes(db, Counter((row.broker_id, row.status) for row in moving), target)
+        analytics.record_status_changes(db, moving, target)
+    db.commit()
+
+    for old_status, count in Counter(row.status for row in moving).items():
+        analytics_counters.record_status_change(old_status, target, count)
+    for row in moving:
+        invalidate_cached(row.id, row.broker_id)
+
+    outcomes = Counter(r["outcome"] for r in results)
+    return {
+        "status": target,
+        "requested": len(results),
+        "updated": outcomes["updated"],
+        "unchanged": outcomes["unchanged"],
+        "not_found": outcomes["not_found"],
+        "invalid_transition": outcomes["invalid_transition"],
+        "results": results
+    }
+
 @app.get("/support/info")
 def get_support_info():
     """Get toll-free and support information"""
@@ -617,8 +1213,13 @@ def approve_application(application_id: int, request: ApproveRequest, db: Sessio
     if not app:
         return {"error": "Application not found"}
 
+    old_status = app.status
+    broker_stats.record_status_change(db, app.broker_id, old_status, "Approved")
+    analytics.record_status_change(db, app, "Approved")
     app.status = "Approved"
     db.commit()
+    analytics_counters.record_status_change(old_status, "Approved")
+    invalidate_cached(application_id, app.broker_id)
 
     return {
         "success": True,
@@ -635,8 +1236,13 @@ def reject_application(application_id: int, request: RejectRequest, db: Session
     if not app:
         return {"error": "Application not found"}
 
+    old_status = app.status
+    broker_stats.record_status_change(db, app.broker_id, old_status, "Rejected")
+    analytics.record_status_change(db, app, "Rejected")
     app.status = "Rejected"
     db.commit()
+    analytics_counters.record_status_change(old_status, "Rejected")
+    invalidate_cached(application_id, app.broker_id)
 
     return {
         "success": True,
@@ -646,6 +1252,36 @@ def reject_application(application_id: int, request: RejectRequest, db: Session
         "message": "Application rejected"
     }
 
+class RatingRequest(BaseModel):
+    punctuality: int
+    quality: int
+    compliance: int
+    communication: int
+    overall: int
+
+@app.post("/applications/{application_id}/rating")
+def rate_application(application_id: int, request: RatingRequest, db: Session = Depends(get_db)):
+    """Rate the broker's handling of an application"""
+    app = db.query(Application).filter(Application.id == application_id).first()
+
+    if not app:
+        return {"error": "Application not found"}
+
+    rating = Rating(application_id=application_id, **request.dict())
+    db.add(rating)
+    app.updated_at = datetime.utcnow()  # the rating is part of the application's detail
+    broker_stats.record_rating(db, app.broker_id, rating)
+    db.commit()
+    db.refresh(rating)
+    invalidate_cached(application_id, app.broker_id, ratings_changed=True)
+
+    return {
+        "success": True,
+        "rating_id": rating.id,
+        "application_id": application_id,
+        "message": "Rating submitted successfully"
+    }
+
 # ==================== Payment Endpoints ====================
 
 class PaymentRequest(BaseModel):
@@ -677,11 +1313,17 @@ def create_payment(payment: PaymentRequest, db: Session = Depends(get_db)):
 
     # Update application status to "Payment Completed"
     app = db.query(Application).filter(Application.id == payment.application_id).first()
+    old_status = app.status if app else None
     if app:
+        broker_stats.record_status_change(db, app.broker_id, old_status, "Payment Completed")
+        analytics.record_status_change(db, app, "Payment Completed")
         app.status = "Payment Completed"
 
     db.commit()
     db.refresh(db_payment)
+    if app:
+        analytics_counters.record_status_change(old_status, "Payment Completed")
+        invalidate_cached(app.id, app.broker_id)
 
     return {
         "success": True,
@@ -712,9 +1354,11 @@ def get_payment_by_application(application_id: int, db: Session = Depends(get_db
     }
 
 @app.get("/payments/")
-def list_payments(db: Session = Depends(get_db)):
-    """List all payments"""
-    payments = db.query(Payment).all()
+def list_payments(response: Response, cursor: str = None, limit: int = 100, db: Session = Depends(get_db)):
+    """List payments, newest first. The next page cursor is sent in X-Next-Cursor."""
+    payments, next_cursor = keyset_page(db.query(Payment), Payment.payment_date, Payment.id, cursor, page_limit(limit))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
 
     return [{
         "id": p.id,
@@ -739,10 +1383,10 @@ def broker_login(request: LoginRequest, db: Session = Depends(get_db)):
     if not broker:
         return {"success": False, "message": "Invalid license number"}
 
-    # Calculate broker stats
-    applications = db.query(Application).filter(Application.broker_id == broker.id).all()
-    total_apps = len(applications)
-    approved_apps = len([a for a in applications if a.status == "Approved"])
+    # Broker stats from the materialized counters
+    stats = db.query(BrokerStats).filter(BrokerStats.broker_id == broker.id).first()
+    total_apps = stats.total_applications if stats else 0
+    approved_apps = broker_stats.status_count(db, broker.id, "Approved")
 
     return {
         "success": True,
@@ -756,4 +1400,27 @@ def broker_login(request: LoginRequest, db: Session = Depends(get_db)):
             "total_applications": total_apps,
             "approved_applications": approved_apps
         }
-    }
\ No newline at end of file
+    }
+
+# ==================== Admin Endpoints ====================
+
+class ReloadModelRequest(BaseModel):
+    version: Optional[str] = None  # defaults to the registry's active version
+
+@app.get("/admin/fraud-model")
+def get_fraud_model_info():
+    """Active fraud model version, metrics and available versions"""
+    return fraud_models.info()
+
+@app.post("/admin/fraud-model/reload")
+def reload_fraud_model(request: ReloadModelRequest):
+    """Hot-swap the fraud model without restarting the server"""
+    try:
+        return fraud_models.reload(request.version)
+    except (ValueError, OSError) as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+@app.get("/admin/analysis-cache")
+def get_analysis_cache_stats():
+    """Hit/miss counters for the OCR and forgery result cache"""
+    return analysis_cache.stats()
@@ -0,0 +1,63 @@
+"""
+Latency load test for the hot read endpoints against a running server.
+
+Opens N concurrent clients that hit the hot read endpoints plus the cheap
+/support/info for a fixed duration, then prints p50/p99 latency per endpoint.
+Run it against the server before and after a change to compare, e.g.
+
+    uvicorn app:app --workers 1 &
+    python benchmark_async_endpoints.py http://localhost:8000 500 20
+"""
+import asyncio
+import sys
+import time
+
+import httpx
+
+ENDPOINTS = [
+    "/applications/",
+    "/applications/1",
+    "/brokers/",
+    "/analytics/",
+    "/support/info",
+]
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def client_loop(http, deadline, latencies, errors, offset):
+    i = offset
+    while time.perf_counter() < deadline:
+        path = ENDPOINTS[i % len(ENDPOINTS)]
+        i += 1
+        started = time.perf_counter()
+        try:
+            response = await http.get(path)
+            response.raise_for_status()
+            latencies[path].append((time.perf_counter() - started) * 1000)
+        except httpx.HTTPError:
+            errors[path] = errors.get(path, 0) + 1
+
+
+async def main(base_url, clients, duration):
+    latencies = {path: [] for path in ENDPOINTS}
+    errors = {}
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as http:
+        deadline = time.perf_counter() + duration
+        await asyncio.gather(*(client_loop(http, deadline, latencies, errors, n) for n in range(clients)))
+
+    print(f"{clients} clients for {duration}s against {base_url}")
+    for path, samples in latencies.items():
+        if samples:
+            print(f"{path:20s} n={len(samples):6d}  p50={percentile(samples, 50):8.1f}ms  p99={percentile(samples, 99):8.1f}ms  errors={errors.get(path, 0)}")
+
+
+if __name__ == "__main__":
+    base_url = sys.argv[1] if len(sys.argv) > 1 else "http://localhost:8000"
+    clients = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    duration = float(sys.argv[3]) if len(sys.argv) > 3 else 20
+    asyncio.run(main(base_url, clients, duration))
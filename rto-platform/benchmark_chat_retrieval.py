@@ -0,0 +1,106 @@
+"""
+Offline chat benchmark: local knowledge + retrieval vs sending every question
+to the model.
+
+Uses the stub provider with a simulated remote latency, so it needs no API
+key or network. Prints index build time, lookup latency, the share of
+questions answered locally, and end-to-end chat latency for both paths.
+
+    python benchmark_chat_retrieval.py [rounds] [remote_latency_ms]
+"""
+import sys
+import time
+
+from sqlalchemy.orm import Session
+
+import knowledge
+from ai_services import chatbot
+from models import engine
+
+QUESTIONS = [
+    "What documents are needed for transfer of ownership?",
+    "What is the renewal fee for a two wheeler?",
+    "transfer fee for car",
+    "How much does new registration cost for a truck?",
+    "What is the status of application 12?",
+    "status of application 4051",
+    "How do I book a fancy number?",
+    "How do I pay an e-challan online?",
+    "how to change address in RC",
+    "how to remove hypothecation after loan is closed",
+    "can I get a duplicate RC",
+    "Is insurance mandatory?",
+    "which broker is best for transfer of ownership",
+    "medical certificate for license above 40",
+    "learner license test",
+    "PUC validity",
+    "Can I drive in India with a foreign license?",
+    "Explain the difference between RC and DL",
+    "What happens if my application is rejected?",
+    "Tell me a joke about traffic",
+]
+
+
+class SlowStubProvider(chatbot.StubProvider):
+    """Stub provider that sleeps like a remote model call."""
+
+    def __init__(self, latency_ms: float):
+        super().__init__()
+        self.latency = latency_ms / 1000
+
+    def generate(self, message: str) -> str:
+        time.sleep(self.latency)
+        return super().generate(message)
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def run(db, questions, knowledge_base, provider):
+    """Chat latencies (ms) for each question, as /chat/ would answer it."""
+    latencies = []
+    for question in questions:
+        started = time.perf_counter()
+        grounding = knowledge_base.lookup(db, question) if knowledge_base else {"answer": None, "passages": []}
+        if not grounding["answer"]:
+            provider.generate(chatbot.grounded_prompt(question, grounding["passages"]))
+        latencies.append((time.perf_counter() - started) * 1000)
+    return latencies
+
+
+def report(name, latencies, remote_calls, total):
+    print(
+        f"{name:24s} p50 {percentile(latencies, 50):8.2f}ms  p99 {percentile(latencies, 99):8.2f}ms  "
+        f"remote calls {remote_calls}/{total} ({remote_calls / total:.0%})"
+    )
+
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    remote_latency_ms = float(sys.argv[2]) if len(sys.argv) > 2 else 800
+    questions = QUESTIONS * rounds
+
+    with Session(engine) as db:
+        knowledge_base = knowledge.KnowledgeBase()
+        started = time.perf_counter()
+        index = knowledge_base.index_for(db)
+        print(f"Index: {len(index.passages)} passages, {len(index.vocabulary)} terms, built in {(time.perf_counter() - started) * 1000:.1f}ms")
+
+        lookups = []
+        for question in questions:
+            started = time.perf_counter()
+            knowledge_base.lookup(db, question)
+            lookups.append((time.perf_counter() - started) * 1000)
+        print(f"Lookup only              p50 {percentile(lookups, 50):8.2f}ms  p99 {percentile(lookups, 99):8.2f}ms")
+
+        print(f"{len(questions)} questions, simulated remote latency {remote_latency_ms:.0f}ms")
+        remote_only = SlowStubProvider(remote_latency_ms)
+        report("remote model only", run(db, questions, None, remote_only), remote_only.calls, len(questions))
+        grounded = SlowStubProvider(remote_latency_ms)
+        report("local knowledge first", run(db, questions, knowledge_base, grounded), grounded.calls, len(questions))
+
+
+if __name__ == "__main__":
+    main()
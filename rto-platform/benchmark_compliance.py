@@ -0,0 +1,79 @@
+"""
+Compliance scan benchmark over a synthetic vehicle table.
+
+Fills a throwaway SQLite database with N vehicles (validity dates spread over
+five years, one application each), then times the first full scan, the
+incremental nightly scans that follow it, and one page of
+/compliance/expiring.
+
+    python benchmark_compliance.py [vehicles] [nights]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+import compliance
+from models import Base, ComplianceLead, make_engine
+
+CHUNK_SIZE = 50000
+START = date(2023, 1, 1)
+
+
+def populate(engine, count: int, rng):
+    dates = [(START + timedelta(days=d)).isoformat() for d in range(5 * 365)]
+    with engine.begin() as conn:
+        for start in range(1, count + 1, CHUNK_SIZE):
+            ids = range(start, min(start + CHUNK_SIZE, count + 1))
+            conn.exec_driver_sql(
+                "INSERT INTO vehicles (id, registration_number, registration_key, registration_valid_upto, "
+                "tax_valid_upto, insurance_valid_upto, pucc_valid_upto, fitness_status) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(i, f"TN{i:08d}", f"TN{i:08d}", *rng.choices(dates, k=4), rng.choice(("Valid", "Expired"))) for i in ids]
+            )
+            conn.exec_driver_sql(
+                "INSERT INTO applications (id, vehicle_id, broker_id, status) VALUES (?, ?, ?, 'Approved')",
+                [(i, i, rng.randint(1, 100)) for i in ids]
+            )
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    nights = int(sys.argv[2]) if len(sys.argv) > 2 else 7
+    rng = random.Random(42)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = make_engine(f"sqlite:///{os.path.join(tmp, 'compliance.db')}")
+        Base.metadata.create_all(engine)
+        started = time.perf_counter()
+        populate(engine, count, rng)
+        print(f"Loaded {count:,} vehicles in {time.perf_counter() - started:.1f}s")
+
+        today = START + timedelta(days=2 * 365)
+        with Session(engine) as db:
+            started = time.perf_counter()
+            created = compliance.scan(db, today)
+            print(f"First scan          {time.perf_counter() - started:7.2f}s  {sum(created.values()):,} leads")
+
+            nightly = []
+            for night in range(1, nights + 1):
+                started = time.perf_counter()
+                created = compliance.scan(db, today + timedelta(days=night))
+                nightly.append(time.perf_counter() - started)
+            print(f"Incremental scan    {sum(nightly) / len(nightly):7.3f}s per night ({nights} nights, "
+                  f"last added {sum(created.values()):,} leads)")
+            print(f"Leads in table      {db.scalar(select(func.count(ComplianceLead.id))):,}")
+
+            query, column = compliance.expiring_query(db, "insurance", 30, today)
+            started = time.perf_counter()
+            page = query.order_by(column, compliance.Vehicle.id).limit(100).all()
+            print(f"Expiring page (100) {(time.perf_counter() - started) * 1000:7.2f}ms  ({len(page)} rows)")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
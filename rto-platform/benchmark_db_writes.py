@@ -0,0 +1,80 @@
+"""
+Concurrent write benchmark: default SQLite engine vs the tuned make_engine().
+
+Each writer thread inserts complaints one transaction at a time, the way
+submit_complaint does. Runs against throwaway copies of the database.
+
+    python benchmark_db_writes.py [threads] [writes_per_thread]
+"""
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from models import Complaint, make_engine
+
+SOURCE_DB = 'rto.db'
+
+
+def run(engine, threads: int, writes_per_thread: int):
+    errors = []
+    barrier = threading.Barrier(threads)
+
+    def writer(worker: int):
+        barrier.wait()
+        for i in range(writes_per_thread):
+            try:
+                with Session(bind=engine) as db:
+                    db.add(Complaint(
+                        broker_id=1,
+                        application_id=1,
+                        complaint_type="Benchmark",
+                        description=f"worker {worker} write {i}",
+                        status="Pending",
+                        submitted_date=datetime.now().date()
+                    ))
+                    db.commit()
+            except OperationalError as exc:
+                errors.append(str(exc.orig))
+
+    workers = [threading.Thread(target=writer, args=(n,)) for n in range(threads)]
+    started = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - started
+    committed = threads * writes_per_thread - len(errors)
+    return committed, len(errors), elapsed
+
+
+def main():
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    writes_per_thread = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    workdir = tempfile.mkdtemp()
+    try:
+        configs = {
+            "default (rollback journal)": lambda url: create_engine(url, connect_args={'check_same_thread': False}),
+            "tuned (WAL, NORMAL, busy_timeout)": make_engine,
+        }
+        print(f"{threads} threads x {writes_per_thread} writes")
+        for name, factory in configs.items():
+            path = os.path.join(workdir, f"{len(os.listdir(workdir))}.db")
+            shutil.copy(SOURCE_DB, path)
+            engine = factory(f"sqlite:///{path}")
+            committed, failed, elapsed = run(engine, threads, writes_per_thread)
+            engine.dispose()
+            print(f"{name:36s} {committed / elapsed:8.0f} writes/sec  {failed} failed  ({elapsed:.2f}s)")
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Submission latency of /chat/ answered inline vs handed to the job queue
+(?background=true), with a stub provider that sleeps like a slow LLM call.
+
+Runs against a throwaway copy of the database, so the queued jobs do not
+land in rto.db.
+
+    python benchmark_jobs.py [requests] [remote_latency_ms]
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+SOURCE_DB = 'rto.db'
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    remote_latency_ms = float(sys.argv[2]) if len(sys.argv) > 2 else 800
+
+    tmp = tempfile.mkdtemp()
+    shutil.copy(SOURCE_DB, os.path.join(tmp, 'rto.db'))
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp, 'rto.db')}"
+    # Imported after DATABASE_URL is set so the app uses the copy
+    from fastapi.testclient import TestClient
+    from ai_services import chatbot
+    from benchmark_chat_retrieval import SlowStubProvider
+    import app as application
+
+    try:
+        chatbot.set_provider(SlowStubProvider(remote_latency_ms))
+        client = TestClient(application.app)
+        # Distinct questions so the answer cache never short-circuits the provider
+        questions = [f"Tell me a story about lorry number {i}" for i in range(2 * count)]
+
+        for name, params, batch in (("inline", {}, questions[:count]), ("background (202)", {"background": True}, questions[count:])):
+            latencies, job_ids = [], []
+            for question in batch:
+                started = time.perf_counter()
+                response = client.post("/chat/", params=params, json={"message": question})
+                latencies.append((time.perf_counter() - started) * 1000)
+                if response.status_code == 202:
+                    job_ids.append(response.json()["job_id"])
+            print(f"{name:18s} submit p50 {percentile(latencies, 50):8.2f}ms  p99 {percentile(latencies, 99):8.2f}ms")
+
+        started = time.perf_counter()
+        while any(client.get(f"/jobs/{job_id}").json()["status"] not in ("succeeded", "failed") for job_id in job_ids):
+            time.sleep(0.1)
+        print(f"{len(job_ids)} background jobs drained by {application.jobs.JOB_WORKERS} workers "
+              f"{time.perf_counter() - started:.1f}s after the last submit")
+        application.background_jobs.stop()
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
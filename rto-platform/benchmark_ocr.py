@@ -0,0 +1,100 @@
+"""
+OCR throughput benchmark over a directory of sample document images.
+
+Compares the original path (raw PIL image straight into image_to_string, one
+call at a time) with the preprocessed pipeline on the warm OCR process pool,
+and prints images/sec plus p50/p95/p99 latency for each.
+
+    python benchmark_ocr.py samples/ [--structured] [--skip-baseline]
+"""
+import io
+import os
+import sys
+import time
+from concurrent.futures import as_completed
+
+import pytesseract
+from PIL import Image
+
+from ai_services.ocr import ocr_pool, _recognize_bytes
+
+EXTENSIONS = ('.png', '.jpg', '.jpeg', '.tif', '.tiff', '.bmp', '.webp', '.gif')
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def load_images(directory):
+    paths = sorted(
+        os.path.join(directory, name) for name in os.listdir(directory)
+        if name.lower().endswith(EXTENSIONS)
+    )
+    images = []
+    for path in paths:
+        with open(path, 'rb') as f:
+            images.append(f.read())
+    return images
+
+
+def run_baseline(images):
+    latencies, errors = [], 0
+    started = time.perf_counter()
+    for image_bytes in images:
+        t = time.perf_counter()
+        try:
+            pytesseract.image_to_string(Image.open(io.BytesIO(image_bytes)))
+        except Exception:
+            errors += 1
+        latencies.append((time.perf_counter() - t) * 1000)
+    return latencies, errors, time.perf_counter() - started
+
+
+def run_pool(images, structured):
+    pool = ocr_pool()
+    # Warm every worker before timing
+    for future in [pool.submit(_recognize_bytes, image_bytes, structured) for image_bytes in images[:pool._max_workers]]:
+        future.exception()
+
+    latencies, errors = [], 0
+    started = time.perf_counter()
+    submitted = {}
+    for image_bytes in images:
+        submitted[pool.submit(_recognize_bytes, image_bytes, structured)] = time.perf_counter()
+    for future in as_completed(submitted):
+        latencies.append((time.perf_counter() - submitted[future]) * 1000)
+        if future.exception() is not None:
+            errors += 1
+    return latencies, errors, time.perf_counter() - started
+
+
+def report(name, images, latencies, errors, elapsed):
+    print(
+        f"{name:32s} {len(images) / elapsed:8.2f} images/sec  "
+        f"p50 {percentile(latencies, 50):8.1f}ms  p95 {percentile(latencies, 95):8.1f}ms  "
+        f"p99 {percentile(latencies, 99):8.1f}ms  {errors} errors"
+    )
+
+
+def main():
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    if not args:
+        print(__doc__)
+        sys.exit(1)
+    structured = '--structured' in sys.argv
+    images = load_images(args[0])
+    if not images:
+        print(f"No images found in {args[0]}")
+        sys.exit(1)
+
+    print(f"{len(images)} images")
+    if '--skip-baseline' not in sys.argv:
+        report("raw image_to_string", images, *run_baseline(images))
+    mode = "structured" if structured else "text"
+    report(f"preprocessed pool ({mode})", images, *run_pool(images, structured))
+    ocr_pool().shutdown()
+
+
+if __name__ == "__main__":
+    main()
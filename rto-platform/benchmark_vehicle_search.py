@@ -0,0 +1,78 @@
+"""
+VehicleIndex benchmark over synthetic registration numbers.
+
+Builds the index over N random Indian-format registrations, then times exact,
+prefix and one-typo lookups (the /vehicles/search path) and incremental
+inserts. Wall-clock percentiles include scheduler noise; CPU-time percentiles
+are reported alongside.
+
+    python benchmark_vehicle_search.py [vehicles] [queries]
+"""
+import random
+import string
+import sys
+import time
+
+from vehicles import VehicleIndex
+
+STATES = ["TN", "KA", "MH", "DL", "AP", "KL", "GJ", "RJ", "UP", "WB", "TS", "MP", "HR", "PB", "OD"]
+
+
+def registration(rng):
+    series = "".join(rng.choices(string.ascii_uppercase, k=rng.choice((1, 2))))
+    return f"{rng.choice(STATES)}{rng.randint(1, 99):02d}{series}{rng.randint(1, 9999):04d}"
+
+
+def typo(rng, key):
+    i = rng.randrange(1, len(key) - 1)
+    kind = rng.choice(("swap", "drop", "replace"))
+    if kind == "swap":
+        return key[:i] + key[i + 1] + key[i] + key[i + 2:]
+    if kind == "drop":
+        return key[:i] + key[i + 1:]
+    return key[:i] + rng.choice(string.digits + string.ascii_uppercase) + key[i + 1:]
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def measure(name, fn, queries):
+    wall, cpu = [], []
+    for query in queries:
+        started, started_cpu = time.perf_counter(), time.thread_time()
+        fn(query)
+        cpu.append((time.thread_time() - started_cpu) * 1000)
+        wall.append((time.perf_counter() - started) * 1000)
+    print(
+        f"{name:18s} wall p50 {percentile(wall, 50):6.3f}ms p99 {percentile(wall, 99):6.3f}ms   "
+        f"cpu p50 {percentile(cpu, 50):6.3f}ms p99 {percentile(cpu, 99):6.3f}ms"
+    )
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    query_count = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+    rng = random.Random(42)
+    keys = list({registration(rng) for _ in range(count)})
+
+    started = time.perf_counter()
+    index = VehicleIndex(keys)
+    print(f"Built index over {len(index):,} registrations in {time.perf_counter() - started:.1f}s")
+
+    sample = rng.sample(keys, query_count)
+    measure("exact", index.search, [" ".join(key.lower()) for key in sample])
+    measure("prefix (6 chars)", index.prefix, [key[:6] for key in sample])
+    measure("one typo", index.search, [typo(rng, key) for key in sample])
+
+    new_keys = [registration(rng) for _ in range(query_count)]
+    started = time.perf_counter()
+    for key in new_keys:
+        index.add(key)
+    elapsed = time.perf_counter() - started
+    print(f"Incremental add    {elapsed / len(new_keys) * 1e6:.1f}us per registration ({len(new_keys)} added)")
+
+
+if __name__ == "__main__":
+    main()
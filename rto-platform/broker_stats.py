@@ -0,0 +1,104 @@
+from datetime import datetime
+
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.orm import Session
+from models import Broker, Application, Rating, BrokerStats, BrokerStatusCount
+
+RATING_FIELDS = ["punctuality", "quality", "compliance", "communication", "overall"]
+
+
+def increment(db: Session, model, key: dict, **deltas):
+    """Add deltas to a counter row, creating the row if it does not exist yet."""
+    conditions = [getattr(model, column) == value for column, value in key.items()]
+    values = {column: getattr(model, column) + delta for column, delta in deltas.items()}
+    result = db.execute(update(model).where(*conditions).values(**values))
+    if result.rowcount == 0:
+        db.add(model(**key, **deltas))
+        db.flush()
+
+
+def touch(db: Session, broker_ids):
+    """Mark brokers' stats as changed when only their status counts moved."""
+    db.execute(update(BrokerStats).where(BrokerStats.broker_id.in_(list(broker_ids))).values(updated_at=datetime.utcnow()))
+
+
+def record_application(db: Session, broker_id: int, status: str, count: int = 1):
+    """Count newly created applications. Call before committing the insert."""
+    if broker_id is None:
+        return
+    increment(db, BrokerStats, {"broker_id": broker_id}, total_applications=count)
+    increment(db, BrokerStatusCount, {"broker_id": broker_id, "status": status}, count=count)
+
+
+def record_status_change(db: Session, broker_id: int, old_status: str, new_status: str):
+    """Move an application between status counters. Call before committing the change."""
+    if broker_id is None or old_status == new_status:
+        return
+    if old_status is not None:
+        increment(db, BrokerStatusCount, {"broker_id": broker_id, "status": old_status}, count=-1)
+    increment(db, BrokerStatusCount, {"broker_id": broker_id, "status": new_status}, count=1)
+    touch(db, [broker_id])
+
+
+def record_status_changes(db: Session, changes, new_status: str):
+    """Bulk form of record_status_change; changes counts applications by (broker_id, old_status)."""
+    moved = {}
+    for (broker_id, old_status), count in changes.items():
+        if broker_id is None or old_status == new_status or not count:
+            continue
+        if old_status is not None:
+            increment(db, BrokerStatusCount, {"broker_id": broker_id, "status": old_status}, count=-count)
+        moved[broker_id] = moved.get(broker_id, 0) + count
+    for broker_id, count in moved.items():
+        increment(db, BrokerStatusCount, {"broker_id": broker_id, "status": new_status}, count=count)
+    if moved:
+        touch(db, moved)
+
+
+def record_rating(db: Session, broker_id: int, rating: Rating):
+    """Add a new rating to the broker's running sums. Call before committing the insert."""
+    if broker_id is None:
+        return
+    sums = {f"{field}_sum": getattr(rating, field) or 0 for field in RATING_FIELDS}
+    increment(db, BrokerStats, {"broker_id": broker_id}, rating_count=1, **sums)
+
+
+def rebuild_broker_stats(db: Session):
+    """Recompute every broker's counters from the raw tables (backfill / repair)."""
+    ratings = select(
+        Application.broker_id.label("broker_id"),
+        func.count(Rating.id).label("rating_count"),
+        *[func.sum(getattr(Rating, field)).label(f"{field}_sum") for field in RATING_FIELDS]
+    ).join(Application, Rating.application_id == Application.id).group_by(Application.broker_id).subquery()
+    applications = select(
+        Application.broker_id.label("broker_id"),
+        func.count(Application.id).label("total_applications")
+    ).group_by(Application.broker_id).subquery()
+
+    db.execute(BrokerStatusCount.__table__.delete())
+    db.execute(BrokerStats.__table__.delete())
+    db.execute(insert(BrokerStats).from_select(
+        ["broker_id", "total_applications", "rating_count"] + [f"{field}_sum" for field in RATING_FIELDS],
+        select(
+            Broker.id,
+            func.coalesce(applications.c.total_applications, 0),
+            func.coalesce(ratings.c.rating_count, 0),
+            *[func.coalesce(ratings.c[f"{field}_sum"], 0) for field in RATING_FIELDS]
+        ).outerjoin(ratings, ratings.c.broker_id == Broker.id)
+         .outerjoin(applications, applications.c.broker_id == Broker.id)
+    ))
+    db.execute(insert(BrokerStatusCount).from_select(
+        ["broker_id", "status", "count"],
+        select(Application.broker_id, Application.status, func.count(Application.id))
+        .where(Application.broker_id.isnot(None), Application.status.isnot(None))
+        .group_by(Application.broker_id, Application.status)
+    ))
+
+
+def status_count(db: Session, broker_id: int, status: str) -> int:
+    """Number of the broker's applications currently in the given status."""
+    count = db.query(BrokerStatusCount.count).filter(
+        BrokerStatusCount.broker_id == broker_id,
+        BrokerStatusCount.status == status
+    ).scalar()
+    return count or 0
@@ -0,0 +1,295 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from email.utils import formatdate, parsedate_to_datetime
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")  # memory | redis
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "10000"))
+CACHE_TTL = float(os.getenv("CACHE_TTL", "300"))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+# OCR / forgery result cache
+ANALYSIS_CACHE_MAX_ENTRIES = int(os.getenv("ANALYSIS_CACHE_MAX_ENTRIES", "1024"))
+ANALYSIS_CACHE_PATH = os.getenv("ANALYSIS_CACHE_PATH", "analysis_cache.db")
+ANALYSIS_CACHE_MAX_BYTES = int(os.getenv("ANALYSIS_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+
+class LRUCache:
+    """In-process cache bounded by entry count and per-entry TTL."""
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, ttl: float = CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, *keys: str):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class RedisCache:
+    """Cache backed by any client with Redis get/set(ex=)/delete semantics."""
+
+    def __init__(self, client, ttl: float = CACHE_TTL, prefix: str = "rto:"):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key: str):
+        raw = self.client.get(self.prefix + key)
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key: str, value):
+        self.client.set(self.prefix + key, json.dumps(value), ex=max(1, int(self.ttl)))
+
+    def delete(self, *keys: str):
+        if keys:
+            self.client.delete(*[self.prefix + key for key in keys])
+
+
+class FakeRedis:
+    """Minimal in-memory stand-in for a Redis client (get/set/delete with expiry)."""
+
+    def __init__(self):
+        self._data = {}
+
+    def get(self, key):
+        item = self._data.get(key)
+        if item is None:
+            return None
+        value, expires_at = item
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._data[key]
+            return None
+        return value
+
+    def set(self, key, value, ex=None):
+        self._data[key] = (value, time.monotonic() + ex if ex else None)
+        return True
+
+    def delete(self, *keys):
+        return sum(1 for key in keys if self._data.pop(key, None) is not None)
+
+
+class DiskCache:
+    """
+    JSON values in a SQLite file, bounded by total payload size.
+    Least recently used entries are evicted once max_bytes is exceeded.
+    """
+
+    def __init__(self, path: str = ANALYSIS_CACHE_PATH, max_bytes: int = ANALYSIS_CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = None
+        self._size = 0
+
+    def _connect(self):
+        # Opened on first use so importing the app does not create the file
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, accessed REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS ix_entries_accessed ON entries (accessed)")
+            self._size = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        return self._conn
+
+    def get(self, key: str):
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE entries SET accessed = ? WHERE key = ?", (time.time(), key))
+            return json.loads(row[0])
+
+    def set(self, key: str, value):
+        payload = json.dumps(value)
+        with self._lock:
+            conn = self._connect()
+            old = conn.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, accessed) VALUES (?, ?, ?, ?)",
+                (key, payload, len(payload), time.time())
+            )
+            self._size += len(payload) - (old[0] if old else 0)
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        # Trim to 90% so eviction is not triggered again by the next insert
+        target = int(self.max_bytes * 0.9)
+        for key, size in self._conn.execute("SELECT key, size FROM entries ORDER BY accessed").fetchall():
+            if self._size <= target:
+                break
+            self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self._size -= size
+
+    def delete(self, *keys: str):
+        with self._lock:
+            conn = self._connect()
+            for key in keys:
+                row = conn.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+                if row:
+                    conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                    self._size -= row[0]
+
+    def clear(self):
+        with self._lock:
+            self._connect().execute("DELETE FROM entries")
+            self._size = 0
+
+
+class TieredCache:
+    """In-memory LRU in front of a DiskCache, with hit/miss counters per tier."""
+
+    def __init__(self, memory, disk):
+        self.memory = memory
+        self.disk = disk
+        self._lock = threading.Lock()
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+
+    def _count(self, name: str):
+        with self._lock:
+            self.counters[name] += 1
+
+    def get(self, key: str):
+        value = self.memory.get(key)
+        if value is not None:
+            self._count("memory_hits")
+            return value
+        value = self.disk.get(key)
+        if value is not None:
+            self._count("disk_hits")
+            self.memory.set(key, value)
+            return value
+        self._count("misses")
+        return None
+
+    def set(self, key: str, value):
+        self.memory.set(key, value)
+        self.disk.set(key, value)
+
+    def delete(self, *keys: str):
+        self.memory.delete(*keys)
+        self.disk.delete(*keys)
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = dict(self.counters)
+        lookups = sum(counters.values())
+        hits = counters["memory_hits"] + counters["disk_hits"]
+        counters["hit_rate"] = round(hits / lookups, 4) if lookups else 0.0
+        counters["disk_bytes"] = self.disk._size
+        return counters
+
+
+def make_analysis_cache() -> TieredCache:
+    """Content-addressed cache for OCR and forgery results (no TTL; entries are immutable)."""
+    return TieredCache(
+        LRUCache(max_entries=ANALYSIS_CACHE_MAX_ENTRIES, ttl=float("inf")),
+        DiskCache(ANALYSIS_CACHE_PATH, ANALYSIS_CACHE_MAX_BYTES),
+    )
+
+
+def content_key(kind: str, data: bytes, version: str = "") -> str:
+    """Cache key from a content hash of the raw bytes, plus a model/settings version."""
+    return f"{kind}:{version}:{hashlib.sha256(data).hexdigest()}"
+
+
+def make_cache():
+    """Cache selected by CACHE_BACKEND; falls back to the LRU if redis is unavailable."""
+    if CACHE_BACKEND == "redis":
+        try:
+            import redis  # type: ignore
+            return RedisCache(redis.Redis.from_url(REDIS_URL))
+        except ImportError:
+            pass
+    return LRUCache()
+
+
+def make_entry(body, last_modified: datetime = None) -> dict:
+    """
+    Cacheable response: JSON body plus its ETag and Last-Modified validators.
+    last_modified is when the entity last changed (naive UTC, e.g. an
+    updated_at column); without one the current time is used.
+    """
+    payload = json.dumps(body, sort_keys=True, default=str)
+    changed = last_modified.replace(tzinfo=timezone.utc).timestamp() if last_modified else time.time()
+    return {
+        "body": body,
+        "etag": '"' + hashlib.sha1(payload.encode()).hexdigest() + '"',
+        "last_modified": formatdate(changed, usegmt=True),
+    }
+
+
+class Generations:
+    """
+    Invalidation counters for read-through fills. Take current(key) before
+    reading the database and store the result only if it is unchanged
+    afterwards, so a fill that raced a write cannot cache the pre-write body.
+    Keys share a fixed number of slots, which bounds memory; a collision only
+    skips a fill.
+    """
+
+    def __init__(self, slots: int = 4096):
+        self._counters = [0] * slots
+        self._lock = threading.Lock()
+
+    def _slot(self, key: str) -> int:
+        return hash(key) % len(self._counters)
+
+    def current(self, key: str) -> int:
+        return self._counters[self._slot(key)]
+
+    def bump(self, *keys: str):
+        with self._lock:
+            for key in keys:
+                self._counters[self._slot(key)] += 1
+
+
+def is_not_modified(entry: dict, if_none_match: str = None, if_modified_since: str = None) -> bool:
+    """Evaluate conditional GET headers against a cached entry (If-None-Match wins)."""
+    if if_none_match:
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in tags or entry["etag"] in tags or f"W/{entry['etag']}" in tags
+    if if_modified_since:
+        try:
+            return parsedate_to_datetime(entry["last_modified"]) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
@@ -0,0 +1,161 @@
+"""
+Compliance expiry scanning for registration, tax, insurance and PUCC validity.
+
+Every lookup is a range predicate on one indexed validity date, so the cost
+follows the number of vehicles due, not the size of the vehicles table.
+
+The nightly scan (`scan`, or `python compliance.py [YYYY-MM-DD]` from cron)
+turns due vehicles into compliance_leads for the broker on each vehicle's
+latest application. It runs incrementally from three high-water marks per kind:
+
+- scanned_through: due dates up to this day already produced leads, so each
+  run only reads the day(s) that entered the reminder horizon since the last;
+- last_vehicle_id: vehicles added since the last run are scanned over the
+  whole window, since their dates may fall behind scanned_through;
+- last_updated_at: likewise for existing vehicles changed since the last run
+  (vehicles.updated_at), e.g. a validity date corrected to a day already
+  scanned. Writes that bypass the ORM/Core onupdate (raw SQL) must set
+  updated_at themselves to be picked up.
+
+Leads are inserted set-based with INSERT ... SELECT and deduplicated on
+(vehicle_id, kind, due_date), so re-running a day is harmless.
+"""
+import os
+import sys
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import and_, case, exists, func, insert, literal, select, update
+from sqlalchemy.orm import Session
+
+from models import APPLICATION_RECENCY, LATEST_APPLICATION_FIRST, Application, ComplianceLead, ComplianceScanState, Vehicle
+
+COMPLIANCE_REMINDER_DAYS = int(os.getenv("COMPLIANCE_REMINDER_DAYS", "30"))  # reminder lead this many days ahead
+COMPLIANCE_LAPSED_DAYS = int(os.getenv("COMPLIANCE_LAPSED_DAYS", "90"))  # oldest lapse still worth a renewal lead
+COMPLIANCE_MAX_WINDOW_DAYS = 3650  # largest within_days accepted by expiring_query
+
+# Validity date column for each compliance kind
+KINDS = {
+    "registration": Vehicle.registration_valid_upto,
+    "tax": Vehicle.tax_valid_upto,
+    "insurance": Vehicle.insurance_valid_upto,
+    "pucc": Vehicle.pucc_valid_upto,
+}
+
+# Fitness has a status but no validity date; listed by the date the registration lapses
+FITNESS_LAPSED = "Expired"
+
+
+def expiring_query(db: Session, kind: str, within_days: int, today: date = None, include_lapsed: bool = False):
+    """
+    Vehicles whose `kind` is due between today and today + within_days (or
+    already lapsed, with include_lapsed), as (query, sort column).
+    """
+    today = today or date.today()
+    if kind == "fitness":
+        column = Vehicle.registration_valid_upto
+        # Keyset pages on this column, so rows without a date (which cannot form a cursor) are left out
+        query = db.query(Vehicle).filter(Vehicle.fitness_status == FITNESS_LAPSED, column.isnot(None))
+        return query, column
+    column = KINDS[kind]
+    start = today - timedelta(days=COMPLIANCE_LAPSED_DAYS) if include_lapsed else today
+    query = db.query(Vehicle).filter(column >= start, column <= today + timedelta(days=within_days))
+    return query, column
+
+
+def latest_brokers(db: Session, vehicle_ids) -> dict:
+    """{vehicle_id: broker_id} from each vehicle's most recent application."""
+    brokers = {}
+    if not vehicle_ids:
+        return brokers
+    for vehicle_id, broker_id in db.execute(
+            select(Application.vehicle_id, Application.broker_id)
+            .where(Application.vehicle_id.in_(list(vehicle_ids))).order_by(*APPLICATION_RECENCY)):
+        brokers[vehicle_id] = broker_id
+    return brokers
+
+
+def _latest_broker():
+    """Correlated subquery for the broker on a vehicle's latest application (uses ix_applications_vehicle_id)."""
+    return (select(Application.broker_id).where(Application.vehicle_id == Vehicle.id)
+            .order_by(*LATEST_APPLICATION_FIRST).limit(1).scalar_subquery())
+
+
+def _insert_leads(db: Session, kind: str, column, condition, today: date) -> int:
+    """INSERT ... SELECT leads for vehicles matching condition that do not have one yet."""
+    already = exists().where(
+        ComplianceLead.vehicle_id == Vehicle.id,
+        ComplianceLead.kind == kind,
+        ComplianceLead.due_date == column,
+    )
+    result = db.execute(insert(ComplianceLead).from_select(
+        ["vehicle_id", "broker_id", "kind", "due_date", "lead_type", "generated_on"],
+        select(
+            Vehicle.id,
+            _latest_broker(),
+            literal(kind),
+            column,
+            case((column < today, "renewal"), else_="reminder"),
+            literal(today),
+        ).where(condition, ~already)
+    ))
+    return result.rowcount or 0
+
+
+def scan(db: Session, today: date = None) -> dict:
+    """
+    Generate the day's reminder / renewal leads for every kind and advance the
+    high-water marks. Commits per kind; returns {kind: leads created}.
+    """
+    today = today or date.today()
+    horizon = today + timedelta(days=COMPLIANCE_REMINDER_DAYS)
+    floor = today - timedelta(days=COMPLIANCE_LAPSED_DAYS)
+    started = datetime.utcnow()
+    max_vehicle_id = db.scalar(select(func.max(Vehicle.id))) or 0
+    created = {}
+    for kind, column in KINDS.items():
+        state = db.get(ComplianceScanState, kind) or ComplianceScanState(kind=kind, last_vehicle_id=0)
+        # 1. Due dates that entered the window since the last run: an index range scan on the date
+        start = floor
+        if state.scanned_through is not None:
+            start = max(floor, state.scanned_through + timedelta(days=1))
+        count = 0
+        if start <= horizon:
+            count += _insert_leads(db, kind, column, and_(column >= start, column <= horizon), today)
+        # 2. Vehicles added since the last run, over the whole window: a primary key range scan
+        if max_vehicle_id > (state.last_vehicle_id or 0):
+            count += _insert_leads(db, kind, column, and_(
+                Vehicle.id > (state.last_vehicle_id or 0),
+                Vehicle.id <= max_vehicle_id,
+                column >= floor, column <= horizon,
+            ), today)
+        # 3. Vehicles updated since the last run, over the whole window: an index range scan on updated_at
+        if state.last_updated_at is not None:
+            count += _insert_leads(db, kind, column, and_(
+                Vehicle.updated_at > state.last_updated_at,
+                Vehicle.updated_at <= started,
+                column >= floor, column <= horizon,
+            ), today)
+        state.scanned_through = max(horizon, state.scanned_through or horizon)
+        state.last_vehicle_id = max_vehicle_id
+        state.last_updated_at = started
+        state.last_run = datetime.utcnow()
+        db.add(state)
+        db.commit()
+        created[kind] = count
+
+    # Reminders whose due date has now passed become renewal leads
+    db.execute(update(ComplianceLead).where(
+        ComplianceLead.lead_type == "reminder", ComplianceLead.due_date < today
+    ).values(lead_type="renewal"))
+    db.commit()
+    return created
+
+
+if __name__ == "__main__":
+    from models import engine
+    day = date.fromisoformat(sys.argv[1]) if len(sys.argv) > 1 else date.today()
+    started = datetime.now()
+    with Session(engine) as session:
+        for kind, count in scan(session, day).items():
+            print(f"✓ {kind}: {count} new leads")
+    print(f"Compliance scan for {day} finished in {(datetime.now() - started).total_seconds():.1f}s")
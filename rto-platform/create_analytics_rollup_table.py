@@ -0,0 +1,11 @@
+from sqlalchemy.orm import Session
+from models import Base, engine, ApplicationDailyRollup
+from analytics import rebuild_daily_rollup
+
+# Create the daily analytics rollup and backfill it from existing applications.
+# Safe to re-run at any time to rebuild the rollup from scratch.
+Base.metadata.create_all(engine, tables=[ApplicationDailyRollup.__table__])
+with Session(bind=engine) as db:
+    rebuild_daily_rollup(db)
+    db.commit()
+    print(f"✓ Analytics rollup rebuilt with {db.query(ApplicationDailyRollup).count()} rows!")
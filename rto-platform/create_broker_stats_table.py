@@ -0,0 +1,11 @@
+from sqlalchemy.orm import Session
+from models import Base, engine, BrokerStats, BrokerStatusCount
+from broker_stats import rebuild_broker_stats
+
+# Create broker stats tables and backfill them from existing data.
+# Safe to re-run at any time to rebuild the counters from scratch.
+Base.metadata.create_all(engine, tables=[BrokerStats.__table__, BrokerStatusCount.__table__])
+with Session(bind=engine) as db:
+    rebuild_broker_stats(db)
+    db.commit()
+    print(f"✓ Broker stats rebuilt for {db.query(BrokerStats).count()} brokers!")
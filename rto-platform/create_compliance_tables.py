@@ -0,0 +1,13 @@
+from models import Base, engine, ComplianceLead, ComplianceScanState, Vehicle
+from add_indexes import add_columns, add_indexes
+
+# Create the compliance lead and scan state tables, and the range indexes on
+# the vehicle validity dates that the expiry scan reads through.
+# Safe to re-run; leads are generated by `python compliance.py`.
+Base.metadata.create_all(engine, tables=[ComplianceLead.__table__, ComplianceScanState.__table__])
+# Columns added after the first version of these tables
+for name in add_columns(engine, Vehicle.__table__.c.updated_at, ComplianceScanState.__table__.c.last_updated_at):
+    print(f"✓ Added {name}")
+for name in add_indexes(engine):
+    print(f"✓ Created {name}")
+print("✓ Compliance tables created successfully!")
@@ -1,43 +1,148 @@
-from models import Base, Citizen, Broker, Application, Rating
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from models import Base, Citizen, Broker, Application, ApplicationVehicleDetails, Rating, Vehicle, VEHICLE_FIELDS, make_engine, normalize_registration, vehicle_key
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from broker_stats import rebuild_broker_stats
+from analytics import rebuild_daily_rollup
+from add_indexes import add_indexes
 import pandas as pd
-from datetime import datetime
+import sys
+import time
 
-engine = create_engine('sqlite:///rto.db')
+# Loads into DATABASE_URL, like the app
+engine = make_engine()
+
+# Rows per CSV chunk / executemany batch
+CHUNK_SIZE = 50000
+
+# SQLite bulk-load settings; only valid for the duration of this script
+LOAD_PRAGMAS = [
+    "PRAGMA journal_mode=MEMORY",
+    "PRAGMA synchronous=OFF",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-200000",
+]
+
+DATE_FIELDS = ['submission_date', 'date_of_registration', 'registration_valid_upto', 'tax_valid_upto', 'insurance_valid_upto', 'pucc_valid_upto']
+
+def insert_frame(conn, table, frame):
+    """executemany INSERT of a DataFrame's rows, with NaN stored as NULL."""
+    frame = frame.astype(object).where(frame.notna(), None)
+    marker = "?" if conn.dialect.paramstyle == "qmark" else "%s"
+    placeholders = ", ".join(marker for _ in frame.columns)
+    conn.exec_driver_sql(
+        f"INSERT INTO {table.name} ({', '.join(frame.columns)}) VALUES ({placeholders})",
+        list(frame.itertuples(index=False, name=None))
+    )
+
+def read_chunks(path, table, date_fields=(), dtype=None):
+    """CSV chunks with date fields stored the way SQLAlchemy's SQLite Date type writes them."""
+    for chunk in pd.read_csv(path, chunksize=CHUNK_SIZE, dtype=dtype):
+        for field in date_fields:
+            if field in chunk:
+                chunk[field] = pd.to_datetime(chunk[field], format='%Y-%m-%d').dt.strftime('%Y-%m-%d')
+        yield chunk
+
+def load_csv(conn, path, model, date_fields=()):
+    """Stream a CSV into a table in executemany batches; returns the row count."""
+    table = model.__table__
+    loaded = 0
+    for chunk in read_chunks(path, table, date_fields):
+        insert_frame(conn, table, chunk[[c.name for c in table.columns if c.name in chunk.columns]])
+        loaded += len(chunk)
+    return loaded
+
+# Read as text: long numeric identifiers would otherwise lose digits or their leading zeros
+IDENTIFIER_FIELDS = ['registration_number', 'chassis_number', 'engine_number', 'pucc_no']
+
+def load_applications(conn, path, date_fields=()):
+    """
+    Split the wide applications CSV into narrow application rows, each one's
+    vehicle particulars (application_vehicle_details) and vehicles: one per
+    normalized registration, or chassis number when unregistered, holding the
+    details of its latest application by (submission_date, id).
+    """
+    vehicle_ids = {}
+    current = {}  # vehicle key -> (submission_date, id) of the application its details came from
+    loaded = 0
+    fields = list(VEHICLE_FIELDS)
+    update = text(
+        f"UPDATE vehicles SET {', '.join(f'{name} = :{name}' for name in fields)} WHERE id = :id")
+    dtype = {name: str for name in IDENTIFIER_FIELDS}
+    for chunk in read_chunks(path, Application.__table__, date_fields, dtype):
+        chunk = chunk.astype(object).where(chunk.notna(), None)
+        chunk['vehicle_key'] = [
+            vehicle_key(registration, chassis)
+            for registration, chassis in zip(chunk['registration_number'], chunk['chassis_number'])
+        ]
+        chunk['recency'] = list(zip(chunk['submission_date'].map(lambda d: d or ''), chunk['id']))
+
+        details = chunk[['id'] + [name for name in fields if name in chunk.columns]]
+        insert_frame(conn, ApplicationVehicleDetails.__table__, details.rename(columns={'id': 'application_id'}))
+
+        vehicles = chunk[chunk['vehicle_key'].notna()].sort_values('recency').drop_duplicates('vehicle_key', keep='last')
+        vehicles = vehicles[[name for name in fields if name in vehicles.columns] + ['vehicle_key', 'recency']]
+        seen = vehicles['vehicle_key'].isin(vehicle_ids)
+
+        new = vehicles[~seen].copy()
+        new['id'] = range(len(vehicle_ids) + 1, len(vehicle_ids) + 1 + len(new))
+        vehicle_ids.update(zip(new['vehicle_key'], new['id']))
+        current.update(zip(new['vehicle_key'], new['recency']))
+        new['registration_key'] = new['registration_number'].map(normalize_registration)
+        insert_frame(conn, Vehicle.__table__, new.drop(columns=['vehicle_key', 'recency']))
+
+        # Vehicles seen in an earlier chunk change only if this application is more recent
+        later = [row for row in vehicles[seen].to_dict('records') if row['recency'] > current[row['vehicle_key']]]
+        if later:
+            conn.execute(update, [
+                dict({name: row.get(name) for name in fields}, id=vehicle_ids[row['vehicle_key']])
+                for row in later
+            ])
+            current.update((row['vehicle_key'], row['recency']) for row in later)
+
+        chunk['vehicle_id'] = chunk['vehicle_key'].map(vehicle_ids)
+        columns = [c.name for c in Application.__table__.columns if c.name in chunk.columns]
+        insert_frame(conn, Application.__table__, chunk[columns])
+        loaded += len(chunk)
+    print(f"vehicles: {len(vehicle_ids)} rows")
+    return loaded
+
+if '--drop' in sys.argv:
+    Base.metadata.drop_all(engine)
 Base.metadata.create_all(engine)
 
-Session = sessionmaker(bind=engine)
-session = Session()
-
-# Load citizens
-citizens_df = pd.read_csv('citizens.csv')
-for _, row in citizens_df.iterrows():
-    citizen = Citizen(**row.to_dict())
-    session.add(citizen)
-
-# Load brokers
-brokers_df = pd.read_csv('brokers.csv')
-for _, row in brokers_df.iterrows():
-    broker = Broker(**row.to_dict())
-    session.add(broker)
-
-# Load applications
-applications_df = pd.read_csv('applications.csv')
-for _, row in applications_df.iterrows():
-    # Parse date fields
-    date_fields = ['submission_date', 'date_of_registration', 'registration_valid_upto', 'tax_valid_upto', 'insurance_valid_upto', 'pucc_valid_upto']
-    for field in date_fields:
-        if field in row and pd.notna(row[field]):
-            row[field] = datetime.strptime(row[field], '%Y-%m-%d').date()
-    app = Application(**row.to_dict())
-    session.add(app)
-
-# Load ratings
-ratings_df = pd.read_csv('ratings.csv')
-for _, row in ratings_df.iterrows():
-    rating = Rating(**row.to_dict())
-    session.add(rating)
-
-session.commit()
-print("Database created and data loaded successfully.")
\ No newline at end of file
+# Secondary indexes are rebuilt once after the load instead of per row
+with engine.begin() as conn:
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            conn.execute(text(f"DROP INDEX IF EXISTS {index.name}"))
+
+with engine.connect() as conn:
+    if engine.dialect.name == 'sqlite':
+        for pragma in LOAD_PRAGMAS:
+            conn.exec_driver_sql(pragma)
+        conn.commit()
+
+    with conn.begin():
+        for path, model, date_fields in [
+            ('citizens.csv', Citizen, ()),
+            ('brokers.csv', Broker, ()),
+            ('applications.csv', Application, DATE_FIELDS),
+            ('ratings.csv', Rating, ()),
+        ]:
+            started = time.perf_counter()
+            if model is Application:
+                rows = load_applications(conn, path, date_fields)
+            else:
+                rows = load_csv(conn, path, model, date_fields)
+            elapsed = time.perf_counter() - started
+            print(f"{model.__tablename__}: {rows} rows in {elapsed:.2f}s ({rows / max(elapsed, 1e-9):,.0f} rows/sec)")
+
+started = time.perf_counter()
+add_indexes(engine)
+with Session(bind=engine) as session:
+    rebuild_broker_stats(session)
+    rebuild_daily_rollup(session)
+    session.commit()
+print(f"Indexes, broker stats and analytics rollup built in {time.perf_counter() - started:.2f}s")
+
+print("Database created and data loaded successfully.")
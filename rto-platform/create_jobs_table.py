@@ -0,0 +1,5 @@
+from models import Base, engine, Job
+
+# Create the background job queue table (see jobs.py)
+Base.metadata.create_all(engine, tables=[Job.__table__])
+print("✓ Jobs table created successfully!")
@@ -0,0 +1,13 @@
+from sqlalchemy import text
+from models import engine, Application, BrokerStats
+from add_indexes import add_columns
+
+# Add the updated_at columns that the application and broker endpoints send as
+# Last-Modified. Existing applications are dated by their submission date and
+# broker counters by the time of this run. Safe to re-run.
+for name in add_columns(engine, Application.__table__.c.updated_at, BrokerStats.__table__.c.updated_at):
+    print(f"✓ Added {name}")
+with engine.begin() as conn:
+    conn.execute(text("UPDATE applications SET updated_at = submission_date || ' 00:00:00' WHERE updated_at IS NULL"))
+    conn.execute(text("UPDATE broker_stats SET updated_at = CURRENT_TIMESTAMP WHERE updated_at IS NULL"))
+print("✓ updated_at columns ready")
@@ -0,0 +1,88 @@
+from sqlalchemy import inspect, insert, text
+from sqlalchemy.schema import CreateTable
+from models import Base, engine, Application, ApplicationVehicleDetails, Vehicle, VEHICLE_FIELDS, vehicle_key
+from add_indexes import add_indexes
+
+# Move the vehicle columns out of applications, then rebuild applications as
+# a narrow table pointing at a deduplicated vehicles table.
+#
+# Each vehicle (same normalized registration number, or same chassis number
+# when unregistered) takes its current details from its most recent
+# application by (submission_date, id). Every application's own particulars
+# are copied unchanged to application_vehicle_details, so nothing is lost.
+# SQLite cannot drop columns in bulk, so applications is recreated and copied.
+# Safe to re-run: does nothing once applications has vehicle_id.
+
+CHUNK_SIZE = 50000
+
+def migrate(bind=engine):
+    with bind.connect() as conn:
+        columns = [column["name"] for column in inspect(conn).get_columns("applications")]
+    if "vehicle_id" in columns:
+        print("✓ applications already references vehicles; nothing to do")
+        return
+
+    Base.metadata.create_all(bind, tables=[Vehicle.__table__, ApplicationVehicleDetails.__table__])
+    narrow = [column.name for column in Application.__table__.columns if column.name != "vehicle_id"]
+    copied = [name for name in narrow if name in columns]
+    wide = [name for name in VEHICLE_FIELDS if name in columns]
+
+    with bind.begin() as conn:
+        # 1. Per-application particulars, and one vehicle per key from its latest application
+        vehicles = {}
+        # Typed so SQLite's date strings come back as dates for the inserts
+        details = ApplicationVehicleDetails.__table__
+        query = text(f"SELECT id AS application_id, {', '.join(wide)} FROM applications ORDER BY submission_date, id").columns(
+            details.c.application_id, *[details.c[name] for name in wide])
+        result = conn.execute(query)
+        saved = 0
+        while True:
+            rows = result.mappings().fetchmany(CHUNK_SIZE)
+            if not rows:
+                break
+            conn.execute(insert(details), [dict(row) for row in rows])
+            saved += len(rows)
+            for row in rows:
+                key = vehicle_key(row["registration_number"], row["chassis_number"])
+                if key:
+                    vehicles[key] = {name: row[name] for name in wide}
+        print(f"✓ {saved} applications' vehicle particulars kept")
+        keys = list(vehicles)
+        for start in range(0, len(keys), CHUNK_SIZE):
+            conn.execute(insert(Vehicle), [vehicles[key] for key in keys[start:start + CHUNK_SIZE]])
+        ids = {}
+        for vehicle_id, registration_number, chassis_number in conn.execute(
+                text("SELECT id, registration_number, chassis_number FROM vehicles")):
+            ids[vehicle_key(registration_number, chassis_number)] = vehicle_id
+        print(f"✓ {len(ids)} vehicles extracted")
+
+        # 2. Narrow applications table, filled from the wide one
+        ddl = str(CreateTable(Application.__table__).compile(bind)).replace(
+            "CREATE TABLE applications", "CREATE TABLE applications_new", 1)
+        conn.execute(text(ddl))
+        placeholders = ", ".join(f":{name}" for name in copied + ["vehicle_id"])
+        statement = text(f"INSERT INTO applications_new ({', '.join(copied)}, vehicle_id) VALUES ({placeholders})")
+        result = conn.execute(text(f"SELECT {', '.join(copied)}, registration_number, chassis_number FROM applications ORDER BY id"))
+        moved = 0
+        while True:
+            rows = result.mappings().fetchmany(CHUNK_SIZE)
+            if not rows:
+                break
+            conn.execute(statement, [
+                dict({name: row[name] for name in copied},
+                     vehicle_id=ids.get(vehicle_key(row["registration_number"], row["chassis_number"])))
+                for row in rows
+            ])
+            moved += len(rows)
+        conn.execute(text("DROP TABLE applications"))
+        conn.execute(text("ALTER TABLE applications_new RENAME TO applications"))
+        print(f"✓ {moved} applications rebuilt without vehicle columns")
+
+    for name in add_indexes(bind):
+        print(f"✓ Created {name}")
+    if bind.dialect.name == "sqlite":
+        with bind.connect() as conn:
+            conn.execution_options(isolation_level="AUTOCOMMIT").execute(text("VACUUM"))
+
+if __name__ == "__main__":
+    migrate()
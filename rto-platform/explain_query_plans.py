@@ -0,0 +1,72 @@
+from sqlalchemy import text
+from models import engine
+
+# Representative query for each hot endpoint, mirroring the filters app.py uses
+ENDPOINT_QUERIES = {
+    "GET /applications/?citizen_id": ("SELECT * FROM applications WHERE citizen_id = :id", {"id": 1}),
+    "GET /applications/?broker_id": ("SELECT * FROM applications WHERE broker_id = :id", {"id": 1}),
+    "GET /applications/ (keyset page)": (
+        "SELECT * FROM applications WHERE submission_date < :day OR (submission_date = :day AND id < :id) "
+        "ORDER BY submission_date DESC, id DESC LIMIT 51", {"day": "2025-05-01", "id": 1}),
+    "GET /applications/?is_fraud": ("SELECT * FROM applications WHERE is_fraud = :flag", {"flag": 1}),
+    "GET /analytics/ (approved)": ("SELECT count(*) FROM applications WHERE status = :status", {"status": "Approved"}),
+    "GET /brokers/{id}/details (recent)": (
+        "SELECT * FROM applications WHERE broker_id = :id ORDER BY submission_date DESC LIMIT 10", {"id": 1}),
+    "GET /brokers/{id}/assignments": (
+        "SELECT * FROM applications WHERE broker_id = :id AND status IN ('Pending', 'In Progress')", {"id": 1}),
+    "GET /brokers/{id}/statistics (daily)": (
+        "SELECT submission_date, count(id) FROM applications WHERE broker_id = :id "
+        "AND submission_date >= :start AND submission_date <= :end GROUP BY submission_date",
+        {"id": 1, "start": "2025-01-01", "end": "2025-01-07"}),
+    "POST /brokers/{id}/start-job": (
+        "SELECT * FROM applications JOIN vehicles ON applications.vehicle_id = vehicles.id "
+        "WHERE vehicles.registration_key = :key "
+        "ORDER BY applications.submission_date DESC, applications.id DESC LIMIT 1", {"key": "TN10CH1000"}),
+    "GET /vehicles/search (chassis)": (
+        "SELECT registration_key FROM vehicles WHERE chassis_number = :number LIMIT 10", {"number": "1"}),
+    "GET /vehicles/search (engine)": (
+        "SELECT registration_key FROM vehicles WHERE engine_number = :number LIMIT 10", {"number": "1"}),
+    "GET /vehicles/search (details)": (
+        "SELECT * FROM vehicles WHERE registration_key IN ('TN10CH1000', 'TN97CH2129')", {}),
+    "GET /vehicles/search (latest application)": (
+        "SELECT id, vehicle_id, status FROM applications WHERE vehicle_id IN (1, 2) ORDER BY submission_date, id", {}),
+    "GET /compliance/expiring": (
+        "SELECT * FROM vehicles WHERE insurance_valid_upto >= :start AND insurance_valid_upto <= :end "
+        "ORDER BY insurance_valid_upto, id LIMIT 101", {"start": "2025-06-01", "end": "2025-07-01"}),
+    "GET /brokers/{id}/compliance-leads": (
+        "SELECT * FROM compliance_leads WHERE broker_id = :id ORDER BY due_date, id LIMIT 101", {"id": 1}),
+    "compliance scan (new due dates)": (
+        "SELECT id FROM vehicles WHERE pucc_valid_upto >= :start AND pucc_valid_upto <= :end",
+        {"start": "2025-06-01", "end": "2025-07-01"}),
+    "GET /applications/{id} (rating)": ("SELECT * FROM ratings WHERE application_id = :id LIMIT 1", {"id": 1}),
+    "GET /payments/{application_id}": ("SELECT * FROM payments WHERE application_id = :id LIMIT 1", {"id": 1}),
+    "GET /complaints?broker_id&status": (
+        "SELECT * FROM complaints WHERE broker_id = :id AND status = :status", {"id": 1, "status": "Pending"}),
+    "GET /complaints?status": ("SELECT * FROM complaints WHERE status = :status", {"status": "Pending"}),
+    "GET /payments/ (keyset page)": (
+        "SELECT * FROM payments ORDER BY payment_date DESC, id DESC LIMIT 101", {}),
+    "POST /brokers/login": ("SELECT * FROM brokers WHERE license_number = :license LIMIT 1", {"license": "0"}),
+}
+
+def explain_query_plans(bind=engine):
+    """Run EXPLAIN QUERY PLAN for every endpoint query.
+
+    Returns {endpoint: (uses_index, [plan details])}. A query counts as
+    indexed when no step of its plan is a bare full-table SCAN.
+    """
+    report = {}
+    with bind.connect() as conn:
+        for endpoint, (sql, params) in ENDPOINT_QUERIES.items():
+            plan = [row[-1] for row in conn.execute(text("EXPLAIN QUERY PLAN " + sql), params)]
+            full_scans = [step for step in plan if step.startswith("SCAN") and "INDEX" not in step]
+            report[endpoint] = (not full_scans, plan)
+    return report
+
+if __name__ == "__main__":
+    report = explain_query_plans()
+    for endpoint, (uses_index, plan) in report.items():
+        print(f"{'✓' if uses_index else '✗'} {endpoint}")
+        for step in plan:
+            print(f"    {step}")
+    missing = [endpoint for endpoint, (uses_index, _) in report.items() if not uses_index]
+    print(f"\n{len(report) - len(missing)}/{len(report)} endpoint queries use an index")
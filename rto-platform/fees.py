@@ -0,0 +1,36 @@
+# Fee structure used by the fee estimate endpoint and the chat knowledge base
+BASE_FEES = {
+    "New Registration": 1500,
+    "Renewal": 800,
+    "Transfer": 1000
+}
+
+VEHICLE_CLASS_MULTIPLIER = {
+    "Two Wheeler": 1.0,
+    "Four Wheeler": 1.5,
+    "Commercial": 2.0,
+    "Heavy Vehicle": 3.0
+}
+
+DEFAULT_BASE_FEE = 1000
+BROKER_COMMISSION_RATE = 0.15
+GST_RATE = 0.18
+
+
+def fee_breakdown(application_type: str, vehicle_class: str) -> dict:
+    """Base fee, class-adjusted service fee, commission, GST and total."""
+    base_fee = BASE_FEES.get(application_type, DEFAULT_BASE_FEE)
+    multiplier = VEHICLE_CLASS_MULTIPLIER.get(vehicle_class, 1.0)
+
+    service_fee = base_fee * multiplier
+    broker_commission = service_fee * BROKER_COMMISSION_RATE
+    tax = service_fee * GST_RATE  # GST
+    total = service_fee + broker_commission + tax
+
+    return {
+        "base_fee": round(base_fee, 2),
+        "service_fee": round(service_fee, 2),
+        "broker_commission": round(broker_commission, 2),
+        "tax_gst": round(tax, 2),
+        "total": round(total, 2)
+    }
@@ -0,0 +1,189 @@
+"""
+Durable background jobs for slow work (OCR, forgery analysis, LLM calls,
+fraud scoring) kept off the request path.
+
+Jobs are rows in the jobs table of the application database, so queued work
+survives a restart. Worker threads claim one job at a time with a
+conditional UPDATE, so two workers (or two processes) never run the same
+job; a running job whose lease has expired is assumed to belong to a dead
+worker and is claimed again, and the stale worker's result is discarded when
+it finishes. Handler exceptions are retried with exponential
+backoff until max_attempts, then the job is marked failed.
+"""
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.orm import Session
+
+from models import Job, engine
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))  # worker threads per process
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_RETRY_BASE_SECONDS = float(os.getenv("JOB_RETRY_BASE_SECONDS", "2"))  # doubled after each failed attempt
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "300"))  # longest a job may run before it is reclaimed
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "1"))  # idle workers re-check for due retries this often
+
+
+class UnknownJobKind(Exception):
+    """No handler is registered for the job's kind; the job fails without retrying."""
+
+
+class JobQueue:
+    """SQLite-backed job queue with a pool of worker threads."""
+
+    def __init__(self, bind=engine, workers: int = JOB_WORKERS, retry_base: float = JOB_RETRY_BASE_SECONDS,
+                 lease_seconds: int = JOB_LEASE_SECONDS):
+        self.bind = bind
+        self.workers = workers
+        self.retry_base = retry_base
+        self.lease_seconds = lease_seconds
+        self.handlers = {}
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def handler(self, kind: str):
+        """Register fn(payload) -> JSON-serializable result as the handler for `kind`."""
+        def register(fn):
+            self.handlers[kind] = fn
+            return fn
+        return register
+
+    def submit(self, kind: str, payload: dict, max_attempts: int = JOB_MAX_ATTEMPTS) -> int:
+        """Queue a job and return its id; starts the workers if they are not running."""
+        with Session(self.bind) as db:
+            job = Job(kind=kind, status="queued", payload=json.dumps(payload), max_attempts=max_attempts,
+                      run_after=datetime.utcnow())
+            db.add(job)
+            db.commit()
+            job_id = job.id
+        self.start()
+        self._wakeup.set()
+        return job_id
+
+    def get(self, job_id: int) -> dict:
+        """Job status and, once finished, its result or error; None if there is no such job."""
+        with Session(self.bind) as db:
+            job = db.get(Job, job_id)
+            if job is None:
+                return None
+            return {
+                "id": job.id,
+                "kind": job.kind,
+                "status": job.status,
+                "attempts": job.attempts,
+                "result": json.loads(job.result) if job.result else None,
+                "error": job.error,
+                "created_at": job.created_at.isoformat() if job.created_at else None,
+                "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+            }
+
+    def _claimable(self, now: datetime):
+        return or_(
+            and_(Job.status == "queued", Job.run_after <= now),
+            and_(Job.status == "running", Job.lease_until < now),
+        )
+
+    def claim(self):
+        """Take the next due job (marked running, attempt counted), or None."""
+        with Session(self.bind) as db:
+            while True:
+                now = datetime.utcnow()
+                job_id = db.scalar(select(Job.id).where(self._claimable(now)).order_by(Job.run_after, Job.id).limit(1))
+                if job_id is None:
+                    return None
+                claimed = db.execute(update(Job).where(Job.id == job_id, self._claimable(now)).values(
+                    status="running",
+                    attempts=Job.attempts + 1,
+                    started_at=now,
+                    lease_until=now + timedelta(seconds=self.lease_seconds),
+                ))
+                db.commit()
+                if claimed.rowcount == 1:
+                    job = db.get(Job, job_id)
+                    return job.id, job.kind, json.loads(job.payload or "null"), job.attempts, job.max_attempts
+                # Another worker got it first; try the next one
+
+    def run_one(self) -> bool:
+        """Claim and run one job; False if nothing was due."""
+        claimed = self.claim()
+        if claimed is None:
+            return False
+        job_id, kind, payload, attempts, max_attempts = claimed
+        values = {"lease_until": None}
+        try:
+            handler = self.handlers.get(kind)
+            if handler is None:
+                raise UnknownJobKind(f"No handler registered for job kind {kind!r}")
+            result = handler(payload)
+            values.update(status="succeeded", result=json.dumps(result, default=str), error=None, payload=None,
+                          finished_at=datetime.utcnow())
+        except Exception as exc:
+            values["error"] = f"{type(exc).__name__}: {exc}"
+            if attempts < max_attempts and not isinstance(exc, UnknownJobKind):
+                delay = self.retry_base * 2 ** (attempts - 1)
+                values.update(status="queued", run_after=datetime.utcnow() + timedelta(seconds=delay))
+            else:
+                values.update(status="failed", finished_at=datetime.utcnow())
+        with Session(self.bind) as db:
+            # Only while this worker still holds the claim: if the lease expired and the job was
+            # claimed again (attempts moved on), the newer run owns the outcome and this one is dropped
+            db.execute(update(Job).where(
+                Job.id == job_id, Job.status == "running", Job.attempts == attempts
+            ).values(**values))
+            db.commit()
+        return True
+
+    def _work(self):
+        while not self._stop.is_set():
+            try:
+                if self.run_one():
+                    continue
+            except Exception:
+                # Database busy or similar; back off and try again
+                time.sleep(JOB_POLL_SECONDS)
+                continue
+            self._wakeup.wait(JOB_POLL_SECONDS)
+            self._wakeup.clear()
+
+    def start(self):
+        """Start the worker threads (idempotent)."""
+        if self._threads or self.workers <= 0:
+            return
+        with self._lock:
+            if self._threads:
+                return
+            self._stop.clear()
+            self._threads = [
+                threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+                for i in range(self.workers)
+            ]
+            for thread in self._threads:
+                thread.start()
+
+    def stop(self, timeout: float = 5):
+        """Stop the workers after their current job; unfinished jobs stay queued in the database."""
+        self._stop.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def job_queue() -> JobQueue:
+    """Shared queue for the application process."""
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                _queue = JobQueue()
+    return _queue
@@ -0,0 +1,202 @@
+"""
+Local RTO knowledge for the chatbot.
+
+Questions the platform can answer from its own data (fees, application
+status, document requirements, brokers by specialization) are answered here
+without a remote model call. Everything else gets the top-k retrieved
+passages as grounding for the LLM.
+"""
+import os
+import re
+import threading
+import time
+
+from sqlalchemy import select
+
+from ai_services.chatbot import FAQ
+from ai_services.retrieval import BM25Index, tokenize
+from fees import BASE_FEES, VEHICLE_CLASS_MULTIPLIER, BROKER_COMMISSION_RATE, GST_RATE, fee_breakdown
+from models import Application, Broker, BrokerStats
+
+KNOWLEDGE_MIN_COVERAGE = float(os.getenv("KNOWLEDGE_MIN_COVERAGE", "0.5"))  # answer directly above this
+KNOWLEDGE_MIN_MARGIN = float(os.getenv("KNOWLEDGE_MIN_MARGIN", "1.5"))  # top score vs runner-up
+KNOWLEDGE_TOP_K = int(os.getenv("KNOWLEDGE_TOP_K", "3"))
+KNOWLEDGE_REFRESH_SECONDS = float(os.getenv("KNOWLEDGE_REFRESH_SECONDS", "3600"))
+
+CORPUS = [
+    {"title": "Driving license renewal",
+     "text": "Renew a driving license with Form 9, the existing DL, address proof and passport-size photos. "
+             "Applicants above 40 also need a medical certificate in Form 1A. Renewal can be done up to a year "
+             "before expiry; after a year past expiry a fresh test may be required."},
+    {"title": "Learner's license",
+     "text": "A learner's license needs Form 1, Form 2, age proof, address proof, photos and passing the online "
+             "road-rules test. It is valid for six months; the permanent license test can be taken after 30 days."},
+    {"title": "Duplicate RC",
+     "text": "For a duplicate registration certificate (RC) submit Form 26, an FIR copy or affidavit for a lost RC, "
+             "valid insurance, PUC certificate, and the NOC from the financier if the vehicle is hypothecated."},
+    {"title": "Duplicate driving license",
+     "text": "For a duplicate driving license submit Form LLD, an FIR copy for a lost license, address proof and photos."},
+    {"title": "Change of address on RC",
+     "text": "To change the address on the registration certificate submit Form 33 within 14 days of moving, with "
+             "the original RC, new address proof, valid insurance and PUC certificate."},
+    {"title": "Hypothecation addition and removal",
+     "text": "Hypothecation (loan) is recorded on the RC with Form 34 at purchase. After the loan is repaid, submit "
+             "Form 35 with the NOC from the bank or financier to remove the hypothecation from the RC."},
+    {"title": "NOC for interstate transfer",
+     "text": "A No Objection Certificate in Form 28 is needed to move a vehicle to another state. Apply to the "
+             "registering RTO with the RC, insurance, PUC and a clearance of pending e-challans."},
+    {"title": "PUC certificate",
+     "text": "A Pollution Under Control (PUC) certificate is mandatory for every vehicle. New vehicles get one valid "
+             "for a year; after that it must be renewed every six months at an authorised emission testing centre."},
+    {"title": "Vehicle insurance",
+     "text": "Third-party insurance is mandatory for every vehicle in India. Insurance must be valid for "
+             "registration, transfer and renewal applications."},
+    {"title": "Fitness certificate",
+     "text": "Commercial vehicles need a fitness certificate renewed every two years for the first eight years and "
+             "yearly after that. Private vehicles need a fitness test when registration is renewed after 15 years."},
+    {"title": "Fancy number plate reservation",
+     "text": "Fancy or choice registration numbers are booked through the state e-auction on the Parivahan portal. "
+             "Pay the reservation fee, bid in the auction, and link the allotted number at registration."},
+    {"title": "E-challan payment",
+     "text": "Traffic e-challans can be checked and paid online on the e-challan Parivahan portal using the vehicle "
+             "number, challan number or DL number. Unpaid challans block transfer and NOC applications."},
+    {"title": "Application status meanings",
+     "text": "Applications on this platform are Pending while the broker and RTO process them, Approved once the RTO "
+             "accepts them, and Rejected if documents are incomplete or flagged. Ask for the status of an "
+             "application by its number, for example 'status of application 123'."},
+    {"title": "About this platform",
+     "text": "This platform connects citizens with verified brokers for RTO services. Brokers are rated by "
+             "citizens on punctuality, quality, compliance and communication, and every application is screened "
+             "for fraud."},
+    {"title": "Fee structure",
+     "text": "Base fees: " + ", ".join(f"{name} Rs. {fee}" for name, fee in BASE_FEES.items()) + ". "
+             "Vehicle class multipliers: " + ", ".join(f"{name} x{m}" for name, m in VEHICLE_CLASS_MULTIPLIER.items()) + ". "
+             f"Broker commission is {BROKER_COMMISSION_RATE:.0%} and GST is {GST_RATE:.0%} of the service fee."},
+] + [
+    {"title": " ".join(sorted(keywords)).title(), "text": answer} for keywords, answer in FAQ
+]
+
+# Words in a question that select an application type / vehicle class for fee lookups
+FEE_WORDS = {"fee", "cost", "charge", "price", "pay", "amount"}
+APPLICATION_TYPE_WORDS = {
+    "transfer": "Transfer", "ownership": "Transfer",
+    "renewal": "Renewal", "renew": "Renewal",
+    "new": "New Registration", "registration": "New Registration", "register": "New Registration",
+}
+VEHICLE_CLASS_WORDS = {
+    "two": "Two Wheeler", "bike": "Two Wheeler", "scooter": "Two Wheeler", "motorcycle": "Two Wheeler",
+    "four": "Four Wheeler", "car": "Four Wheeler",
+    "commercial": "Commercial", "taxi": "Commercial",
+    "heavy": "Heavy Vehicle", "truck": "Heavy Vehicle", "bus": "Heavy Vehicle",
+}
+# The number has to follow "application"/"app" directly (optionally "no."/"number"/"#"), so
+# "application submitted 2 weeks ago" or "filed on 12 March" never look up someone else's record
+APPLICATION_NUMBER = re.compile(
+    r"\b(?:application|app)\s*(?:(?:no\.?|number|num\.?)\s*)?#?\s*(\d+)\b"
+    r"(?!\s*(?:days?|weeks?|months?|years?|hours?|minutes?)\b)",
+    re.IGNORECASE,
+)
+# Questions that ask for an amount, not ones that merely mention a fee ("I already paid the fee")
+FEE_QUESTION = re.compile(
+    r"\bhow much\b|\b(?:what|which)(?:'s|\s+is|\s+are|\s+will\s+be)?\s+(?:\w+\s+){0,4}?(?:fees?|costs?|charges?|price)\b",
+    re.IGNORECASE,
+)
+
+
+def fee_answer(message: str):
+    words = set(tokenize(message))
+    if not words & FEE_WORDS or not FEE_QUESTION.search(message):
+        return None
+    # "renewal" wins over "registration" when both appear ("registration renewal fee")
+    types = [APPLICATION_TYPE_WORDS[w] for w in ("transfer", "ownership", "renewal", "renew", "new", "registration", "register") if w in words]
+    if not types:
+        return None
+    application_type = types[0]
+    classes = [VEHICLE_CLASS_WORDS[w] for w in words if w in VEHICLE_CLASS_WORDS] or list(VEHICLE_CLASS_MULTIPLIER)
+    lines = []
+    for vehicle_class in dict.fromkeys(classes):
+        fee = fee_breakdown(application_type, vehicle_class)
+        lines.append(
+            f"{application_type} ({vehicle_class}): Rs. {fee['total']:,.2f} total "
+            f"(service fee Rs. {fee['service_fee']:,.2f} + broker commission Rs. {fee['broker_commission']:,.2f} "
+            f"+ GST Rs. {fee['tax_gst']:,.2f})"
+        )
+    return "Estimated fees on this platform:\n" + "\n".join(lines)
+
+
+def status_answer(db, message: str):
+    if "status" not in message.lower():
+        return None
+    match = APPLICATION_NUMBER.search(message)
+    if not match:
+        return None
+    application_id = int(match.group(1))
+    row = db.execute(
+        select(Application.id, Application.application_type, Application.status, Application.submission_date)
+        .where(Application.id == application_id)
+    ).first()
+    if row is None:
+        return f"No application #{application_id} was found."
+    return f"Application #{row.id} ({row.application_type}) is {row.status}. It was submitted on {row.submission_date}."
+
+
+def broker_passages(db, per_specialization: int = 5) -> list:
+    """Top-rated brokers for each specialization, from the incremental broker stats."""
+    rows = db.execute(
+        select(Broker.name, Broker.specialization, BrokerStats.overall_sum, BrokerStats.rating_count)
+        .outerjoin(BrokerStats, BrokerStats.broker_id == Broker.id)
+    ).all()
+    by_specialization = {}
+    for name, specialization, overall_sum, rating_count in rows:
+        if not specialization:
+            continue
+        average = (overall_sum or 0) / rating_count if rating_count else 0
+        by_specialization.setdefault(specialization, []).append((average, rating_count or 0, name))
+    passages = []
+    for specialization, brokers in sorted(by_specialization.items()):
+        brokers.sort(reverse=True)
+        best = ", ".join(f"{name} ({average:.1f}/5, {count} ratings)" for average, count, name in brokers[:per_specialization])
+        passages.append({
+            "title": f"Brokers for {specialization}",
+            "text": f"{len(brokers)} brokers on the platform specialize in {specialization}. Top rated: {best}.",
+        })
+    return passages
+
+
+class KnowledgeBase:
+    """BM25 index over the curated corpus plus live broker passages, rebuilt periodically."""
+
+    def __init__(self, refresh_seconds: float = KNOWLEDGE_REFRESH_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        self.index = None
+        self.built_at = 0.0
+        self._lock = threading.Lock()
+
+    def index_for(self, db) -> BM25Index:
+        if self.index is None or time.monotonic() - self.built_at > self.refresh_seconds:
+            with self._lock:
+                if self.index is None or time.monotonic() - self.built_at > self.refresh_seconds:
+                    self.index = BM25Index(CORPUS + broker_passages(db))
+                    self.built_at = time.monotonic()
+        return self.index
+
+    def invalidate(self):
+        self.index = None
+
+    def lookup(self, db, message: str) -> dict:
+        """
+        {"answer", "source", "passages"}: answer is set when the question can be
+        answered locally; passages are the top-k retrieved texts for grounding.
+        """
+        for source, answer in (("status", status_answer(db, message)), ("fees", fee_answer(message))):
+            if answer:
+                return {"answer": answer, "source": source, "passages": []}
+
+        results = self.index_for(db).search(message, KNOWLEDGE_TOP_K)
+        passages = [f"{passage['title']}: {passage['text']}" for passage, _, _ in results]
+        if results:
+            passage, score, coverage = results[0]
+            runner_up = results[1][1] if len(results) > 1 else 0.0
+            if coverage >= KNOWLEDGE_MIN_COVERAGE and score >= KNOWLEDGE_MIN_MARGIN * runner_up:
+                return {"answer": passage["text"], "source": "knowledge", "passages": passages}
+        return {"answer": None, "source": None, "passages": passages}
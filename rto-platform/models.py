@@ -1,11 +1,107 @@
-from sqlalchemy import create_engine, Column, Integer, String, Date, ForeignKey, Boolean, Float, DateTime
+from sqlalchemy import create_engine, event, Column, Integer, String, Date, ForeignKey, Boolean, Float, DateTime, Index, UniqueConstraint, Text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
+import os
+import re
 
 Base = declarative_base()
 
-engine = create_engine('sqlite:///rto.db')
+# Connection settings, overridable from the environment
+DATABASE_URL = os.getenv('DATABASE_URL', 'sqlite:///rto.db')
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '10'))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '20'))
+SQLITE_JOURNAL_MODE = os.getenv('SQLITE_JOURNAL_MODE', 'WAL')
+SQLITE_SYNCHRONOUS = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000'))
+SQLITE_CACHE_SIZE_KB = int(os.getenv('SQLITE_CACHE_SIZE_KB', '65536'))
+SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))
+
+def _normalize_url(url: str = None) -> str:
+    """DATABASE_URL (or url) with the legacy postgres:// scheme spelled postgresql://."""
+    url = url or DATABASE_URL
+    if url.startswith('postgres://'):
+        url = 'postgresql://' + url[len('postgres://'):]
+    return url
+
+def _listen_sqlite_pragmas(sync_engine, in_memory: bool):
+    """Apply the connect-time SQLite pragmas to every new connection of sync_engine."""
+    @event.listens_for(sync_engine, 'connect')
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        if not in_memory:
+            cursor.execute(f'PRAGMA journal_mode={SQLITE_JOURNAL_MODE}')
+            cursor.execute(f'PRAGMA mmap_size={SQLITE_MMAP_SIZE}')
+        cursor.execute(f'PRAGMA synchronous={SQLITE_SYNCHRONOUS}')
+        cursor.execute(f'PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}')
+        cursor.execute(f'PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}')
+        cursor.close()
+
+def make_engine(url: str = None):
+    """
+    Build the application engine.
+
+    SQLite connections get WAL journaling, a busy timeout and larger page
+    cache / mmap through connect-time pragmas so concurrent writers wait
+    for each other instead of failing with "database is locked". Any other
+    URL (e.g. postgresql://...) gets a plain pooled engine.
+    """
+    url = _normalize_url(url)
+
+    if not url.startswith('sqlite'):
+        return create_engine(url, pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW, pool_pre_ping=True)
+
+    in_memory = url in ('sqlite://', 'sqlite:///:memory:')
+    pool_args = {} if in_memory else {'pool_size': DB_POOL_SIZE, 'max_overflow': DB_MAX_OVERFLOW}
+    sqlite_engine = create_engine(
+        url,
+        connect_args={'check_same_thread': False, 'timeout': SQLITE_BUSY_TIMEOUT_MS / 1000},
+        **pool_args
+    )
+    _listen_sqlite_pragmas(sqlite_engine, in_memory)
+    return sqlite_engine
+
+engine = make_engine()
+
+# Async drivers used for the async endpoints (optional dependencies)
+ASYNC_DRIVERS = {'sqlite': 'sqlite+aiosqlite', 'postgresql': 'postgresql+asyncpg'}
+
+def make_async_engine(url: str = None):
+    """
+    Async counterpart of make_engine(): aiosqlite for SQLite (with the same
+    pragmas) or asyncpg for PostgreSQL.
+    """
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    scheme, rest = _normalize_url(url).split('://', 1)
+    url = f"{ASYNC_DRIVERS.get(scheme.split('+')[0], scheme)}://{rest}"
+
+    if not url.startswith('sqlite'):
+        return create_async_engine(url, pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW, pool_pre_ping=True)
+
+    in_memory = rest in ('', '/:memory:')
+    pool_args = {} if in_memory else {'pool_size': DB_POOL_SIZE, 'max_overflow': DB_MAX_OVERFLOW}
+    async_engine = create_async_engine(url, connect_args={'timeout': SQLITE_BUSY_TIMEOUT_MS / 1000}, **pool_args)
+    _listen_sqlite_pragmas(async_engine.sync_engine, in_memory)
+    return async_engine
+
+_async_engine = None
+
+def get_async_engine():
+    """Shared async engine, created on first use so the driver stays optional."""
+    global _async_engine
+    if _async_engine is None:
+        _async_engine = make_async_engine()
+    return _async_engine
+
+def normalize_registration(value):
+    """Registration / chassis / engine number as uppercase letters and digits only ("tn 97 ch-2129" -> "TN97CH2129")."""
+    if not isinstance(value, str):
+        return None
+    return re.sub(r'[^0-9A-Z]', '', value.upper()) or None
+
+def _registration_key_default(context):
+    return normalize_registration(context.get_current_parameters().get('registration_number'))
 
 class Citizen(Base):
     __tablename__ = 'citizens'
@@ -20,29 +116,56 @@ class Broker(Base):
     __tablename__ = 'brokers'
     id = Column(Integer, primary_key=True)
     name = Column(String)
-    license_number = Column(String, unique=True)
+    license_number = Column(String, unique=True)  # UNIQUE doubles as the login index
     phone = Column(String)
     email = Column(String)
     specialization = Column(String)
 
 class Application(Base):
     __tablename__ = 'applications'
+    __table_args__ = (
+        Index('ix_applications_broker_id_status', 'broker_id', 'status'),
+        Index('ix_applications_broker_id_submission_date', 'broker_id', 'submission_date'),
+        Index('ix_applications_citizen_id_submission_date', 'citizen_id', 'submission_date'),
+    )
     id = Column(Integer, primary_key=True)
     citizen_id = Column(Integer, ForeignKey('citizens.id'))
     broker_id = Column(Integer, ForeignKey('brokers.id'))
     application_type = Column(String)
-    status = Column(String)
-    submission_date = Column(Date)
+    status = Column(String, index=True)
+    submission_date = Column(Date, index=True)
     documents = Column(String)
-    is_fraud = Column(Boolean)
+    is_fraud = Column(Boolean, index=True)
     
-    # Vehicle details
+    # Registering RTO for this application; also an analytics rollup dimension
+    registering_authority = Column(String)
+    # The vehicle record shared by all of a vehicle's applications; the
+    # particulars submitted with this application are in vehicle_details
+    vehicle_id = Column(Integer, ForeignKey('vehicles.id'), index=True)
+    # Last change to the row (or its rating); sent as Last-Modified by GET /applications/{id}
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    citizen = relationship('Citizen')
+    broker = relationship('Broker')
+    vehicle = relationship('Vehicle')
+    vehicle_details = relationship('ApplicationVehicleDetails', uselist=False)
+    ratings = relationship('Rating', order_by='Rating.id')
+    payments = relationship('Payment', order_by='Payment.id')
+
+# Order of a vehicle's applications, oldest first; the last one is its current
+# application (the same order create_vehicles_table.py picks vehicle details by)
+APPLICATION_RECENCY = (Application.submission_date, Application.id)
+LATEST_APPLICATION_FIRST = tuple(column.desc() for column in APPLICATION_RECENCY)
+
+class VehicleParticulars:
+    """Vehicle columns shared by the vehicle record and each application's submitted copy."""
+    registration_number = Column(String)
+    chassis_number = Column(String)
+    engine_number = Column(String)
     owner_name = Column(String)
     owner_so = Column(String)
     owner_address = Column(String)
     ownership = Column(String)  # Single/partner
-    chassis_number = Column(String)
-    engine_number = Column(String)
     cubic_capacity = Column(String)
     maker_name = Column(String)
     model_name = Column(String)
@@ -60,13 +183,59 @@ class Application(Base):
     insurance_valid_upto = Column(Date)
     pucc_no = Column(String)
     pucc_valid_upto = Column(Date)
-    registering_authority = Column(String)
-    registration_number = Column(String)
+
+class Vehicle(VehicleParticulars, Base):
+    """
+    One row per vehicle, keyed by registration number (or chassis number before
+    registration), holding its current details: those of its most recent
+    application by (submission_date, id).
+    """
+    __tablename__ = 'vehicles'
+    __table_args__ = (
+        Index('ix_vehicles_chassis_number', 'chassis_number'),
+        Index('ix_vehicles_engine_number', 'engine_number'),
+        # Validity dates are range-indexed for the compliance expiry scan
+        Index('ix_vehicles_registration_valid_upto', 'registration_valid_upto'),
+        Index('ix_vehicles_tax_valid_upto', 'tax_valid_upto'),
+        Index('ix_vehicles_insurance_valid_upto', 'insurance_valid_upto'),
+        Index('ix_vehicles_pucc_valid_upto', 'pucc_valid_upto'),
+        Index('ix_vehicles_fitness_status', 'fitness_status'),
+        # Lets the compliance scan pick up vehicles whose dates changed since its last run
+        Index('ix_vehicles_updated_at', 'updated_at'),
+    )
+    id = Column(Integer, primary_key=True)
+    # Normalized registration_number for lookups; kept in sync by the default below and the set event
+    registration_key = Column(String, unique=True, default=_registration_key_default)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class ApplicationVehicleDetails(VehicleParticulars, Base):
+    """
+    Vehicle particulars as submitted with one application (owner, validity
+    dates, ...), so older applications keep their own details after the
+    vehicle record moves on. Read only by the application detail endpoint.
+    """
+    __tablename__ = 'application_vehicle_details'
+    application_id = Column(Integer, ForeignKey('applications.id'), primary_key=True)
+
+# Vehicle columns in the original wide applications rows / CSV, in table order
+VEHICLE_FIELDS = [column.name for column in ApplicationVehicleDetails.__table__.columns if column.name != 'application_id']
+
+@event.listens_for(Vehicle.registration_number, 'set')
+def _sync_registration_key(target, value, oldvalue, initiator):
+    target.registration_key = normalize_registration(value)
+
+def vehicle_key(registration_number, chassis_number):
+    """Identity used to deduplicate vehicles: normalized registration, else chassis number."""
+    key = normalize_registration(registration_number)
+    if key:
+        return key
+    chassis = normalize_registration(chassis_number)
+    return f"chassis:{chassis}" if chassis else None
 
 class Rating(Base):
     __tablename__ = 'ratings'
     id = Column(Integer, primary_key=True)
-    application_id = Column(Integer, ForeignKey('applications.id'))
+    application_id = Column(Integer, ForeignKey('applications.id'), index=True)
     punctuality = Column(Integer)
     quality = Column(Integer)
     compliance = Column(Integer)
@@ -75,22 +244,99 @@ class Rating(Base):
 
 class Complaint(Base):
     __tablename__ = 'complaints'
+    __table_args__ = (
+        Index('ix_complaints_broker_id_status', 'broker_id', 'status'),
+    )
     id = Column(Integer, primary_key=True)
     broker_id = Column(Integer, ForeignKey('brokers.id'))
     application_id = Column(Integer, ForeignKey('applications.id'))
     complaint_type = Column(String)
     description = Column(String)
-    status = Column(String)  # Pending, Resolved, Closed
-    submitted_date = Column(Date)
+    status = Column(String, index=True)  # Pending, Resolved, Closed
+    submitted_date = Column(Date, index=True)
     resolved_date = Column(Date)
 
 class Payment(Base):
     __tablename__ = 'payments'
     id = Column(Integer, primary_key=True)
-    application_id = Column(Integer, ForeignKey('applications.id'))
+    application_id = Column(Integer, ForeignKey('applications.id'), index=True)
     amount = Column(Float)
     payment_method = Column(String)  # UPI, Card, NetBanking
     transaction_id = Column(String, unique=True)
     status = Column(String)  # Pending, Success, Failed
-    payment_date = Column(DateTime, default=datetime.utcnow)
-    fee_breakdown = Column(String)  # JSON string
\ No newline at end of file
+    payment_date = Column(DateTime, default=datetime.utcnow, index=True)
+    fee_breakdown = Column(String)  # JSON string
+
+class BrokerStats(Base):
+    __tablename__ = 'broker_stats'
+    broker_id = Column(Integer, ForeignKey('brokers.id'), primary_key=True)
+    total_applications = Column(Integer, default=0)
+    rating_count = Column(Integer, default=0)
+    punctuality_sum = Column(Integer, default=0)
+    quality_sum = Column(Integer, default=0)
+    compliance_sum = Column(Integer, default=0)
+    communication_sum = Column(Integer, default=0)
+    overall_sum = Column(Integer, default=0)
+    # Last change to the broker's counters; sent as Last-Modified by the broker endpoints
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class BrokerStatusCount(Base):
+    __tablename__ = 'broker_status_counts'
+    broker_id = Column(Integer, ForeignKey('brokers.id'), primary_key=True)
+    status = Column(String, primary_key=True)
+    count = Column(Integer, default=0)
+
+class ApplicationDailyRollup(Base):
+    __tablename__ = 'application_daily_rollup'
+    day = Column(Date, primary_key=True)
+    application_type = Column(String, primary_key=True)
+    status = Column(String, primary_key=True)
+    registering_authority = Column(String, primary_key=True)
+    applications = Column(Integer, default=0)
+    fraud = Column(Integer, default=0)
+
+class ComplianceLead(Base):
+    """A vehicle whose registration / tax / insurance / PUCC is due, for its broker to follow up."""
+    __tablename__ = 'compliance_leads'
+    __table_args__ = (
+        UniqueConstraint('vehicle_id', 'kind', 'due_date'),
+        Index('ix_compliance_leads_broker_id_due_date', 'broker_id', 'due_date'),
+        Index('ix_compliance_leads_lead_type_due_date', 'lead_type', 'due_date'),
+    )
+    id = Column(Integer, primary_key=True)
+    vehicle_id = Column(Integer, ForeignKey('vehicles.id'))
+    broker_id = Column(Integer, ForeignKey('brokers.id'))  # broker on the vehicle's latest application
+    kind = Column(String)  # registration, tax, insurance, pucc
+    due_date = Column(Date)
+    lead_type = Column(String)  # reminder (due soon), renewal (already lapsed)
+    generated_on = Column(Date, index=True)
+    vehicle = relationship('Vehicle')
+
+class ComplianceScanState(Base):
+    """High-water marks of the compliance scan, one row per kind."""
+    __tablename__ = 'compliance_scan_state'
+    kind = Column(String, primary_key=True)
+    scanned_through = Column(Date)  # due dates up to this day have been turned into leads
+    last_vehicle_id = Column(Integer, default=0)  # vehicles up to this id have been scanned in full
+    last_updated_at = Column(DateTime)  # vehicles updated up to this time have been rescanned in full
+    last_run = Column(DateTime)
+
+class Job(Base):
+    """Durable background job; see jobs.py."""
+    __tablename__ = 'jobs'
+    __table_args__ = (
+        Index('ix_jobs_status_run_after', 'status', 'run_after'),
+    )
+    id = Column(Integer, primary_key=True)
+    kind = Column(String)  # handler name, e.g. ocr, forgery, chat, fraud_score
+    status = Column(String, default='queued')  # queued, running, succeeded, failed
+    payload = Column(Text)  # JSON; cleared once the job succeeds
+    result = Column(Text)  # JSON
+    error = Column(String)
+    attempts = Column(Integer, default=0)
+    max_attempts = Column(Integer, default=3)
+    run_after = Column(DateTime, default=datetime.utcnow)  # not claimed before this (retry backoff)
+    lease_until = Column(DateTime)  # a running job past its lease is reclaimed (worker died)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
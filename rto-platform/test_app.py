@@ -17,6 +17,23 @@ def test_analytics():
     assert "total_applications" in data
     assert "approved_applications" in data
 
+def test_analytics_counts_new_applications():
+    before = client.get("/analytics/").json()
+    client.post("/applications/", json={
+        "citizen_id": 1,
+        "broker_id": 1,
+        "application_type": "Renewal",
+        "documents": "test_documents"
+    })
+    after = client.get("/analytics/").json()
+    assert after["total_applications"] == before["total_applications"] + 1
+
+    series = client.get("/analytics/timeseries", params={"days": 7, "group_by": "status"}).json()
+    assert len(series["dates"]) == 7
+    assert series["series"]["Pending"][-1] >= 1
+    fraud_rate = client.get("/analytics/fraud-rate", params={"days": 7}).json()
+    assert fraud_rate[-1]["applications"] >= 1
+
 def test_list_brokers():
     response = client.get("/brokers/")
     assert response.status_code == 200
@@ -27,6 +44,72 @@ def test_list_brokers():
         assert "name" in broker
         assert "avg_overall" in broker
 
+def test_broker_ratings_consistent():
+    brokers = client.get("/brokers/").json()
+    if not brokers:
+        return
+    listed = brokers[0]
+    response = client.get(f"/brokers/{listed['id']}")
+    assert response.status_code == 200
+    assert response.json()["avg_overall"] == listed["avg_overall"]
+    details = client.get(f"/brokers/{listed['id']}/details").json()
+    assert details["ratings"]["overall"] == round(listed["avg_overall"], 2)
+    assert "total_ratings" in details["ratings"]
+
+def test_endpoint_queries_use_indexes():
+    from explain_query_plans import explain_query_plans
+    report = explain_query_plans()
+    unindexed = [endpoint for endpoint, (uses_index, _) in report.items() if not uses_index]
+    assert unindexed == []
+    _, daily_plan = report["GET /brokers/{id}/statistics (daily)"]
+    assert not any("TEMP B-TREE" in step for step in daily_plan)
+
+def test_broker_profile_conditional_get():
+    response = client.get("/brokers/1")
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+    assert client.get("/brokers/1", headers={"If-None-Match": etag}).status_code == 304
+
+    applications = client.get("/applications/", params={"broker_id": 1, "limit": 1}).json()["applications"]
+    client.post(f"/applications/{applications[0]['id']}/rating", json={
+        "punctuality": 1, "quality": 1, "compliance": 1, "communication": 1, "overall": 1
+    })
+    refreshed = client.get("/brokers/1", headers={"If-None-Match": etag})
+    assert refreshed.status_code == 200
+    assert refreshed.headers["etag"] != etag
+
+    # Last-Modified is the entity's own change time, not when the cache was filled
+    from datetime import timezone
+    from email.utils import formatdate
+    from models import engine, Application
+    from sqlalchemy.orm import Session
+    detail = client.get("/applications/2")
+    with Session(engine) as db:
+        updated_at = db.get(Application, 2).updated_at
+    assert detail.headers["last-modified"] == formatdate(updated_at.replace(tzinfo=timezone.utc).timestamp(), usegmt=True)
+
+    # A fill that read the database before an invalidation is not cached
+    import app as application
+    key = "application:3"
+    generation = application.response_generations.current(key)
+    application.invalidate_cached(application_id=3)
+    application.store_response(key, generation, {"id": 3, "status": "stale"})
+    assert application.response_cache.get(key) is None
+
+def test_redis_cache_backend():
+    from cache import RedisCache, FakeRedis, LRUCache
+    redis_cache = RedisCache(FakeRedis(), ttl=60)
+    redis_cache.set("broker:1", {"body": {"id": 1}})
+    assert redis_cache.get("broker:1") == {"body": {"id": 1}}
+    redis_cache.delete("broker:1")
+    assert redis_cache.get("broker:1") is None
+
+    lru = LRUCache(max_entries=2, ttl=60)
+    for key in ("a", "b", "c"):
+        lru.set(key, key)
+    assert lru.get("a") is None
+    assert lru.get("c") == "c"
+
 def test_create_citizen():
     from faker import Faker
     fake = Faker()
@@ -49,6 +132,326 @@ def test_chat():
     data = response.json()
     assert "response" in data
 
+def test_chat_stream_and_faq_cache():
+    import json
+    from ai_services import chatbot
+    previous = chatbot.get_provider()
+    stub = chatbot.StubProvider()
+    chatbot.set_provider(stub)
+    try:
+        response = client.post("/chat/stream", json={"message": "Tell me a joke about traffic"})
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        tokens = [json.loads(line[len("data: "):])["token"] for line in response.text.splitlines()
+                  if line.startswith("data: ") and line != "data: {}"]
+        assert len(tokens) > 1
+        assert response.text.rstrip().endswith("event: done\ndata: {}")
+        assert stub.calls == 1
+
+        # Same question, different wording: served from the answer cache
+        again = client.post("/chat/", json={"message": "tell me a JOKE about traffic!"}).json()
+        assert again["response"] == "".join(tokens)
+        # High-volume FAQ: answered locally
+        faq = client.post("/chat/", json={"message": "What documents are needed for transfer of ownership?"}).json()
+        assert "Form 29" in faq["response"]
+        assert stub.calls == 1
+        # Merely mentioning the FAQ keywords is not enough
+        assert chatbot.faq_answer("I submitted the documents for transfer last week, why is it still pending?") is None
+        # A cached answer is only reused with the same grounding context, and not after it expires
+        chatbot.get_chatbot_response("Tell me a joke about traffic", ["Application #1 is Pending"])
+        assert stub.calls == 2
+        short_lived = chatbot.AnswerCache(ttl=0)
+        short_lived.set("key", "answer")
+        assert short_lived.get("key") is None
+    finally:
+        chatbot.set_provider(previous)
+
+def test_chat_answers_locally():
+    from ai_services import chatbot
+    from ai_services.retrieval import BM25Index
+    index = BM25Index([
+        {"title": "PUC certificate", "text": "Pollution certificate renewed every six months"},
+        {"title": "Fancy numbers", "text": "Choice numbers are auctioned on the Parivahan portal"},
+    ])
+    passage, score, coverage = index.search("what is a pollution certificate?")[0]
+    assert passage["title"] == "PUC certificate"
+    assert coverage == 1.0
+
+    previous = chatbot.get_provider()
+    stub = chatbot.StubProvider()
+    chatbot.set_provider(stub)
+    try:
+        fee = client.post("/chat/", json={"message": "What is the transfer fee for a car?"}).json()
+        assert fee["source"] == "fees"
+        assert "1,995.00" in fee["response"]
+        status = client.post("/chat/", json={"message": "status of application 1"}).json()
+        assert status["source"] == "status"
+        assert status["response"].startswith("Application #1 ")
+        documents = client.post("/chat/", json={"message": "how to change address in RC"}).json()
+        assert documents["source"] == "knowledge"
+        assert "Form 33" in documents["response"]
+        assert stub.calls == 0
+    finally:
+        chatbot.set_provider(previous)
+
+    # Numbers and fee words that are not an application number / fee question fall through
+    import knowledge
+    from models import engine
+    from sqlalchemy.orm import Session
+    with Session(engine) as db:
+        assert knowledge.status_answer(db, "What is the status of my application submitted 2 weeks ago?") is None
+        assert knowledge.status_answer(db, "status of the application I filed on 12 March") is None
+        assert knowledge.status_answer(db, "status of application no. 1").startswith("Application #1 ")
+    assert knowledge.fee_answer("I already paid the fee, when will my new RC arrive?") is None
+    assert knowledge.fee_answer("How much is the renewal fee for a bike?")
+
+def wait_for_job(job_id, timeout=10):
+    import time
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = client.get(f"/jobs/{job_id}").json()
+        if job["status"] in ("succeeded", "failed"):
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f"job {job_id} still {job['status']}")
+
+def test_background_jobs():
+    from ai_services import chatbot
+    previous = chatbot.get_provider()
+    chatbot.set_provider(chatbot.StubProvider())
+    try:
+        response = client.post("/chat/", params={"background": True}, json={"message": "Tell me a story about a lorry"})
+        assert response.status_code == 202
+        assert response.headers["location"] == response.json()["status_url"]
+        job = wait_for_job(response.json()["job_id"])
+        assert job["status"] == "succeeded"
+        assert job["result"]["source"] == "llm"
+    finally:
+        chatbot.set_provider(previous)
+
+    created = client.post("/applications/", params={"background": True}, json={
+        "citizen_id": 1, "broker_id": 1, "application_type": "Transfer of Ownership", "documents": "rc, form 29"})
+    assert created.status_code == 202
+    job = wait_for_job(created.json()["job_id"])
+    assert job["status"] == "succeeded"
+    assert job["result"]["is_fraud"] in (True, False)
+    assert client.get("/jobs/999999").status_code == 404
+
+def test_job_retries_with_backoff():
+    from jobs import JobQueue
+    from models import Base, Job, make_engine
+    # Separate database, so this queue cannot pick up the app's own jobs
+    bind = make_engine("sqlite://")
+    Base.metadata.create_all(bind, tables=[Job.__table__])
+    queue = JobQueue(bind=bind, workers=0, retry_base=0)
+    attempts = []
+
+    @queue.handler("flaky")
+    def flaky(payload):
+        attempts.append(payload)
+        if len(attempts) < 2:
+            raise RuntimeError("provider timeout")
+        return {"ok": True}
+
+    job_id = queue.submit("flaky", {"n": 1})
+    assert queue.run_one()
+    job = queue.get(job_id)
+    assert (job["status"], job["attempts"]) == ("queued", 1)
+    assert "provider timeout" in job["error"]
+    assert queue.run_one()
+    job = queue.get(job_id)
+    assert (job["status"], job["attempts"], job["result"]) == ("succeeded", 2, {"ok": True})
+
+    failing = queue.submit("missing-handler", {}, max_attempts=3)
+    while queue.run_one():
+        pass
+    assert queue.get(failing)["status"] == "failed"
+
+    # A worker whose lease expired mid-run must not overwrite the run that reclaimed the job
+    stale = JobQueue(bind=bind, workers=0, retry_base=0, lease_seconds=-1)
+
+    runs = []
+
+    @stale.handler("slow")
+    def slow(payload):
+        runs.append(payload)
+        if len(runs) == 1:
+            assert stale.run_one()  # reclaims this same job while the first run is still going
+            return "first"
+        return "second"
+
+    slow_id = stale.submit("slow", {})
+    assert stale.run_one()
+    job = queue.get(slow_id)
+    assert (job["status"], job["attempts"], job["result"]) == ("succeeded", 2, "second")
+
+def test_vehicle_search():
+    from vehicles import VehicleIndex
+    index = VehicleIndex(["TN97CH2129", "TN97CH2130", "KA01AB1234"])
+    assert index.search("tn 97 ch 2129")[0] == ("TN97CH2129", "exact")
+    assert [key for key, _ in index.search("TN97CH")] == ["TN97CH2129", "TN97CH2130"]
+    assert index.fuzzy("TN97CH2192") == ["TN97CH2129"]   # swapped digits
+    assert index.fuzzy("KA01B1234") == ["KA01AB1234"]    # missing character
+    index.add("mh 12 zz 0001")
+    assert index.search("MH12ZZ0001") == [("MH12ZZ0001", "exact")]
+    assert index.fuzzy("MH12ZZ0007") == ["MH12ZZ0001"]
+    index.merge()
+    assert index.fuzzy("MH12ZZ0007") == ["MH12ZZ0001"]
+
+    # Vehicles become searchable on commit; a rolled-back insert never does
+    import vehicles
+    from models import engine, Vehicle
+    from sqlalchemy.orm import Session
+    with Session(engine) as db:
+        shared = vehicles.vehicle_index(db)
+        db.add(Vehicle(registration_number="ZZ 99 ZZ 9998"))
+        db.flush()
+        db.rollback()
+        assert "ZZ99ZZ9998" not in shared
+        vehicle = Vehicle(registration_number="ZZ 99 ZZ 9999")
+        db.add(vehicle)
+        db.flush()
+        assert "ZZ99ZZ9999" not in shared
+        db.commit()
+        assert "ZZ99ZZ9999" in shared
+        db.delete(vehicle)
+        db.commit()
+
+    from models import engine, Application
+    from sqlalchemy.orm import Session
+    with Session(engine) as db:
+        vehicle = db.get(Application, 1).vehicle
+        vehicle = {"registration_number": vehicle.registration_number, "chassis_number": vehicle.chassis_number}
+    spaced = " ".join(vehicle["registration_number"].lower())
+    response = client.get("/vehicles/search", params={"q": spaced})
+    assert response.status_code == 200
+    first = response.json()["results"][0]
+    assert first["registration_number"] == vehicle["registration_number"]
+    assert first["match"] == "exact"
+    chassis = client.get("/vehicles/search", params={"q": vehicle["chassis_number"]}).json()["results"]
+    assert any(r["match"] == "chassis" and r["registration_number"] == vehicle["registration_number"] for r in chassis)
+
+    job = client.post("/brokers/1/start-job", json={"vehicle_number": spaced}).json()
+    assert job["success"] is True
+    assert job["application"]["vehicle_number"] == vehicle["registration_number"]
+
+def test_vehicles_are_shared_by_applications():
+    from models import engine, Application, ApplicationVehicleDetails, Vehicle
+    from sqlalchemy import func, select
+    from sqlalchemy.orm import Session
+    with Session(engine) as db:
+        vehicle_id = db.scalar(
+            select(Application.vehicle_id).where(Application.vehicle_id.isnot(None))
+            .group_by(Application.vehicle_id).having(func.count() > 1).limit(1))
+        applications = db.scalars(select(Application).where(Application.vehicle_id == vehicle_id)
+                                  .order_by(Application.submission_date, Application.id)).all()
+        owners = {app.id: app.vehicle_details.owner_name for app in applications}
+        current_owner = db.get(Vehicle, vehicle_id).owner_name
+        registration_number = db.get(Vehicle, vehicle_id).registration_number
+        keys = db.scalars(select(Vehicle.registration_key).where(Vehicle.registration_key.isnot(None))).all()
+        assert db.scalar(select(func.count()).select_from(ApplicationVehicleDetails)) >= len(keys)
+    assert len(keys) == len(set(keys))
+    # Each application keeps the particulars it was submitted with; the vehicle has the latest
+    for application_id, owner in owners.items():
+        assert client.get(f"/applications/{application_id}").json()["vehicle_details"]["owner_name"] == owner
+    assert current_owner == owners[applications[-1].id]
+    # Every "latest application" lookup agrees with that order
+    job = client.post("/brokers/1/start-job", json={"vehicle_number": registration_number}).json()
+    assert job["application"]["id"] == applications[-1].id
+    vehicle = Vehicle(registration_number="ka 01 ab 0001")
+    assert vehicle.registration_key == "KA01AB0001"
+
+def test_compliance_expiring_and_leads():
+    params = {"kind": "insurance", "within_days": 60, "as_of": "2025-06-01", "limit": 5}
+    response = client.get("/compliance/expiring", params=params)
+    assert response.status_code == 200
+    first = response.json()
+    assert len(first) == 5
+    assert all(0 <= v["days_left"] <= 60 for v in first)
+    assert [v["due_date"] for v in first] == sorted(v["due_date"] for v in first)
+    cursor = response.headers["X-Next-Cursor"]
+    second = client.get("/compliance/expiring", params=dict(params, cursor=cursor)).json()
+    assert second[0]["due_date"] >= first[-1]["due_date"]
+    assert not {v["vehicle_id"] for v in first} & {v["vehicle_id"] for v in second}
+    assert client.get("/compliance/expiring", params={"kind": "bogus"}).status_code == 400
+    assert client.get("/compliance/expiring", params={"kind": "tax", "within_days": 100000000}).status_code == 400
+    from models import engine, Vehicle
+    from sqlalchemy import select, update
+    from sqlalchemy.orm import Session
+    with Session(engine) as db:
+        lapsed = db.scalars(select(Vehicle.id).where(Vehicle.fitness_status == "Expired").order_by(Vehicle.id).limit(2)).all()
+        db.execute(update(Vehicle).where(Vehicle.id == lapsed[0]).values(registration_valid_upto=None))
+        db.commit()
+    fitness = client.get("/compliance/expiring", params={"kind": "fitness", "limit": 1})
+    assert fitness.status_code == 200 and fitness.json()[0]["vehicle_id"] != lapsed[0]
+    assert client.get("/compliance/expiring", params={"kind": "fitness", "cursor": fitness.headers["X-Next-Cursor"]}).status_code == 200
+
+    created = client.post("/admin/compliance/scan", params={"day": "2025-06-01"}).json()["leads_created"]
+    assert created["insurance"] > 0
+    # Incremental: the same day again adds nothing
+    again = client.post("/admin/compliance/scan", params={"day": "2025-06-01"}).json()["leads_created"]
+    assert sum(again.values()) == 0
+    # A date corrected to a day the scan has already passed is picked up through updated_at
+    from datetime import date
+    with Session(engine) as db:
+        vehicle_id = db.scalar(select(Vehicle.id).where(Vehicle.insurance_valid_upto < date(2025, 1, 1)).limit(1))
+        db.execute(update(Vehicle).where(Vehicle.id == vehicle_id).values(insurance_valid_upto=date(2025, 6, 10)))
+        db.commit()
+    corrected = client.post("/admin/compliance/scan", params={"day": "2025-06-01"}).json()["leads_created"]
+    assert corrected["insurance"] == 1
+    broker_id = first[0]["broker_id"]
+    leads = client.get(f"/brokers/{broker_id}/compliance-leads", params={"lead_type": "reminder"}).json()
+    assert leads and all(lead["lead_type"] == "reminder" for lead in leads)
+    for limit in (-5, 0):
+        assert len(client.get(f"/brokers/{broker_id}/compliance-leads", params={"limit": limit}).json()) == 1
+
+def test_bulk_status_transitions():
+    import broker_stats
+    from models import engine, Application, ApplicationDailyRollup
+    from sqlalchemy import func, select
+    from sqlalchemy.orm import Session
+
+    def counts(db, broker_id):
+        live = dict(db.execute(select(Application.status, func.count()).where(Application.broker_id == broker_id)
+                               .group_by(Application.status)).all())
+        kept = {status: broker_stats.status_count(db, broker_id, status) for status in live}
+        rollup = db.scalar(select(func.sum(ApplicationDailyRollup.applications)).where(ApplicationDailyRollup.status == "Approved"))
+        return live, kept, rollup
+
+    with Session(engine) as db:
+        broker_id = db.scalar(select(Application.broker_id).where(Application.status == "Pending").limit(1))
+        pending = db.scalars(select(Application.id).where(Application.broker_id == broker_id, Application.status == "Pending").limit(3)).all()
+        rejected = db.scalar(select(Application.id).where(Application.status == "Rejected").limit(1))
+        _, _, approved_before = counts(db, broker_id)
+    before = client.get("/analytics/").json()["approved_applications"]
+
+    response = client.post("/applications/bulk-status", json={"status": "Approved", "ids": pending + [rejected, 999999]})
+    assert response.status_code == 200
+    data = response.json()
+    outcomes = {r["id"]: r["outcome"] for r in data["results"]}
+    assert [outcomes[i] for i in pending] == ["updated"] * len(pending)
+    assert outcomes[rejected] == "invalid_transition"
+    assert outcomes[999999] == "not_found"
+    assert data["updated"] == len(pending)
+    assert client.get("/analytics/").json()["approved_applications"] == before + len(pending)
+    assert client.get(f"/applications/{pending[0]}").json()["status"] == "Approved"
+
+    # Filter form: revoke two of this broker's approvals
+    revoked = client.post("/applications/bulk-status", json={
+        "status": "Rejected", "filter": {"status": "Approved", "broker_id": broker_id}, "limit": 2}).json()
+    assert revoked["updated"] == 2
+    with Session(engine) as db:
+        live, kept, approved_after = counts(db, broker_id)
+    assert live == kept
+    assert approved_after == approved_before + len(pending) - 2
+    # Repeated filter calls skip rows that cannot move, so each call takes fresh ones
+    flagged = {"status": "Rejected", "filter": {"is_fraud": True}, "limit": 3}
+    first = client.post("/applications/bulk-status", json=flagged).json()["results"]
+    second = client.post("/applications/bulk-status", json=flagged).json()["results"]
+    assert all(r["outcome"] == "updated" for r in first + second)
+    assert not {r["id"] for r in first} & {r["id"] for r in second}
+    assert client.post("/applications/bulk-status", json={"status": "Done", "ids": [1]}).status_code == 400
+
 def test_create_application():
     application_data = {
         "citizen_id": 1,
@@ -61,16 +464,130 @@ def test_create_application():
     data = response.json()
     assert data["application_type"] == "New Registration"
 
+def test_create_applications_bulk():
+    applications = [{
+        "citizen_id": i,
+        "broker_id": 1,
+        "application_type": application_type,
+        "documents": "test_documents"
+    } for i, application_type in enumerate(["New Registration", "Renewal", "Transfer"], start=1)]
+    response = client.post("/applications/bulk", json=applications)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["created"] == 3
+    assert len({a["id"] for a in data["applications"]}) == 3
+    assert all(isinstance(a["is_fraud"], bool) for a in data["applications"])
+
+def test_fraud_model_info():
+    response = client.get("/admin/fraud-model")
+    assert response.status_code == 200
+    data = response.json()
+    assert "available" in data
+    assert "versions" in data
+
+def test_model_registry_hot_swap(tmp_path):
+    import pickle
+    from types import SimpleNamespace
+    from ai_services.model_registry import ModelRegistry, active_version, save_artifact, list_versions
+    with open("fraud_model.pkl", "rb") as f:
+        estimator = pickle.load(f)
+    registry = ModelRegistry(registry_dir=str(tmp_path), legacy_path="missing.pkl")
+    assert registry.scorer() is None
+
+    v1 = save_artifact(estimator, estimator.feature_names_in_, {"accuracy": 0.9}, registry_dir=str(tmp_path))
+    v2 = save_artifact(estimator, estimator.feature_names_in_, {"accuracy": 0.95}, registry_dir=str(tmp_path))
+    assert list_versions(str(tmp_path)) == [v1, v2]
+
+    assert registry.reload()["active"]["version"] == v2
+    assert registry.reload(v1)["active"]["metrics"] == {"accuracy": 0.9}
+    sample = SimpleNamespace(citizen_id=1, broker_id=1, application_type="Renewal")
+    assert len(registry.scorer().score_batch([sample])) == 1
+
+    # A corrupt artifact is rejected without moving ACTIVE off the working version
+    with open(tmp_path / f"{v2}.pkl", "ab") as f:
+        f.write(b"corrupt")
+    with pytest.raises(ValueError):
+        registry.reload(v2)
+    assert active_version(str(tmp_path)) == v1
+    assert registry.info()["active"]["version"] == v1
+
+def test_rating_and_approval_update_broker_stats():
+    before = client.get("/brokers/1/details").json()
+    application = client.post("/applications/", json={
+        "citizen_id": 1,
+        "broker_id": 1,
+        "application_type": "Renewal",
+        "documents": "test_documents"
+    }).json()
+    client.post(f"/applications/{application['id']}/approve", json={"approved_by": 1})
+    response = client.post(f"/applications/{application['id']}/rating", json={
+        "punctuality": 5, "quality": 5, "compliance": 5, "communication": 5, "overall": 5
+    })
+    assert response.json()["success"] is True
+
+    after = client.get("/brokers/1/details").json()
+    assert after["statistics"]["total_applications"] == before["statistics"]["total_applications"] + 1
+    assert after["statistics"]["approved_applications"] == before["statistics"]["approved_applications"] + 1
+    assert after["ratings"]["total_ratings"] == before["ratings"]["total_ratings"] + 1
+
+def test_broker_statistics_window():
+    client.post("/applications/", json={
+        "citizen_id": 1,
+        "broker_id": 2,
+        "application_type": "Transfer",
+        "documents": "test_documents"
+    })
+    data = client.get("/brokers/2/statistics", params={"days": 30}).json()
+    assert len(data["daily_assignments"]) == 30
+    assert data["daily_assignments"][-1]["count"] >= 1
+    assert data["pending"] >= 1
+    assert data["total_assigned"] >= data["pending"] + data["approved"]
+
 def test_list_applications():
     response = client.get("/applications/")
     assert response.status_code == 200
     data = response.json()
-    assert isinstance(data, list)
-    if data:
-        app_entry = data[0]
+    assert isinstance(data["applications"], list)
+    assert "next_cursor" in data
+    if data["applications"]:
+        app_entry = data["applications"][0]
         expected_keys = {"id", "citizen_id", "broker_id", "application_type", "status", "submission_date", "documents", "is_fraud"}
         assert expected_keys.issubset(app_entry.keys())
 
+def test_list_applications_cursor_pagination():
+    first = client.get("/applications/", params={"limit": 5}).json()
+    if not first["next_cursor"]:
+        return
+    second = client.get("/applications/", params={"limit": 5, "cursor": first["next_cursor"]}).json()
+    first_ids = {a["id"] for a in first["applications"]}
+    second_ids = {a["id"] for a in second["applications"]}
+    assert len(second_ids) == 5
+    assert first_ids.isdisjoint(second_ids)
+    assert client.get("/applications/", params={"cursor": "not-a-cursor"}).status_code == 400
+    # Page sizes are clamped to 1..PAGE_LIMIT_MAX
+    for path in ("/applications/", "/complaints", "/payments/"):
+        response = client.get(path, params={"limit": 0})
+        assert response.status_code == 200
+    assert client.get("/applications/", params={"limit": 0}).json()["limit"] == 1
+    assert client.get("/applications/", params={"limit": 10**6}).json()["limit"] == 1000
+
+def test_application_detail_query_count():
+    from sqlalchemy import event
+    from models import get_async_engine
+    engine = get_async_engine().sync_engine
+    statements = []
+    def count_statement(*args):
+        statements.append(args[2])
+    event.listen(engine, "before_cursor_execute", count_statement)
+    try:
+        response = client.get("/applications/1")
+    finally:
+        event.remove(engine, "before_cursor_execute", count_statement)
+    data = response.json()
+    assert data["id"] == 1
+    assert data["citizen"] is not None
+    assert 1 <= len(statements) <= 2
+
 def test_ocr():
     # Create a dummy image file
     with open("test_image.txt", "w") as f:
@@ -90,6 +607,37 @@ def test_ocr():
     assert data["extracted_text"] is not None
     os.remove("test_image.txt")
 
+def test_ocr_preprocess_regions():
+    cv2 = pytest.importorskip("cv2")
+    import numpy as np
+    from ai_services import ocr
+    page = np.full((1000, 1400, 3), 255, dtype=np.uint8)
+    for line in range(3):
+        cv2.putText(page, "REGISTRATION KA01AB1234", (80, 150 + line * 150), cv2.FONT_HERSHEY_SIMPLEX, 1.5, (0, 0, 0), 3)
+    skewed = cv2.warpAffine(page, cv2.getRotationMatrix2D((700, 500), 5, 1.0), (1400, 1000), borderValue=(255, 255, 255))
+    photo = cv2.resize(skewed, (2800, 2000))
+
+    binary, scale = ocr.preprocess(photo)
+    assert max(binary.shape) == ocr.OCR_MAX_SIDE
+    assert scale == pytest.approx(2800 / ocr.OCR_MAX_SIDE, rel=0.01)
+    regions = ocr.text_regions(binary)
+    # Deskewed lines come back as three separate, flat boxes in reading order
+    assert len(regions) == 3
+    assert [r[1] for r in regions] == sorted(r[1] for r in regions)
+    assert all(r[3] < 100 for r in regions)
+    # One page for the recognizer: the three lines, gaps blanked, cropped to their union
+    page, x0, y0, boxes = ocr.masked_page(binary)
+    assert len(boxes) == 3
+    assert page.shape == (max(b[3] for b in boxes) - y0, max(b[2] for b in boxes) - x0)
+    assert page[boxes[0][3] - y0:boxes[1][1] - y0].min() == 255
+
+    # Formats OpenCV cannot decode still go through PIL
+    from PIL import Image
+    import io
+    buffer = io.BytesIO()
+    Image.fromarray(page).save(buffer, format="GIF")
+    assert ocr._decode(buffer.getvalue()).shape == page.shape + (3,)
+
 def test_forgery_detection():
     from PIL import Image
     import io
@@ -106,4 +654,78 @@ def test_forgery_detection():
         assert "is_forged" in data
         assert "confidence" in data
     else:
-        assert data["status"] == "unavailable"
\ No newline at end of file
+        assert data["status"] == "unavailable"
+
+def test_forgery_result_cache(tmp_path, monkeypatch):
+    pytest.importorskip("cv2")
+    import app as app_module
+    from cache import TieredCache, LRUCache, DiskCache
+    from PIL import Image
+    import io
+    monkeypatch.setattr(app_module, "analysis_cache", TieredCache(LRUCache(ttl=float("inf")), DiskCache(str(tmp_path / "analysis.db"))))
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 64), color="gray").save(buffer, format="PNG")
+    payload = {"image": base64.b64encode(buffer.getvalue()).decode("utf-8")}
+
+    first = client.post("/forgery/", json=payload).json()
+    second = client.post("/forgery/", json=payload).json()
+    assert first == second
+    stats = client.get("/admin/analysis-cache").json()
+    assert stats["misses"] == 1
+    assert stats["memory_hits"] == 1
+
+    # A fresh memory tier still finds the result on disk
+    app_module.analysis_cache.memory.clear()
+    assert client.post("/forgery/", json=payload).json() == first
+    assert client.get("/admin/analysis-cache").json()["disk_hits"] == 1
+
+def test_disk_cache_evicts_by_size(tmp_path):
+    from cache import DiskCache
+    disk = DiskCache(str(tmp_path / "analysis.db"), max_bytes=1000)
+    for i in range(10):
+        disk.set(f"key{i}", "x" * 200)
+    assert disk._size <= 1000
+    assert disk.get("key0") is None
+    assert disk.get("key9") == "x" * 200
+
+def test_verify_documents_batch():
+    cv2 = pytest.importorskip("cv2")
+    import json
+    import numpy as np
+    image = np.full((64, 64, 3), 200, dtype=np.uint8)
+    png = cv2.imencode(".png", image)[1].tobytes()
+    response = client.post("/documents/verify-batch", files=[
+        ("files", ("rc.png", png, "image/png")),
+        ("files", ("broken.png", b"not an image", "image/png")),
+    ])
+    assert response.status_code == 200
+    results = {r["index"]: r for r in map(json.loads, response.text.splitlines())}
+    assert results[0]["filename"] == "rc.png"
+    assert results[0]["status"] == "ok"
+    assert "extracted_text" in results[0]
+    assert results[0]["forgery"]["model_used"] == "heuristic"
+    assert results[1]["status"] == "error"
+
+def test_forgery_service_micro_batches(monkeypatch):
+    pytest.importorskip("cv2")
+    import numpy as np
+    from ai_services import forgery
+
+    calls = []
+    class FakeRunner:
+        input_spec = {"shape": [1, 8, 8, 3], "dtype": np.float32}
+        max_batch = 4
+        def predict(self, tensors):
+            calls.append(len(tensors))
+            return [0.9] * len(tensors)
+
+    monkeypatch.setattr(forgery, "_load_runner", lambda model_path: FakeRunner())
+    monkeypatch.setattr(forgery, "FORGERY_BATCH_WAIT_MS", 50)
+    service = forgery.ForgeryService(workers=1, queue_size=8)
+    images = [np.full((16, 16, 3), i, dtype=np.uint8) for i in range(4)]
+    futures = [service.submit(image) for image in images]
+    results = [f.result(timeout=5) for f in futures]
+    assert all(r["is_forged"] for r in results)
+    assert sum(calls) == 4
+    assert len(calls) < 4
+
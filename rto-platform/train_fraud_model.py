@@ -2,30 +2,40 @@ from sklearn.ensemble import GradientBoostingClassifier
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score
 import pandas as pd
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import select, func
 from models import engine, Application, Rating
-import pickle
-
-Session = sessionmaker(bind=engine)
-session = Session()
-
-# Load applications with ratings
-applications = session.query(Application).all()
-data = []
-for app in applications:
-    ratings = session.query(Rating).filter(Rating.application_id == app.id).all()
-    avg_rating = sum([r.overall for r in ratings]) / len(ratings) if ratings else 3
-    data.append({
-        'citizen_id': app.citizen_id,
-        'broker_id': app.broker_id,
-        'application_type': app.application_type,
-        'status': app.status,
-        'submission_day': app.submission_date.timetuple().tm_yday,
-        'avg_rating': avg_rating,
-        'is_fraud': app.is_fraud
-    })
-
-df = pd.DataFrame(data)
+from ai_services.model_registry import save_artifact
+
+# Applications without ratings get a neutral score
+DEFAULT_AVG_RATING = 3
+
+def load_training_frame(bind=engine):
+    """Pull every application with its average rating in a single query."""
+    avg_ratings = select(
+        Rating.application_id,
+        func.avg(Rating.overall).label("avg_rating")
+    ).group_by(Rating.application_id).subquery()
+    query = select(
+        Application.citizen_id,
+        Application.broker_id,
+        Application.application_type,
+        Application.status,
+        Application.submission_date,
+        avg_ratings.c.avg_rating,
+        Application.is_fraud
+    ).outerjoin(avg_ratings, avg_ratings.c.application_id == Application.id).where(
+        # Applications still waiting for their background fraud check have no label yet
+        Application.is_fraud.isnot(None)
+    ).order_by(Application.id)
+
+    # The classifier needs the whole frame in memory, so it is read in one go
+    df = pd.read_sql(query, bind)
+    df["submission_day"] = pd.to_datetime(df.pop("submission_date")).dt.dayofyear
+    df["avg_rating"] = df["avg_rating"].fillna(DEFAULT_AVG_RATING)
+    df["is_fraud"] = df["is_fraud"].astype(bool)
+    return df[['citizen_id', 'broker_id', 'application_type', 'status', 'submission_day', 'avg_rating', 'is_fraud']]
+
+df = load_training_frame()
 
 # Encode categorical variables
 df = pd.get_dummies(df, columns=['application_type', 'status'])
@@ -43,10 +53,15 @@ model.fit(X_train, y_train)
 
 # Evaluate
 y_pred = model.predict(X_test)
-print(f"Accuracy: {accuracy_score(y_test, y_pred)}")
+accuracy = accuracy_score(y_test, y_pred)
+print(f"Accuracy: {accuracy}")
 
-# Save model
-with open('fraud_model.pkl', 'wb') as f:
-    pickle.dump(model, f)
+# Save model as a new registry version and make it active
+version = save_artifact(model, X.columns, metrics={
+    "accuracy": float(accuracy),
+    "train_rows": len(X_train),
+    "test_rows": len(X_test)
+})
 
-print("Fraud detection model trained and saved.")
\ No newline at end of file
+print(f"Fraud detection model trained and saved as {version}.")
+print("Running servers pick it up via POST /admin/fraud-model/reload.")
\ No newline at end of file
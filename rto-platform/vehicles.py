@@ -0,0 +1,318 @@
+"""
+Vehicle lookup by registration number.
+
+VehicleIndex keeps every normalized registration number in memory:
+
+- a sorted byte-string array, so prefix search is two binary searches;
+- a deletion-neighbourhood table (each key plus every key with one character
+  removed, stored as sorted 64-bit hashes computed column-wise with NumPy), so
+  keys within one edit of a typo are found with a handful of binary searches
+  instead of a scan.
+
+New registrations go into a small append-only pending tier and are merged
+into the arrays in batches by a background thread, so inserts never rebuild
+the index and lookups need no lock.
+"""
+import os
+import threading
+from typing import NamedTuple
+
+import numpy as np
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from models import Vehicle, normalize_registration
+
+VEHICLE_INDEX_MERGE_EVERY = int(os.getenv("VEHICLE_INDEX_MERGE_EVERY", "5000"))  # pending keys before a background merge
+
+
+FNV_OFFSET = np.uint64(14695981039346656037)
+FNV_PRIME = np.uint64(1099511628211)
+
+
+def _hash_rows(rows):
+    """FNV-1a of each row of a zero-padded uint8 matrix; padding does not change the hash."""
+    h = np.full(len(rows), FNV_OFFSET, dtype=np.uint64)
+    with np.errstate(over="ignore"):
+        for column in rows.T:
+            c = column.astype(np.uint64)
+            h = np.where(c != 0, (h ^ c) * FNV_PRIME, h)
+    return h
+
+
+def _variant_hashes(keys):
+    """
+    Hashes of each key and of every one-character deletion of it, with the row
+    index of the key each hash came from. keys is a fixed-width bytes array.
+    """
+    width = keys.dtype.itemsize
+    rows = keys.view(np.uint8).reshape(len(keys), width)
+    lengths = (rows != 0).sum(axis=1)
+    hashes, ids = [_hash_rows(rows)], [np.arange(len(keys), dtype=np.int32)]
+    padding = np.zeros((len(keys), 1), dtype=np.uint8)
+    for i in range(width):
+        present = np.flatnonzero(lengths > i)
+        if not len(present):
+            break
+        deleted = np.hstack([rows[present, :i], rows[present, i + 1:], padding[present]])
+        hashes.append(_hash_rows(deleted))
+        ids.append(present.astype(np.int32))
+    return np.concatenate(hashes), np.concatenate(ids)
+
+
+def _variants(key: str) -> set:
+    """The key and every string made by deleting one character from it."""
+    return {key} | {key[:i] + key[i + 1:] for i in range(len(key))}
+
+
+def _successor(raw: bytes) -> bytes:
+    """Smallest byte string greater than every string starting with raw (keys are ASCII)."""
+    return raw[:-1] + bytes([raw[-1] + 1])
+
+
+def edit_distance_at_most_one(a: str, b: str) -> bool:
+    """True if a and b differ by at most one insertion, deletion, substitution or adjacent swap."""
+    if a == b:
+        return True
+    if abs(len(a) - len(b)) > 1:
+        return False
+    i = 0
+    while i < min(len(a), len(b)) and a[i] == b[i]:
+        i += 1
+    if len(a) == len(b):
+        return a[i + 1:] == b[i + 1:] or (a[i:i + 2] == b[i:i + 2][::-1] and a[i + 2:] == b[i + 2:])
+    return a[i + 1:] == b[i:] if len(a) > len(b) else a[i:] == b[i + 1:]
+
+
+class _Pending:
+    """
+    Registrations added since the last merge. Append-only: writers (under the
+    index lock) only append to `keys` and to the lists in `variants`, and add
+    to `members`; readers only index, look up and iterate lists, which is safe
+    while another thread appends.
+    """
+
+    def __init__(self, keys=()):
+        self.keys = []
+        self.members = set()
+        self.variants = {}  # variant -> pending keys it comes from
+        for key in keys:
+            self.append(key)
+
+    def append(self, key: str):
+        self.keys.append(key)
+        self.members.add(key)
+        for variant in _variants(key):
+            self.variants.setdefault(variant, []).append(key)
+
+
+class _Snapshot(NamedTuple):
+    """The merged arrays (never mutated) and the pending tier that goes with them."""
+    keys: np.ndarray  # by id
+    sorted: np.ndarray
+    variant_hashes: np.ndarray
+    variant_ids: np.ndarray
+    pending: _Pending
+
+    def contains(self, key: str) -> bool:
+        return key in self.pending.members or self.in_base(key.encode())
+
+    def as_bytes(self, raw: bytes):
+        """raw as a scalar of the arrays' dtype, or None if it is too long to be stored."""
+        if len(raw) > self.sorted.dtype.itemsize:
+            return None
+        # Matching dtypes keep searchsorted from converting the whole array
+        return np.array(raw, dtype=self.sorted.dtype)
+
+    def in_base(self, key: bytes) -> bool:
+        needle = self.as_bytes(key)
+        if needle is None:
+            return False
+        i = np.searchsorted(self.sorted, needle)
+        return i < len(self.sorted) and self.sorted[i] == key
+
+
+def _merged(snapshot: _Snapshot, new: list) -> _Snapshot:
+    """A snapshot with `new` folded into the arrays and an empty pending tier."""
+    if not new:
+        return snapshot._replace(pending=_Pending())
+    new_keys = np.array([key.encode() for key in new])
+    width = max(new_keys.dtype.itemsize, snapshot.keys.dtype.itemsize)
+    new_hashes, new_ids = _variant_hashes(new_keys)
+
+    keys = np.concatenate([snapshot.keys.astype(f"S{width}"), new_keys.astype(f"S{width}")])
+    variant_hashes = np.concatenate([snapshot.variant_hashes, new_hashes])
+    variant_ids = np.concatenate([snapshot.variant_ids, new_ids + len(snapshot.keys)])
+    order = np.argsort(variant_hashes, kind="stable")
+    return _Snapshot(
+        keys=keys,
+        sorted=np.sort(keys),
+        variant_hashes=variant_hashes[order],
+        variant_ids=variant_ids[order],
+        pending=_Pending(),
+    )
+
+
+class VehicleIndex:
+    """
+    In-memory prefix and typo-tolerant index over normalized registration numbers.
+
+    The merged arrays and their pending tier are published together as one
+    _Snapshot; readers take one local copy of the reference, so they never mix
+    arrays from two merges. Inserts append to the pending tier under a lock.
+    Once it holds VEHICLE_INDEX_MERGE_EVERY keys a background thread rebuilds
+    the arrays and swaps in a new snapshot, carrying over keys added meanwhile.
+    """
+
+    def __init__(self, keys=()):
+        self._lock = threading.Lock()  # serializes writers
+        self._merge_lock = threading.Lock()  # one merge at a time
+        self._merging = False
+        # Bulk load: dedupe once and merge straight into the arrays
+        empty = _Snapshot(
+            keys=np.empty(0, dtype="S1"),
+            sorted=np.empty(0, dtype="S1"),
+            variant_hashes=np.empty(0, dtype=np.uint64),
+            variant_ids=np.empty(0, dtype=np.int32),
+            pending=_Pending(),
+        )
+        self._snapshot = _merged(empty, sorted({key for key in map(normalize_registration, keys) if key}))
+
+    def __len__(self):
+        snapshot = self._snapshot
+        return len(snapshot.keys) + len(snapshot.pending.keys)
+
+    def __contains__(self, key: str) -> bool:
+        return self._snapshot.contains(key)
+
+    def add(self, registration_number: str):
+        """Index one registration number (raw or normalized); duplicates are ignored."""
+        self.add_many([registration_number])
+
+    def add_many(self, registration_numbers):
+        with self._lock:
+            snapshot = self._snapshot
+            for value in registration_numbers:
+                key = normalize_registration(value)
+                if key and not snapshot.contains(key):
+                    snapshot.pending.append(key)
+            start_merge = len(snapshot.pending.keys) >= VEHICLE_INDEX_MERGE_EVERY and not self._merging
+            if start_merge:
+                self._merging = True
+        if start_merge:
+            # Off the caller's path: the rebuild sorts every key
+            threading.Thread(target=self.merge, name="vehicle-index-merge", daemon=True).start()
+
+    def merge(self):
+        """Fold the pending keys into the sorted arrays."""
+        with self._merge_lock:
+            try:
+                snapshot = self._snapshot
+                count = len(snapshot.pending.keys)
+                if not count:
+                    return
+                merged = _merged(snapshot, snapshot.pending.keys[:count])
+                with self._lock:
+                    # Keys appended while the arrays were rebuilt stay pending
+                    carried = _Pending(self._snapshot.pending.keys[count:])
+                    self._snapshot = merged._replace(pending=carried)
+            finally:
+                self._merging = False
+
+    def prefix(self, prefix: str, limit: int = 10) -> list:
+        """Registration keys starting with prefix, in sorted order."""
+        prefix = normalize_registration(prefix)
+        if not prefix:
+            return []
+        snapshot = self._snapshot
+        raw = prefix.encode()
+        matches = []
+        if snapshot.as_bytes(raw) is not None:
+            lo = np.searchsorted(snapshot.sorted, snapshot.as_bytes(raw), side="left")
+            hi = np.searchsorted(snapshot.sorted, snapshot.as_bytes(_successor(raw)), side="left")
+            matches = [key.decode() for key in snapshot.sorted[lo:min(hi, lo + limit)]]
+        # The pending tier is small and unsorted: scan it
+        matches.extend(key for key in snapshot.pending.keys if key.startswith(prefix))
+        return sorted(matches)[:limit]
+
+    def fuzzy(self, query: str, limit: int = 10) -> list:
+        """Registration keys within one edit (typo, missing/extra character, swap) of query."""
+        query = normalize_registration(query)
+        if not query:
+            return []
+        snapshot = self._snapshot
+        candidates = set()
+        variants = sorted(_variants(query))
+        for variant in variants:
+            candidates.update(snapshot.pending.variants.get(variant, ()))
+        # All probes in one vectorized hash + two searchsorted calls
+        hashes, ids = snapshot.variant_hashes, snapshot.variant_ids
+        probes = np.array([variant.encode() for variant in variants])
+        probe_hashes = _hash_rows(probes.view(np.uint8).reshape(len(probes), probes.dtype.itemsize))
+        lo = np.searchsorted(hashes, probe_hashes, side="left")
+        hi = np.searchsorted(hashes, probe_hashes, side="right")
+        for start, end in zip(lo, hi):
+            candidates.update(key.decode() for key in snapshot.keys[ids[start:end]])
+        return sorted(key for key in candidates if key != query and edit_distance_at_most_one(query, key))[:limit]
+
+    def search(self, query: str, limit: int = 10) -> list:
+        """[(registration_key, match)] with match in exact / prefix / fuzzy, best first."""
+        key = normalize_registration(query)
+        if not key:
+            return []
+        results = {}
+        if key in self:
+            results[key] = "exact"
+        for match, keys in (("prefix", self.prefix(key, limit)), ("fuzzy", self.fuzzy(key, limit))):
+            for candidate in keys:
+                results.setdefault(candidate, match)
+        return list(results.items())[:limit]
+
+
+def build_index(db) -> VehicleIndex:
+    keys = db.scalars(select(Vehicle.registration_key).where(Vehicle.registration_key.isnot(None)))
+    return VehicleIndex(keys)
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def vehicle_index(db) -> VehicleIndex:
+    """Shared index, loaded from the vehicles table on first use."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = build_index(db)
+    return _index
+
+
+def record_registrations(registration_numbers):
+    """Add newly created registrations to the index, if it has been loaded."""
+    if _index is not None:
+        _index.add_many(registration_numbers)
+
+
+# New vehicles become searchable when their transaction commits, not when they are flushed,
+# so a rolled-back insert never shows up in search results
+NEW_REGISTRATIONS = "vehicles.new_registrations"
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_new_vehicles(session, flush_context):
+    numbers = [obj.registration_number for obj in session.new if isinstance(obj, Vehicle)]
+    if numbers:
+        session.info.setdefault(NEW_REGISTRATIONS, []).extend(numbers)
+
+
+@event.listens_for(Session, "after_commit")
+def _index_new_vehicles(session):
+    numbers = session.info.pop(NEW_REGISTRATIONS, None)
+    if numbers:
+        record_registrations(numbers)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_new_vehicles(session):
+    session.info.pop(NEW_REGISTRATIONS, None)
@@ -0,0 +1,25 @@
+# Application status workflow used by the bulk status endpoint
+STATUSES = ["Pending", "In Progress", "Approved", "Rejected", "Payment Completed"]
+
+# Allowed moves from each status; Payment Completed is final
+TRANSITIONS = {
+    "Pending": {"In Progress", "Approved", "Rejected"},
+    "In Progress": {"Pending", "Approved", "Rejected"},
+    "Approved": {"Payment Completed", "Rejected"},  # Rejected: approval revoked after fraud review
+    "Rejected": {"Pending"},  # reopened
+    "Payment Completed": set(),
+}
+
+
+def transition_outcome(current: str, target: str) -> str:
+    """"updated" if current -> target is allowed, "unchanged" if already there, else "invalid_transition"."""
+    if current == target:
+        return "unchanged"
+    if target in TRANSITIONS.get(current, ()):
+        return "updated"
+    return "invalid_transition"
+
+
+def sources(target: str) -> list:
+    """Statuses that may move to `target`."""
+    return [status for status in STATUSES if target in TRANSITIONS[status]]